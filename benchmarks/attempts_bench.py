@@ -0,0 +1,238 @@
+"""
+Size and throughput of the compact daily_problem format against the old text format.
+
+Builds the same attempts in the old format (an id column, TEXT answers, a copy of the correct
+answer and a text timestamp) and in the compact format, converts a copy of the old database
+with init_db's migration, then compares bytes per attempt (table plus indexes, from dbstat),
+bulk and single-answer insert rates, and the per-question and per-user reads the bot runs.
+
+    python -m benchmarks.attempts_bench --attempts 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import utils.database as database
+from utils.guilds import SHARED_BANK_ID, legacy_guild_id
+
+BATCH_SIZE = 50_000
+START = datetime(2024, 1, 1)
+
+LEGACY_SCHEMA = """
+    CREATE TABLE daily_problem (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        correct_answer TEXT NOT NULL,
+        selected_answer TEXT NOT NULL,
+        is_correct BOOLEAN NOT NULL,
+        response_time TIMESTAMP NOT NULL,
+        FOREIGN KEY (question_id) REFERENCES questions(id),
+        UNIQUE(user_id, question_id)
+    )
+"""
+
+# Migrated attempts land in the legacy guild, one posting per question; questions are posted
+# in ID order, so posting IDs match question IDs. The benchmark's database is its own, so the
+# migration is told to use guild 0 unless LEGACY_GUILD_ID says otherwise
+os.environ.setdefault("LEGACY_GUILD_ID", str(SHARED_BANK_ID))
+GUILD_ID = legacy_guild_id()
+
+# name -> (old schema SQL, compact schema SQL)
+QUERIES = {
+    "distribution": (
+        "SELECT selected_answer, COUNT(*) FROM daily_problem WHERE question_id = ? GROUP BY selected_answer",
+        "SELECT selected_answer, COUNT(*) FROM daily_problem WHERE posting_id = ? GROUP BY selected_answer",
+    ),
+    "participants": (
+        "SELECT COUNT(DISTINCT user_id) FROM daily_problem WHERE question_id = ?",
+        "SELECT COUNT(DISTINCT user_id) FROM daily_problem WHERE posting_id = ?",
+    ),
+    "user attempts": (
+        "SELECT question_id, is_correct FROM daily_problem WHERE user_id = ?",
+        f"SELECT question_id, is_correct FROM daily_problem WHERE guild_id = {GUILD_ID} AND user_id = ?",
+    ),
+}
+
+
+def _attempts(attempts, users, questions, seed):
+    """
+    Yield (question_id, user_id, correct letter, selected letter, datetime) in posting order,
+    the same sequence for the same arguments.
+    """
+    rng = random.Random(seed)
+    per_question = min(users, -(-attempts // questions))
+    remaining = attempts
+    for question_id in range(1, questions + 1):
+        if remaining <= 0:
+            return
+        correct = rng.choice("ABCD")
+        day = START + timedelta(days=question_id)
+        for user_id in rng.sample(range(1, users + 1), min(per_question, remaining)):
+            selected = correct if rng.random() < 0.6 else rng.choice("ABCD")
+            yield question_id, user_id, correct, selected, day + timedelta(seconds=rng.randrange(86400))
+        remaining -= per_question
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def fill_legacy(path, args):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    start = time.perf_counter()
+    with conn:
+        for batch in _batches(_attempts(args.attempts, args.users, args.questions, args.seed)):
+            conn.executemany("""
+                INSERT INTO daily_problem (user_id, question_id, correct_answer, selected_answer,
+                                           is_correct, response_time)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [(u, q, c, s, s == c, str(t)) for q, u, c, s, t in batch])
+    conn.close()
+    return time.perf_counter() - start
+
+
+def fill_compact(path, args):
+    database.DATABASE_NAME = path
+    database.init_db()
+    conn = sqlite3.connect(path)
+    start = time.perf_counter()
+    with conn:
+        conn.executemany(
+            "INSERT INTO postings (id, question_id, posted_at, ends_at) VALUES (?, ?, ?, ?)",
+            [(q, q, int((START + timedelta(days=q)).timestamp()), int((START + timedelta(days=q + 1)).timestamp()))
+             for q in range(1, args.questions + 1)]
+        )
+        for batch in _batches(_attempts(args.attempts, args.users, args.questions, args.seed)):
+            conn.executemany("""
+                INSERT INTO daily_problem (posting_id, user_id, guild_id, question_id, selected_answer, is_correct,
+                                           response_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(q, u, GUILD_ID, q, database.answer_code(s), s == c, int(t.timestamp())) for q, u, c, s, t in batch])
+    conn.close()
+    return time.perf_counter() - start
+
+
+def migrate(legacy_path, path):
+    shutil.copyfile(legacy_path, path)
+    database.DATABASE_NAME = path
+    start = time.perf_counter()
+    database.init_db()
+    return time.perf_counter() - start
+
+
+def attempts_bytes(conn):
+    # Pages of daily_problem and every index on it
+    return conn.execute("""
+        SELECT SUM(pgsize) FROM dbstat
+        WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'daily_problem')
+    """).fetchone()[0]
+
+
+def single_inserts(conn, compact, args):
+    """
+    Time answers recorded one transaction each, as AnswerButton does, from users with no attempts.
+    """
+    rng = random.Random(args.seed + 1)
+    latencies = []
+    for i in range(args.inserts):
+        question_id, user_id = rng.randrange(1, args.questions + 1), args.users + 1 + i
+        if compact:
+            sql = """
+                INSERT INTO daily_problem (posting_id, user_id, guild_id, question_id, selected_answer, is_correct,
+                                           response_time)
+                VALUES (?, ?, ?, ?, 0, 1, ?)
+            """
+            params = (question_id, user_id, GUILD_ID, question_id, int(time.time()))
+        else:
+            sql = """
+                INSERT INTO daily_problem (user_id, question_id, correct_answer, selected_answer, is_correct, response_time)
+                VALUES (?, ?, 'A', 'A', 1, ?)
+            """
+            params = (user_id, question_id, str(datetime.utcnow()))
+        start = time.perf_counter()
+        with conn:
+            conn.execute(sql, params)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def query_latencies(conn, compact, args):
+    rng = random.Random(args.seed + 2)
+    results = {}
+    for name, (old_sql, compact_sql) in QUERIES.items():
+        sql = compact_sql if compact else old_sql
+        upper = args.users if name == "user attempts" else args.questions
+        latencies = []
+        for _ in range(args.queries):
+            start = time.perf_counter()
+            conn.execute(sql, (rng.randrange(1, upper + 1),)).fetchall()
+            latencies.append(time.perf_counter() - start)
+        results[name] = statistics.median(latencies) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--questions", type=int, default=5_000)
+    parser.add_argument("--inserts", type=int, default=200, help="Single-answer transactions to time")
+    parser.add_argument("--queries", type=int, default=50, help="Calls per read query")
+    parser.add_argument("--dir", help="Directory for the databases (default: a temporary one)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = args.dir or tempfile.mkdtemp(prefix="attempts_bench_")
+    legacy_path = os.path.join(directory, "legacy.db")
+    compact_path = os.path.join(directory, "compact.db")
+    migrated_path = os.path.join(directory, "migrated.db")
+    for path in (legacy_path, compact_path, migrated_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    legacy_fill = fill_legacy(legacy_path, args)
+    compact_fill = fill_compact(compact_path, args)
+    migration = migrate(legacy_path, migrated_path)
+
+    legacy = sqlite3.connect(legacy_path)
+    migrated = sqlite3.connect(migrated_path)
+    count = migrated.execute("SELECT COUNT(*) FROM daily_problem").fetchone()[0]
+    if count != legacy.execute("SELECT COUNT(*) FROM daily_problem").fetchone()[0]:
+        raise SystemExit("Migration lost attempts")
+
+    sizes = {"old": attempts_bytes(legacy), "compact": attempts_bytes(migrated)}
+    fills = {"old": legacy_fill, "compact": compact_fill}
+    reads = {"old": query_latencies(legacy, False, args), "compact": query_latencies(migrated, True, args)}
+    inserts = {"old": single_inserts(legacy, False, args), "compact": single_inserts(migrated, True, args)}
+    legacy.close()
+    migrated.close()
+
+    print(f"{count} attempts, migrated in {migration:.2f}s ({count / migration:,.0f} rows/s)")
+    print(f"{'':<24} {'old':>12} {'compact':>12}")
+    print(f"{'bytes per attempt':<24} {sizes['old'] / count:12.1f} {sizes['compact'] / count:12.1f}")
+    print(f"{'bulk insert rows/s':<24} {count / fills['old']:12,.0f} {count / fills['compact']:12,.0f}")
+    print(f"{'single insert p50 ms':<24} {inserts['old']:12.3f} {inserts['compact']:12.3f}")
+    for name in QUERIES:
+        print(f"{name + ' p50 ms':<24} {reads['old'][name]:12.3f} {reads['compact'][name]:12.3f}")
+
+    if not args.dir:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Generate large, realistic sat_bot.db files for benchmarking.
+
+Questions are spread across the real MATH_DOMAINS/EBRW_DOMAINS taxonomy and round-robin across
+guilds 1..N (guild 1 is the one benchmarks.fakes uses), attempts respect the (guild_id,
+question_id, user_id) primary key, and user_stats/user_skill_stats are derived from the
+generated attempts so every table is consistent.
+
+    python -m benchmarks.datagen bench.db --questions 100000 --users 50000 --attempts 10000000
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+
+import utils.database as database
+from utils.taxonomy import TAXONOMY
+
+BATCH_SIZE = 50_000
+
+WORDS = (
+    "the of and to in is that for it as with was on be by this are from or an which at have "
+    "not but their more one all has were been other its when can there some these would two "
+    "equation function value graph ratio percent triangle circle angle slope data sample mean "
+    "author passage claim evidence argument text sentence paragraph context purpose structure"
+).split()
+
+def _batched(rows, size=BATCH_SIZE):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def _corpus(rng, length):
+    """
+    Build one long string of random words; passages are random windows into it.
+    """
+    words = []
+    total = 0
+    while total < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words)
+
+
+def _question_rows(rng, count, passage_chars, guilds=1):
+    corpus = _corpus(rng, max(passage_chars * 4, 100_000))
+    for number in range(count):
+        question_type, domain, skill = rng.choice(TAXONOMY)
+        length = rng.randint(passage_chars // 4, passage_chars) if passage_chars else 0
+        start = rng.randrange(len(corpus) - length) if length else 0
+        passage = corpus[start:start + length]
+        # The number keeps every question's content, and so its content hash, unique
+        question = f"{passage}\n\nWhich choice best answers question {number}?"
+        options = [corpus[(offset := rng.randrange(len(corpus) - 120)):offset + rng.randint(5, 120)] for _ in "ABCD"]
+        yield (
+            question_type,
+            question,
+            rng.choice("ABCD"),
+            *options,
+            corpus[(offset := rng.randrange(len(corpus) - 600)):offset + rng.randint(50, 600)],
+            rng.choice(("easy", "medium", "hard")),
+            domain,
+            skill,
+            None,
+            database.question_content_hash(question, *options),
+            1 + number % guilds,
+        )
+
+
+def _attempt_rows(rng, attempts, users, question_ids, correct_answers, question_guilds):
+    """
+    Yield attempts the way /dailyproblem produces them: one question per day, answered once by a
+    random sample of users in the question's guild, which keeps the primary key satisfied. Each
+    question is posted at most once, so its ID doubles as the posting ID.
+    """
+    if not attempts:
+        return
+    per_question = min(users, -(-attempts // len(question_ids)))
+    # One posting per day, ending yesterday, so no attempt is dated in the future
+    postings = -(-attempts // per_question)
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    day = int(today.timestamp()) - postings * 86400
+    posting_order = list(question_ids)
+    rng.shuffle(posting_order)
+
+    remaining = attempts
+    for question_id in posting_order:
+        if remaining <= 0:
+            break
+        correct_answer = database.answer_code(correct_answers[question_id])
+        for user_id in sorted(rng.sample(range(1, users + 1), min(per_question, remaining))):
+            selected_answer = correct_answer if rng.random() < 0.6 else rng.randrange(4)
+            yield (
+                question_id,
+                user_id,
+                question_guilds[question_id],
+                question_id,
+                selected_answer,
+                selected_answer == correct_answer,
+                day + rng.randrange(86400),
+            )
+        remaining -= per_question
+        day += 86400
+
+
+def generate(path, questions=1000, archived=100, users=1000, attempts=10_000, passage_chars=1000, seed=0,
+             guilds=1):
+    """
+    Create a fresh database at ``path`` and fill it with generated data. Returns per-table timings.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    database.DATABASE_NAME = path
+    database.init_db()
+
+    conn = database.get_database_connection()
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MiB keeps the daily_problem user_id index hot
+    conn.execute("PRAGMA temp_store = MEMORY")
+    timings = {}
+
+    started = time.perf_counter()
+    with conn:
+        for batch in _batched(_question_rows(rng, questions, passage_chars, guilds)):
+            conn.executemany("""
+                INSERT INTO questions (type, question, correct_answer, option_a, option_b, option_c, option_d,
+                                       explanation, difficulty, domain, skill, image_url, content_hash, guild_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+        # Archived questions keep IDs that no longer exist in questions, as archive_question leaves them
+        archive_ids = itertools.count(questions + 1)
+        for batch in _batched(_question_rows(rng, archived, passage_chars, guilds)):
+            conn.executemany("""
+                INSERT INTO question_archives (id, type, question, correct_answer, option_a, option_b, option_c,
+                                               option_d, explanation, difficulty, domain, skill, image_url,
+                                               content_hash, guild_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(next(archive_ids), *row) for row in batch])
+    timings["questions"] = time.perf_counter() - started
+
+    correct_answers = dict(conn.execute("SELECT id, correct_answer FROM questions"))
+    question_guilds = dict(conn.execute("SELECT id, guild_id FROM questions"))
+    question_ids = sorted(correct_answers)
+    attempts = min(attempts, users * len(question_ids)) if question_ids else 0
+
+    started = time.perf_counter()
+    with conn:
+        for batch in _batched(_attempt_rows(rng, attempts, users, question_ids, correct_answers, question_guilds)):
+            conn.executemany("""
+                INSERT INTO daily_problem (posting_id, user_id, guild_id, question_id, selected_answer, is_correct,
+                                           response_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, batch)
+        conn.execute("""
+            INSERT INTO postings (id, question_id, posted_at, ends_at)
+            SELECT posting_id, MIN(question_id), MIN(response_time), MAX(response_time)
+            FROM daily_problem
+            GROUP BY posting_id
+        """)
+    timings["daily_problem"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with conn:
+        conn.execute("""
+            INSERT INTO user_stats (guild_id, user_id, total_correct, total_attempts)
+            SELECT guild_id, user_id, SUM(is_correct), COUNT(*)
+            FROM daily_problem
+            GROUP BY guild_id, user_id
+        """)
+        conn.execute("""
+            INSERT INTO user_skill_stats (guild_id, user_id, skill_id, total_correct, total_attempts)
+            SELECT dp.guild_id, dp.user_id, s.id, SUM(dp.is_correct), COUNT(*)
+            FROM daily_problem dp
+            JOIN questions q ON q.id = dp.question_id
+            JOIN skills s ON s.question_type = q.type AND s.domain = q.domain AND s.skill = q.skill
+            GROUP BY dp.guild_id, dp.user_id, s.id
+        """)
+    timings["stats"] = time.perf_counter() - started
+
+    conn.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Database file to create (overwritten if it exists)")
+    parser.add_argument("--questions", type=int, default=100_000)
+    parser.add_argument("--archived", type=int, default=1_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--attempts", type=int, default=10_000_000, help="Rows in daily_problem")
+    parser.add_argument("--passage-chars", type=int, default=1500, help="Maximum question passage length")
+    parser.add_argument("--guilds", type=int, default=1, help="Guilds to spread questions and attempts over")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    timings = generate(args.path, args.questions, args.archived, args.users, args.attempts,
+                       args.passage_chars, args.seed, args.guilds)
+    for table, seconds in timings.items():
+        print(f"{table:<16} {seconds:8.2f}s")
+    print(f"{'file size':<16} {os.path.getsize(args.path) / 1024 / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import asyncio
+import itertools
+
+import discord
+
+
+_message_ids = itertools.count(1)
+
+
+class FakeRole:
+    def __init__(self, role_id):
+        self.id = role_id
+
+
+class FakeUser:
+    """
+    Stand-in for discord.User / discord.Member with only the attributes the handlers read.
+    """
+
+    def __init__(self, user_id, roles=()):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = f"User {user_id}"
+        self.mention = f"<@{user_id}>"
+        self.roles = [FakeRole(role_id) for role_id in roles]
+
+
+class FakeMessage:
+    """
+    Stand-in for discord.Message. Edits and replies are recorded instead of sent.
+    """
+
+    def __init__(self, embeds=None, view=None):
+        self.id = next(_message_ids)
+        self.embeds = list(embeds or [])
+        self.view = view
+        self.edits = 0
+        self.replies = []
+
+    async def edit(self, *, embed=None, embeds=None, view=discord.utils.MISSING, **kwargs):
+        if embed is not None:
+            self.embeds = [embed]
+        elif embeds is not None:
+            self.embeds = list(embeds)
+        if view is not discord.utils.MISSING:
+            self.view = view
+        self.edits += 1
+        return self
+
+    async def reply(self, content=None, *, embed=None, embeds=None, **kwargs):
+        reply = FakeMessage(embeds=[embed] if embed is not None else embeds)
+        self.replies.append(reply)
+        return reply
+
+
+def _as_embeds(embed, embeds):
+    if embed is not None:
+        return [embed]
+    return list(embeds or [])
+
+
+class FakeResponse:
+    """
+    Stand-in for discord.InteractionResponse. Like the real one, it can only be used once.
+    """
+
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    def _use(self):
+        if self._done:
+            raise discord.InteractionResponded(self._interaction)
+        self._done = True
+
+    async def send_message(self, content=None, *, embed=None, embeds=None, view=None, ephemeral=False, **kwargs):
+        self._use()
+        message = FakeMessage(embeds=_as_embeds(embed, embeds), view=view)
+        self._interaction.original_message = message
+        self._interaction.sent.append(message)
+
+    async def edit_message(self, *, embed=None, embeds=None, view=discord.utils.MISSING, **kwargs):
+        self._use()
+        message = self._interaction.message
+        if message is None:
+            message = self._interaction.message = FakeMessage()
+        await message.edit(embed=embed, embeds=embeds, view=view)
+
+    async def defer(self, *, ephemeral=False, thinking=False):
+        self._use()
+
+    async def send_modal(self, modal):
+        self._use()
+        self._interaction.modals.append(modal)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, *, embed=None, embeds=None, view=None, ephemeral=False, **kwargs):
+        message = FakeMessage(embeds=_as_embeds(embed, embeds), view=view)
+        self._interaction.sent.append(message)
+        return message
+
+
+class FakeGuild:
+    """
+    Stand-in for discord.Guild. Members are created lazily so leaderboards can resolve any user ID.
+    """
+
+    def __init__(self, guild_id=1, cached_members=True):
+        self.id = guild_id
+        self.cached_members = cached_members
+        self._members = {}
+        self._channels = {}
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    def get_member(self, user_id):
+        if not self.cached_members:
+            return None
+        return self._members.setdefault(user_id, FakeUser(user_id))
+
+    async def fetch_member(self, user_id):
+        return self._members.setdefault(user_id, FakeUser(user_id))
+
+
+class FakeChannel:
+    """
+    Stand-in for discord.TextChannel. Sent messages are recorded; latency stands in for the
+    round trip to Discord.
+    """
+
+    def __init__(self, channel_id, guild=None, latency=0.0):
+        self.id = channel_id
+        self.guild = guild or FakeGuild()
+        self.mention = f"<#{channel_id}>"
+        self.latency = latency
+        self.sent = []
+        self.guild._channels[channel_id] = self
+
+    async def send(self, content=None, *, embed=None, embeds=None, view=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = FakeMessage(embeds=_as_embeds(embed, embeds), view=view)
+        self.sent.append(message)
+        return message
+
+
+class FakeClient:
+    """
+    Stand-in for the commands.Bot instance handed to handlers as ``bot`` and ``interaction.client``.
+    """
+
+    def __init__(self):
+        self.user = FakeUser(0)
+
+    async def fetch_user(self, user_id):
+        return FakeUser(user_id)
+
+
+class FakeInteraction:
+    """
+    Stand-in for discord.Interaction that records everything a handler sends back.
+    """
+
+    def __init__(self, user, guild=None, client=None, message=None, channel_id=1):
+        self.user = user
+        self.guild = guild or FakeGuild()
+        self.guild_id = self.guild.id
+        self.channel_id = channel_id
+        self.client = client or FakeClient()
+        self.message = message
+        self.original_message = None
+        self.sent = []
+        self.modals = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def original_response(self):
+        return self.original_message
@@ -0,0 +1,135 @@
+"""
+Correctness check and benchmark for the image URL validator.
+
+Starts a local stand-in image host with aiohttp.web, checks that ImageValidator classifies
+its routes correctly (images, non-images, missing files, hosts without HEAD, redirects and
+slow responses), then times a bulk check of many URLs cold and from the cache.
+
+    python -m benchmarks.image_check_bench --urls 2000 --latency 0.05
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from aiohttp import web
+
+from utils.images import ImageValidator
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+def make_app(latency, slow_seconds):
+    requests = {"count": 0}
+
+    @web.middleware
+    async def count_requests(request, handler):
+        requests["count"] += 1
+        await asyncio.sleep(latency)
+        return await handler(request)
+
+    async def image(request):
+        return web.Response(body=PNG_HEADER, content_type="image/png")
+
+    async def page(request):
+        return web.Response(text="<html></html>", content_type="text/html")
+
+    async def missing(request):
+        raise web.HTTPNotFound()
+
+    async def no_head(request):
+        if request.method == "HEAD":
+            raise web.HTTPMethodNotAllowed("HEAD", ["GET"])
+        return web.Response(body=PNG_HEADER, content_type="image/jpeg")
+
+    async def redirect(request):
+        raise web.HTTPFound("/image.png")
+
+    async def slow(request):
+        await asyncio.sleep(slow_seconds)
+        return web.Response(body=PNG_HEADER, content_type="image/png")
+
+    app = web.Application(middlewares=[count_requests])
+    app.router.add_route("*", "/image.png", image)
+    app.router.add_route("*", "/bulk/{name}", image)
+    app.router.add_route("*", "/page", page)
+    app.router.add_route("*", "/missing.png", missing)
+    app.router.add_route("*", "/no-head.jpg", no_head)
+    app.router.add_route("*", "/redirect", redirect)
+    app.router.add_route("*", "/slow.png", slow)
+    return app, requests
+
+
+async def run(args):
+    app, requests = make_app(args.latency, args.timeout * 2)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    validator = ImageValidator(timeout=args.timeout, concurrency=args.concurrency)
+    failures = 0
+    try:
+        expected = {
+            "/image.png": True,
+            "/page": False,
+            "/missing.png": False,
+            "/no-head.jpg": True,
+            "/redirect": True,
+            "/slow.png": False,
+        }
+        for path, ok in expected.items():
+            check = await validator.check(base + path)
+            status = "OK" if check.ok == ok else "FAIL"
+            failures += check.ok != ok
+            print(f"{path:<16} ok={check.ok!s:<5} reason={check.reason or '-':<48} {status}")
+
+        # Unreachable host: nothing listens on port 9 locally
+        check = await validator.check("http://127.0.0.1:9/image.png")
+        failures += check.ok
+        print(f"{'unreachable':<16} ok={check.ok!s:<5} reason={check.reason or '-':<48} {'FAIL' if check.ok else 'OK'}")
+
+        # Concurrent checks of the same URL share one request
+        validator.clear_cache()
+        before = requests["count"]
+        await asyncio.gather(*(validator.check(base + "/image.png") for _ in range(50)))
+        shared = requests["count"] - before
+        failures += shared != 1
+        print(f"{'50 x same URL':<16} requests={shared} {'OK' if shared == 1 else 'FAIL'}")
+
+        urls = [f"{base}/bulk/{i}.png" for i in range(args.urls)]
+        start = time.perf_counter()
+        results = await validator.check_many(urls)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        await validator.check_many(urls)
+        warm = time.perf_counter() - start
+        bad = sum(not check.ok for check in results.values())
+        failures += bad
+        serial = args.urls * args.latency
+        print(f"bulk {args.urls} URLs: cold={cold:.3f}s (serial would be ~{serial:.1f}s)  "
+              f"cached={warm * 1000:.2f}ms  invalid={bad}")
+    finally:
+        await validator.close()
+        await runner.cleanup()
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=2_000, help="URLs in the bulk check")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the stand-in host waits per request")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    if failures:
+        print(f"{failures} check(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
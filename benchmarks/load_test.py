@@ -0,0 +1,253 @@
+"""
+Synthetic load test for the bot's command handlers.
+
+Drives the real handlers with the stand-ins from benchmarks.fakes against a seeded
+temporary SQLite database, then reports throughput and p50/p99 latency per scenario.
+
+    python -m benchmarks.load_test --users 2000 --window 60
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import utils.database as database
+from benchmarks.datagen import generate
+from benchmarks.fakes import FakeChannel, FakeClient, FakeGuild, FakeInteraction, FakeUser
+from commands.daily_problem import (
+    QUESTION_DURATION, AnswerButton, DetailsButton, create_posting, handle_daily_problem_command, post_question
+)
+from commands.leaderboard import handle_leaderboard_command
+from commands.stats import handle_stats_command
+from commands.view_archives import handle_view_archives_command
+from commands.view_questions import ViewQuestionsPaginator, handle_view_questions_command
+from utils.question_cache import get_question_payload
+
+
+class Recorder:
+    """
+    Collects per-operation latencies for a scenario.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.started = None
+        self.finished = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finished = time.perf_counter()
+
+    async def timed(self, coro, arrival=None):
+        """
+        Await ``coro`` and record its latency, measured from ``arrival`` if given so queueing counts.
+        """
+        start = time.perf_counter() if arrival is None else arrival
+        try:
+            await coro
+        except Exception:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - start)
+
+    def report(self):
+        wall = self.finished - self.started
+        ops = len(self.latencies)
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+        return (
+            f"{self.name:<24} ops={ops:<6} errors={self.errors:<4} "
+            f"wall={wall:8.3f}s  throughput={ops / wall if wall else 0:9.1f}/s  "
+            f"p50={percentile(50):8.2f}ms  p99={percentile(99):8.2f}ms  "
+            f"mean={statistics.fmean(ordered) * 1000 if ordered else 0:8.2f}ms"
+        )
+
+
+def _question_ids():
+    conn = database.get_database_connection()
+    ids = [row[0] for row in conn.execute("SELECT id FROM questions")]
+    conn.close()
+    return ids
+
+
+async def _cancel_background_tasks():
+    """
+    Cancel the countdown timers the daily problem handler leaves running.
+    """
+    current = asyncio.current_task()
+    tasks = [task for task in asyncio.all_tasks() if task is not current]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def scenario_daily_problem(posts):
+    admin = FakeUser(10_000_000)
+    client = FakeClient()
+    with Recorder("dailyproblem") as recorder:
+        for _ in range(posts):
+            interaction = FakeInteraction(admin, client=client)
+            await recorder.timed(handle_daily_problem_command(client, interaction))
+    await _cancel_background_tasks()
+    return recorder
+
+
+async def scenario_fan_out(posts, channels, latency, question_id):
+    """
+    Post one question to ``channels`` channels at once, each send taking ``latency`` seconds.
+    """
+    guild = FakeGuild()
+    targets = [FakeChannel(channel_id, guild=guild, latency=latency) for channel_id in range(1, channels + 1)]
+    payload = get_question_payload(question_id)
+    with Recorder(f"fan-out post ({channels})") as recorder:
+        for _ in range(posts):
+            await recorder.timed(post_question(payload, targets))
+    await _cancel_background_tasks()
+    return recorder
+
+
+async def scenario_answer_clicks(users, window, question_id, rng):
+    """
+    ``users`` distinct members each click one answer button at a random point within ``window`` seconds.
+    """
+    conn = database.get_database_connection()
+    with conn:
+        posting_id = create_posting(conn, question_id, int(time.time()) + QUESTION_DURATION)
+    conn.close()
+    buttons = {label: AnswerButton(label=label, question_id=question_id, posting_id=posting_id) for label in "ABCD"}
+    guild = FakeGuild()
+    client = FakeClient()
+    arrivals = sorted(rng.uniform(0, window) for _ in range(users))
+
+    with Recorder(f"answer clicks ({users})") as recorder:
+        origin = time.perf_counter()
+        pending = []
+        for user_id, offset in enumerate(arrivals, 1):
+            delay = origin + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            interaction = FakeInteraction(FakeUser(user_id), guild=guild, client=client)
+            button = buttons[rng.choice("ABCD")]
+            pending.append(asyncio.create_task(
+                recorder.timed(button.callback(interaction), arrival=origin + offset)
+            ))
+        await asyncio.gather(*pending)
+    return recorder
+
+
+async def scenario_details_clicks(clicks, question_id):
+    button = DetailsButton(question_id)
+    with Recorder("details clicks") as recorder:
+        for user_id in range(1, clicks + 1):
+            await recorder.timed(button.callback(FakeInteraction(FakeUser(user_id))))
+    return recorder
+
+
+async def scenario_leaderboard(calls, cached_members):
+    guild = FakeGuild(cached_members=cached_members)
+    name = "leaderboard" if cached_members else "leaderboard (uncached)"
+    with Recorder(name) as recorder:
+        for _ in range(calls):
+            await recorder.timed(handle_leaderboard_command(FakeInteraction(FakeUser(1), guild=guild)))
+    return recorder
+
+
+async def scenario_stats(calls, users, rng):
+    with Recorder("stats") as recorder:
+        for _ in range(calls):
+            interaction = FakeInteraction(FakeUser(rng.randrange(1, users + 1)))
+            await recorder.timed(handle_stats_command(interaction))
+    return recorder
+
+
+async def _page_through(recorder, message):
+    """
+    Click "next" on a paginator message until the last page is reached.
+    """
+    view = message.view
+    if not isinstance(view, ViewQuestionsPaginator):
+        return
+    while view.next_page_button in view.children:
+        interaction = FakeInteraction(FakeUser(1), message=message)
+        await recorder.timed(view.next_page_button.callback(interaction))
+
+
+async def scenario_view_questions(calls):
+    with Recorder("viewquestions") as recorder:
+        for _ in range(calls):
+            interaction = FakeInteraction(FakeUser(1))
+            await recorder.timed(handle_view_questions_command(interaction))
+    with Recorder("viewquestions paging") as paging:
+        for message in interaction.sent:
+            await _page_through(paging, message)
+    return recorder, paging
+
+
+async def scenario_view_archives(calls):
+    with Recorder("viewarchives") as recorder:
+        for _ in range(calls):
+            interaction = FakeInteraction(FakeUser(1))
+            await recorder.timed(handle_view_archives_command(interaction))
+    with Recorder("viewarchives paging") as paging:
+        for message in interaction.sent:
+            await _page_through(paging, message)
+    return recorder, paging
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    results = [await scenario_daily_problem(args.posts)]
+
+    question_id = rng.choice(_question_ids())
+    results.append(await scenario_fan_out(max(1, args.posts // 10), args.channels, args.send_latency, question_id))
+    results.append(await scenario_answer_clicks(args.users, args.window, question_id, rng))
+    results.append(await scenario_details_clicks(args.calls, question_id))
+    results.append(await scenario_leaderboard(args.calls, cached_members=True))
+    results.append(await scenario_leaderboard(args.calls, cached_members=False))
+    results.append(await scenario_stats(args.calls, args.seed_users, rng))
+    results.extend(await scenario_view_questions(max(1, args.calls // 10)))
+    results.extend(await scenario_view_archives(max(1, args.calls // 10)))
+    await _cancel_background_tasks()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000, help="Members clicking an answer button")
+    parser.add_argument("--window", type=float, default=60.0, help="Seconds over which the clicks arrive")
+    parser.add_argument("--posts", type=int, default=50, help="Number of /dailyproblem posts")
+    parser.add_argument("--channels", type=int, default=50, help="Channels each fan-out post goes to")
+    parser.add_argument("--send-latency", type=float, default=0.05, help="Simulated seconds per Discord send")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per leaderboard/stats/details scenario")
+    parser.add_argument("--questions", type=int, default=500, help="Questions to seed")
+    parser.add_argument("--archived", type=int, default=100, help="Archived questions to seed")
+    parser.add_argument("--seed-users", type=int, default=1000, help="Users with existing stats to seed")
+    parser.add_argument("--attempts", type=int, default=20_000, help="Past attempts to seed")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--db", help="Use this existing database file instead of a seeded temporary one (answers are written to it)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            database.DATABASE_NAME = args.db
+        else:
+            generate(os.path.join(tmp, "sat_bot.db"), args.questions, args.archived, args.seed_users,
+                     args.attempts, seed=args.seed)
+        for recorder in asyncio.run(run(args)):
+            print(recorder.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark and correctness check for the embed pagination paths.
+
+Times create_paginated_embeds from view_questions.py and view_archives.py and SmartEmbed from
+add_question.py on generated content, then checks that every page respects Discord's embed
+limits and that no question text was lost between pages.
+
+    python -m benchmarks.pagination_bench --questions 10000 --passage-chars 4000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.datagen import TAXONOMY, _corpus
+from commands import view_archives, view_questions
+from commands.add_question import SmartEmbed
+
+# Discord embed limits, see https://discord.com/developers/docs/resources/message#embed-object-embed-limits
+EMBED_TITLE_LIMIT = 256
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_FIELD_COUNT_LIMIT = 25
+EMBED_FIELD_NAME_LIMIT = 256
+EMBED_FIELD_VALUE_LIMIT = 1024
+EMBED_FOOTER_LIMIT = 2048
+EMBED_TOTAL_LIMIT = 6000
+
+
+def check_embed_limits(embed):
+    """
+    Return a list of the Discord limits ``embed`` violates; empty when the embed is valid.
+    """
+    problems = []
+    if len(embed.title or "") > EMBED_TITLE_LIMIT:
+        problems.append(f"title is {len(embed.title)} characters")
+    if len(embed.description or "") > EMBED_DESCRIPTION_LIMIT:
+        problems.append(f"description is {len(embed.description)} characters")
+    if len(embed.fields) > EMBED_FIELD_COUNT_LIMIT:
+        problems.append(f"{len(embed.fields)} fields")
+    for index, field in enumerate(embed.fields):
+        if len(field.name or "") > EMBED_FIELD_NAME_LIMIT:
+            problems.append(f"field {index} name is {len(field.name)} characters")
+        if len(field.value or "") > EMBED_FIELD_VALUE_LIMIT:
+            problems.append(f"field {index} value is {len(field.value)} characters")
+    if len(embed.footer.text or "") > EMBED_FOOTER_LIMIT:
+        problems.append(f"footer is {len(embed.footer.text)} characters")
+    if len(embed) > EMBED_TOTAL_LIMIT:
+        problems.append(f"total is {len(embed)} characters")
+    return problems
+
+
+def check_pages(embeds, expected_texts):
+    """
+    Check every page's limits and that the pages together contain all of ``expected_texts``.
+
+    Whitespace is ignored when comparing content because splitting may drop it at page breaks.
+    """
+    problems = []
+    total_pages = len(embeds)
+    for page_number, embed in enumerate(embeds, 1):
+        problems.extend(f"page {page_number}: {problem}" for problem in check_embed_limits(embed))
+        if f"{page_number}" not in (embed.footer.text or "") or f"{total_pages}" not in (embed.footer.text or ""):
+            problems.append(f"page {page_number}: footer {embed.footer.text!r} does not number it of {total_pages}")
+
+    rendered = "".join("".join((embed.description or "").split()) for embed in embeds)
+    expected = "".join("".join(text.split()) for text in expected_texts)
+    if rendered != expected:
+        problems.append(f"content mismatch: rendered {len(rendered)} characters, expected {len(expected)}")
+    return problems
+
+
+def question_rows(rng, count, passage_chars, archived=False):
+    """
+    Build rows in the column order the view commands select.
+    """
+    corpus = _corpus(rng, max(passage_chars * 4, 100_000))
+    rows = []
+    for question_id in range(1, count + 1):
+        question_type, domain, skill = rng.choice(TAXONOMY)
+        length = rng.randint(passage_chars // 2, passage_chars)
+        start = rng.randrange(len(corpus) - length)
+        # Keep some line breaks so the splitter has natural break points
+        passage = corpus[start:start + length].replace(" the ", "\nthe ")
+        row = (
+            question_id, question_type, passage, rng.choice("ABCD"),
+            *(corpus[(offset := rng.randrange(len(corpus) - 100)):offset + rng.randint(5, 100)] for _ in "ABCD"),
+            rng.choice(("easy", "medium", "hard")), domain, skill,
+        )
+        if archived:
+            row += (f"2024-{rng.randint(1, 12):02}-{rng.randint(1, 28):02} 12:00:00",)
+        rows.append(row)
+    return rows
+
+
+def time_call(function, iterations):
+    timings = []
+    result = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def bench_view(name, module, formatter, rows, iterations):
+    embeds, timings = time_call(lambda: module.create_paginated_embeds(rows, name), iterations)
+    expected = [formatter(row)[0] for row in rows]
+    return name, len(embeds), timings, check_pages(embeds, expected)
+
+
+def bench_smart_embed(rng, fields, field_chars, description_chars, iterations):
+    corpus = _corpus(rng, max(field_chars, description_chars) * 4 + 1000)
+    values = [corpus[offset:offset + field_chars] for offset in
+              (rng.randrange(len(corpus) - field_chars) for _ in range(fields))]
+    description = corpus[:description_chars]
+
+    def build():
+        smart_embed = SmartEmbed("SmartEmbed benchmark")
+        smart_embed.set_description(description)
+        for index, value in enumerate(values):
+            smart_embed.add_field(f"Field {index}", value, False)
+        return smart_embed.get_embeds()
+
+    embeds, timings = time_call(build, iterations)
+    problems = []
+    for page_number, embed in enumerate(embeds, 1):
+        problems.extend(f"page {page_number}: {problem}" for problem in check_embed_limits(embed))
+    rendered_fields = sum(len(embed.fields) for embed in embeds)
+    if rendered_fields != fields:
+        problems.append(f"{rendered_fields} fields rendered, expected {fields}")
+    return f"SmartEmbed ({fields} fields)", len(embeds), timings, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=10_000, help="Short questions per view")
+    parser.add_argument("--long-questions", type=int, default=1_000, help="Questions with long passages")
+    parser.add_argument("--passage-chars", type=int, default=4_000, help="Length of the long passages")
+    parser.add_argument("--giant-chars", type=int, default=200_000, help="Length of a single oversized question")
+    parser.add_argument("--fields", type=int, default=2_000, help="Fields added to SmartEmbed")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scenarios = []
+    for label, module, formatter, archived in (
+        ("questions", view_questions, view_questions.format_question, False),
+        ("archives", view_archives, view_archives.format_archived_question, True),
+    ):
+        for count, chars, suffix in (
+            (args.questions, 200, f"{args.questions} short"),
+            (args.long_questions, args.passage_chars, f"{args.long_questions} x {args.passage_chars} chars"),
+            (1, args.giant_chars, f"1 x {args.giant_chars} chars"),
+        ):
+            rows = question_rows(rng, count, chars, archived)
+            scenarios.append(bench_view(f"{label}: {suffix}", module, formatter, rows, args.iterations))
+    scenarios.append(bench_smart_embed(rng, args.fields, 1000, 5000, args.iterations))
+
+    failures = 0
+    for name, pages, timings, problems in scenarios:
+        print(f"{name:<36} pages={pages:<6} median={statistics.median(timings) * 1000:10.2f}ms  "
+              f"min={min(timings) * 1000:10.2f}ms  {'OK' if not problems else f'{len(problems)} problem(s)'}")
+        for problem in problems[:10]:
+            print(f"    {problem}")
+        failures += bool(problems)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
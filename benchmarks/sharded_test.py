@@ -0,0 +1,191 @@
+"""
+End-to-end test of the sharded topology on one machine.
+
+Seeds a database with one guild per shard process, starts the real writer process
+(python -m utils.writer) and several shard processes that click answer buttons through the
+real handlers, with their writes forwarded over the writer socket and their reads (answer
+distributions, /stats) going straight to the WAL database. Each guild reposts a question its
+users already answered, as a new posting, and every user also clicks twice, to check that
+earlier answers don't block the new posting but duplicate answers to it are still rejected. Afterwards the attempt log and the stats are
+checked against the clicks that were made.
+
+    python -m benchmarks.sharded_test --processes 4 --users 2000 --window 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import utils.database as database
+from benchmarks.datagen import generate
+from benchmarks.fakes import FakeClient, FakeGuild, FakeInteraction, FakeUser
+from benchmarks.load_test import Recorder
+from commands.daily_problem import create_posting
+
+WRITER_START_TIMEOUT = 30
+
+
+async def _shard(guild_id, question_id, posting_id, users, window, seed):
+    # Imported after WRITER_SOCKET is set, like a shard process started by run_sharded.py
+    from commands.daily_problem import AnswerButton
+    from commands.stats import handle_stats_command
+
+    rng = random.Random(seed)
+    guild = FakeGuild(guild_id)
+    client = FakeClient()
+    buttons = {label: AnswerButton(label=label, question_id=question_id, posting_id=posting_id) for label in "ABCD"}
+    arrivals = sorted(rng.uniform(0, window) for _ in range(users))
+    interactions = []
+    results = {}
+
+    async def click(user_id, arrival):
+        interaction = FakeInteraction(FakeUser(user_id), guild=guild, client=client)
+        interactions.append(interaction)
+        await recorder.timed(buttons[rng.choice("ABCD")].callback(interaction), arrival=arrival)
+
+    with Recorder(f"answers (guild {guild_id})") as recorder:
+        origin = time.perf_counter()
+        pending = []
+        for user_id, offset in enumerate(arrivals, 1):
+            delay = origin + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            pending.append(asyncio.create_task(click(user_id, origin + offset)))
+        await asyncio.gather(*pending)
+    results["answers"] = recorder
+
+    # A second click from everyone must be rejected, not recorded
+    with Recorder(f"repeat clicks (guild {guild_id})") as recorder:
+        await asyncio.gather(*(click(user_id, None) for user_id in range(1, users + 1)))
+    results["repeats"] = recorder
+
+    with Recorder(f"stats reads (guild {guild_id})") as recorder:
+        for user_id in rng.sample(range(1, users + 1), min(users, 200)):
+            await recorder.timed(handle_stats_command(FakeInteraction(FakeUser(user_id), guild=guild)))
+    results["stats"] = recorder
+
+    titles = [message.embeds[0].title for interaction in interactions for message in interaction.sent]
+    return results, titles
+
+
+def _shard_process(db_path, socket_path, guild_id, question_id, posting_id, users, window, seed, queue):
+    os.environ["WRITER_SOCKET"] = socket_path
+    database.DATABASE_NAME = db_path
+    results, titles = asyncio.run(_shard(guild_id, question_id, posting_id, users, window, seed))
+    queue.put((guild_id, [recorder.report() for recorder in results.values()], titles))
+
+
+def check(conn, guild_ids, posting_ids, users):
+    """
+    Return a list of problems: missing or extra attempts, or stats that drifted from the log.
+    """
+    problems = []
+    for guild_id, posting_id in zip(guild_ids, posting_ids):
+        count = conn.execute(
+            "SELECT COUNT(*) FROM daily_problem WHERE posting_id = ? AND guild_id = ?", (posting_id, guild_id)
+        ).fetchone()[0]
+        if count != users:
+            problems.append(f"guild {guild_id}: {count} attempts recorded for {users} users")
+
+    drifted = conn.execute("""
+        SELECT COUNT(*)
+        FROM user_stats s
+        JOIN (
+            SELECT guild_id, user_id, SUM(is_correct) AS correct, COUNT(*) AS attempts
+            FROM daily_problem
+            GROUP BY guild_id, user_id
+        ) d ON d.guild_id = s.guild_id AND d.user_id = s.user_id
+        WHERE s.total_correct != d.correct OR s.total_attempts != d.attempts
+    """).fetchone()[0]
+    if drifted:
+        problems.append(f"{drifted} user(s) have stats that differ from their attempts")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="Shard processes, one guild each")
+    parser.add_argument("--users", type=int, default=2000, help="Members answering in each guild")
+    parser.add_argument("--window", type=float, default=10.0, help="Seconds over which each guild's clicks arrive")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "sat_bot.db")
+        socket_path = os.path.join(tmp, "writer.sock")
+        generate(db_path, args.questions, 0, args.users, args.users * 5, seed=args.seed, guilds=args.processes)
+
+        conn = database.get_database_connection()
+        guild_ids = list(range(1, args.processes + 1))
+        question_ids, posting_ids = [], []
+        for guild_id in guild_ids:
+            # Repost the guild question with the most seeded answers
+            question_id = conn.execute("""
+                SELECT question_id FROM daily_problem WHERE guild_id = ?
+                GROUP BY question_id ORDER BY COUNT(*) DESC LIMIT 1
+            """, (guild_id,)).fetchone()[0]
+            with conn:
+                posting_ids.append(create_posting(conn, question_id, int(time.time()) + 86400))
+            question_ids.append(question_id)
+        conn.close()
+
+        writer = subprocess.Popen(
+            [sys.executable, "-m", "utils.writer", "--socket", socket_path, "--db", db_path],
+            stderr=subprocess.PIPE, text=True
+        )
+        deadline = time.monotonic() + WRITER_START_TIMEOUT
+        while not os.path.exists(socket_path):
+            if writer.poll() is not None or time.monotonic() > deadline:
+                raise SystemExit(f"The writer did not start:\n{writer.stderr.read() if writer.poll() is not None else ''}")
+            time.sleep(0.05)
+
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        started = time.perf_counter()
+        shards = [
+            context.Process(target=_shard_process, args=(
+                db_path, socket_path, guild_id, question_id, posting_id, args.users, args.window, args.seed + guild_id,
+                queue
+            ))
+            for guild_id, question_id, posting_id in zip(guild_ids, question_ids, posting_ids)
+        ]
+        for shard in shards:
+            shard.start()
+        reports = [queue.get() for _ in shards]
+        for shard in shards:
+            shard.join()
+        elapsed = time.perf_counter() - started
+
+        writer.send_signal(signal.SIGINT)
+        _, writer_log = writer.communicate(timeout=60)
+
+        for guild_id, lines, titles in sorted(reports):
+            for line in lines:
+                print(line)
+            failures = sum(title == "Error" for title in titles)
+            if failures:
+                print(f"guild {guild_id}: {failures} answer(s) could not be recorded")
+        print(f"{args.processes} shard process(es), {args.processes * args.users * 2} clicks in {elapsed:.1f}s")
+        for line in writer_log.splitlines():
+            if "Writer stopped" in line:
+                print(line.split(":", 2)[-1])
+
+        conn = database.get_database_connection()
+        problems = check(conn, guild_ids, posting_ids, args.users)
+        conn.close()
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        if problems:
+            sys.exit(1)
+        print("OK: every answer was recorded once and the stats match the attempt log")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Microbenchmarks for the SQL each command runs, for regression tracking.
+
+Run against a database from benchmarks.datagen. Writes happen inside a transaction that is
+rolled back, so the database is left unchanged. Results can be saved with --json and compared
+against a saved baseline with --baseline.
+
+    python -m benchmarks.sql_bench bench.db --json baseline.json
+    python -m benchmarks.sql_bench bench.db --baseline baseline.json
+"""
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+
+def _random_ids(conn, table, column="id", limit=1000):
+    return [row[0] for row in conn.execute(f"SELECT {column} FROM {table} ORDER BY random() LIMIT ?", (limit,))]
+
+
+def build_cases(conn, rng):
+    """
+    Return ``{name: (sql, params_factory, writes)}`` mirroring the queries in commands/, run as
+    the guild with the most users.
+    """
+    guild_id = conn.execute("""
+        SELECT guild_id FROM user_stats GROUP BY guild_id ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()
+    guild_id = guild_id[0] if guild_id else 1
+    question_ids = [row[0] for row in conn.execute(
+        "SELECT id FROM questions WHERE guild_id = ? ORDER BY random() LIMIT 1000", (guild_id,)
+    )] or [1]
+    # Postings shown in the guild, sampled by their answers
+    posting_ids = [row[0] for row in conn.execute(
+        "SELECT posting_id FROM daily_problem WHERE guild_id = ? ORDER BY random() LIMIT 1000", (guild_id,)
+    )] or [1]
+    archive_ids = _random_ids(conn, "question_archives") or [1]
+    user_ids = [row[0] for row in conn.execute(
+        "SELECT user_id FROM user_stats WHERE guild_id = ? ORDER BY random() LIMIT 1000", (guild_id,)
+    )] or [1]
+    new_user = conn.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM user_stats").fetchone()[0]
+    skill = conn.execute("SELECT skill_id FROM user_skill_stats LIMIT 1").fetchone() or (1,)
+
+    posting = lambda: (rng.choice(posting_ids),)
+    user = lambda: (guild_id, rng.choice(user_ids))
+
+    return {
+        "dailyproblem: pick random": ("""
+            SELECT id FROM questions WHERE guild_id IN (?) AND type = ?
+        """, lambda: (guild_id, rng.choice(("math", "ebrw"))), False),
+        "dailyproblem: by id": ("""
+            SELECT id, question, correct_answer, option_a, option_b, option_c, option_d,
+                   explanation, difficulty, domain, skill, image_url, type
+            FROM questions WHERE id = ? AND guild_id IN (?)
+        """, lambda: (rng.choice(question_ids), guild_id), False),
+        "answer: question lookup": ("""
+            SELECT correct_answer, explanation, type, domain, skill, difficulty
+            FROM questions WHERE id = ?
+        """, lambda: (rng.choice(question_ids),), False),
+        "answer: already attempted": (
+            "SELECT is_correct FROM daily_problem WHERE posting_id = ? AND user_id = ? AND guild_id = ?",
+            lambda: (rng.choice(posting_ids), rng.choice(user_ids), guild_id), False),
+        "answer: record attempt": ("""
+            INSERT INTO daily_problem (posting_id, user_id, guild_id, question_id, selected_answer, is_correct,
+                                       response_time)
+            VALUES (?, ?, ?, ?, 0, 1, ?)
+        """, lambda: (rng.choice(posting_ids), new_user, guild_id, rng.choice(question_ids), int(time.time())), True),
+        "answer: update user_stats": ("""
+            INSERT INTO user_stats (guild_id, user_id, total_correct, total_attempts) VALUES (?, ?, 1, 1)
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET
+            total_correct = total_correct + 1, total_attempts = total_attempts + 1
+        """, user, True),
+        "answer: update user_skill_stats": ("""
+            INSERT INTO user_skill_stats (guild_id, user_id, skill_id, total_correct, total_attempts)
+            VALUES (?, ?, ?, 1, 1)
+            ON CONFLICT(guild_id, user_id, skill_id) DO UPDATE SET
+            total_correct = total_correct + 1, total_attempts = total_attempts + 1
+        """, lambda: (guild_id, rng.choice(user_ids), *skill), True),
+        "answer: distribution": ("""
+            SELECT selected_answer, COUNT(*) FROM daily_problem
+            WHERE posting_id = ? GROUP BY selected_answer
+        """, posting, False),
+        "details": (
+            "SELECT type, domain, skill, difficulty FROM questions WHERE id = ?",
+            lambda: (rng.choice(question_ids),), False),
+        "final stats: participants": (
+            "SELECT COUNT(DISTINCT user_id) FROM daily_problem WHERE posting_id = ?",
+            posting, False),
+        "leaderboard: accuracy": ("""
+            SELECT user_id, total_correct, total_attempts, (total_correct * 100.0 / total_attempts) as accuracy
+            FROM user_stats WHERE guild_id = ? AND total_attempts > 0 ORDER BY accuracy DESC LIMIT 10
+        """, lambda: (guild_id,), False),
+        "leaderboard: total correct": ("""
+            SELECT user_id, total_correct, total_attempts
+            FROM user_stats WHERE guild_id = ? AND total_attempts > 0 ORDER BY total_correct DESC LIMIT 10
+        """, lambda: (guild_id,), False),
+        "stats: overall": (
+            "SELECT total_correct, total_attempts FROM user_stats WHERE guild_id = ? AND user_id = ?", user, False),
+        "stats: per skill": ("""
+            SELECT skill_id, total_correct, total_attempts
+            FROM user_skill_stats WHERE guild_id = ? AND user_id = ? AND total_attempts > 0
+        """, user, False),
+        "editstats: skill lookup": ("""
+            SELECT total_correct, total_attempts FROM user_skill_stats
+            WHERE guild_id = ? AND user_id = ? AND skill_id = ?
+        """, lambda: (guild_id, rng.choice(user_ids), *skill), False),
+        "editstats: resum totals": (
+            "SELECT SUM(total_correct), SUM(total_attempts) FROM user_skill_stats WHERE guild_id = ? AND user_id = ?",
+            user, False),
+        "viewquestions": ("""
+            SELECT id, type, question, correct_answer, option_a, option_b, option_c, option_d,
+                   difficulty, domain, skill
+            FROM questions WHERE guild_id = ?
+        """, lambda: (guild_id,), False),
+        "viewarchives": ("""
+            SELECT id, type, question, correct_answer, option_a, option_b, option_c, option_d,
+                   difficulty, domain, skill, archived_at
+            FROM question_archives WHERE guild_id = ? ORDER BY archived_at DESC
+        """, lambda: (guild_id,), False),
+        "archive: copy row": ("""
+            INSERT INTO question_archives (id, type, question, correct_answer, option_a, option_b, option_c,
+                                           option_d, explanation, difficulty, domain, skill, image_url, guild_id)
+            SELECT id, type, question, correct_answer, option_a, option_b, option_c, option_d,
+                   explanation, difficulty, domain, skill, image_url, guild_id
+            FROM questions WHERE id = ? AND guild_id = ?
+        """, lambda: (rng.choice(question_ids), guild_id), True),
+        "recover: lookup": ("""
+            SELECT id, type, question, correct_answer, option_a, option_b, option_c, option_d,
+                   explanation, difficulty, domain, skill, image_url
+            FROM question_archives WHERE id = ?
+        """, lambda: (rng.choice(archive_ids),), False),
+    }
+
+
+def run_case(conn, sql, params_factory, writes, iterations):
+    """
+    Execute ``sql`` ``iterations`` times and return the per-call latencies in seconds.
+    """
+    latencies = []
+    for _ in range(iterations):
+        params = params_factory()
+        if writes:
+            conn.execute("BEGIN")
+        start = time.perf_counter()
+        try:
+            conn.execute(sql, params).fetchall()
+        except sqlite3.IntegrityError:
+            pass
+        latencies.append(time.perf_counter() - start)
+        if writes:
+            conn.execute("ROLLBACK")
+    return latencies
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    return {
+        "iterations": len(ordered),
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Database file generated by benchmarks.datagen")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per point query")
+    parser.add_argument("--scan-iterations", type=int, default=5, help="Calls per full-table query")
+    parser.add_argument("--only", help="Run only cases whose name contains this text")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare p50 against results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Fail when p50 exceeds the baseline by this factor")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.path, isolation_level=None)
+    cases = build_cases(conn, random.Random(args.seed))
+    scans = {"dailyproblem: pick random", "viewquestions", "viewarchives"}
+
+    results = {}
+    for name, (sql, params_factory, writes) in cases.items():
+        if args.only and args.only not in name:
+            continue
+        iterations = args.scan_iterations if name in scans else args.iterations
+        results[name] = summarize(run_case(conn, sql, params_factory, writes, iterations))
+    conn.close()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = []
+    for name, result in results.items():
+        line = f"{name:<28} p50={result['p50_ms']:9.3f}ms  p99={result['p99_ms']:9.3f}ms"
+        if name in baseline:
+            ratio = result["p50_ms"] / baseline[name]["p50_ms"] if baseline[name]["p50_ms"] else 1.0
+            line += f"  vs baseline x{ratio:.2f}"
+            if ratio > args.tolerance:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
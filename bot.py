@@ -1,5 +1,11 @@
+import time
+STARTED = time.perf_counter()  # Before the other imports, which the startup breakdown times
+
 import os
+import asyncio
 import logging
+import signal
+import sqlite3
 from dotenv import load_dotenv
 
 import discord
@@ -8,25 +14,116 @@ from discord import Intents, app_commands
 
 from commands.view_archives import handle_view_archives_command
 from commands.view_questions import handle_view_questions_command
-from utils.database import init_db
+from utils.database import MigrationError, checkpoint_wal, cold_database_name, init_db
+from utils.images import image_validator
+from utils.lifecycle import lifecycle
+from utils.writer import close_writer, writer_socket
 from commands.add_question import handle_add_question_command
-from commands.daily_problem import handle_daily_problem_command
+from commands.daily_problem import handle_daily_problem_command, pause_active_questions, resume_active_questions
+from commands.import_questions import handle_import_questions_command
+from commands.export_data import EXPORT_TABLES, EXPORT_FORMATS, handle_export_data_command
+from commands.recompute_stats import handle_recompute_stats_command
+from commands.schedule import DailyScheduler, handle_schedule_daily_command, handle_unschedule_daily_command
+from commands.shared_bank import handle_shared_bank_command
 from commands.stats import handle_stats_command
+from commands.tier_attempts import TieringJob
+from utils.backup import BackupScheduler, backup_dir
+from utils.snapshot import SnapshotJob, prune_question_changes, restore_snapshot, snapshot_path
+from startup import StartupTimer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+startup = StartupTimer(STARTED)
+startup.record("imports", time.perf_counter() - STARTED)
+
+# Shard settings are read before the bot is created
+load_dotenv()
+
+
+class LifecycleTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Commands stop being taken once a shutdown starts
+        return await lifecycle.admit(interaction)
+
+
+def create_bot():
+    """
+    A plain bot, or with SHARD_COUNT an AutoShardedBot running the shards in SHARD_IDS (default:
+    all of them), so a large deployment can split its shards over several processes.
+    """
+    intents = Intents.default()
+    intents.message_content = True
+
+    shard_count = os.getenv("SHARD_COUNT")
+    if not shard_count:
+        return commands.Bot(command_prefix='/', intents=intents, tree_cls=LifecycleTree)
+
+    shard_ids = os.getenv("SHARD_IDS")
+    return commands.AutoShardedBot(
+        command_prefix='/',
+        intents=intents,
+        tree_cls=LifecycleTree,
+        shard_count=int(shard_count),
+        shard_ids=[int(shard_id) for shard_id in shard_ids.split(",")] if shard_ids else None
+    )
+
 
 # Bot setup
-intents = Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='/', intents=intents)
+bot = create_bot()
+scheduler = DailyScheduler(bot)
+backups = BackupScheduler(backup_dir()) if backup_dir() else None
+tiering = TieringJob() if cold_database_name() else None
+snapshots = SnapshotJob(snapshot_path()) if snapshot_path() else None
+
+
+async def stop_jobs():
+    await asyncio.gather(*(job.stop() for job in (scheduler, backups, tiering, snapshots) if job is not None))
+
+
+async def checkpoint_database():
+    # With a writer process, the writer owns the database and checkpoints it when it stops
+    if not writer_socket():
+        busy, wal_pages, _ = await asyncio.to_thread(checkpoint_wal)
+        logger.info(f"Checkpointed {wal_pages} WAL page(s){' (a reader kept the WAL)' if busy else ''}")
+    # The cold file is written by the tiering job, which runs here either way
+    if tiering is not None and os.path.exists(cold_database_name()):
+        busy, wal_pages, _ = await asyncio.to_thread(checkpoint_wal, cold_database_name())
+        logger.info(f"Checkpointed {wal_pages} cold WAL page(s){' (a reader kept the WAL)' if busy else ''}")
+
+
+# Shutdown order: see utils/lifecycle.py
+lifecycle.on_shutdown("interactions", stop_jobs)
+lifecycle.on_shutdown("interactions", lifecycle.drain_interactions)
+lifecycle.on_shutdown("writes", close_writer)
+lifecycle.on_shutdown("timers", pause_active_questions)
+if snapshots is not None:
+    lifecycle.on_shutdown("snapshot", snapshots.save)
+lifecycle.on_shutdown("database", checkpoint_database)
+lifecycle.on_shutdown("connections", image_validator.close)
 
 # Event when the bot is ready
 @bot.event
 async def on_ready():
     print(f'{bot.user} is now running!')
-    await bot.tree.sync()
+    startup.end("gateway")
+    # Commands are global, so only the process running shard 0 syncs them
+    if 0 in (getattr(bot, "shard_ids", None) or [0]):
+        with startup.phase("tree sync"):
+            await bot.tree.sync()
+        # One process is enough to back up and tier the shared database
+        if backups is not None:
+            backups.start()
+        if tiering is not None:
+            tiering.start()
+    # on_ready runs again after reconnects; the scheduler only needs starting once
+    scheduler.start()
+    if snapshots is not None:
+        snapshots.start()
+    resumed = await resume_active_questions(bot)
+    if resumed:
+        logger.info(f"Resumed {resumed} countdown(s) paused by the last shutdown")
+    await startup.report()
 
 def is_admin(interaction: discord.Interaction) -> bool:
     """
@@ -97,7 +194,7 @@ async def daily_problem(
 async def stats(interaction: discord.Interaction, someone_else: discord.Member = None):
     await handle_stats_command(interaction, someone_else)
 
-from commands.edit_stats import handle_edit_stats_command
+from commands.edit_stats import handle_edit_stats_command, handle_edit_stats_bulk_command
 
 @bot.tree.command(name="editstats", description="Edit a member's SAT stats forcefully")
 @app_commands.describe(member="The member whose stats you want to edit")
@@ -111,6 +208,18 @@ async def edit_stats(interaction: discord.Interaction, member: discord.Member):
     await handle_edit_stats_command(bot, interaction, member)
 
 
+@bot.tree.command(name="editstatsbulk", description="Set many members' skill stats at once from a CSV or JSONL file")
+@app_commands.describe(file="Columns: user_id, question_type, domain, skill, total_correct, total_attempts")
+async def edit_stats_bulk(interaction: discord.Interaction, file: discord.Attachment):
+    if not is_admin(interaction):
+        await interaction.response.send_message(
+            "You do not have permission to use this command.", ephemeral=True
+        )
+        return
+
+    await handle_edit_stats_bulk_command(interaction, file)
+
+
 from commands.leaderboard import handle_leaderboard_command
 
 # Add this under your other command decorators
@@ -144,18 +253,156 @@ async def view_archives(interaction: discord.Interaction):
 
     await handle_view_archives_command(interaction)
 
+@bot.tree.command(name="importquestions", description="Import SAT questions from a CSV or JSONL file")
+@app_commands.describe(file="CSV or JSONL file with one question per row")
+async def import_questions(interaction: discord.Interaction, file: discord.Attachment):
+    if not is_admin(interaction):
+        await interaction.response.send_message(
+            "You do not have permission to use this command.", ephemeral=True
+        )
+        return
+
+    await handle_import_questions_command(interaction, file)
 
-def main():
-    load_dotenv()
+@bot.tree.command(name="exportdata", description="Export a table of the SAT database as a file")
+@app_commands.describe(table="The table to export", file_format="The file format to export to")
+@app_commands.choices(
+    table=[app_commands.Choice(name=table, value=table) for table in EXPORT_TABLES],
+    file_format=[app_commands.Choice(name=file_format.upper(), value=file_format) for file_format in EXPORT_FORMATS]
+)
+async def export_data(
+        interaction: discord.Interaction,
+        table: app_commands.Choice[str],
+        file_format: app_commands.Choice[str] = None
+):
+    if not is_admin(interaction):
+        await interaction.response.send_message(
+            "You do not have permission to use this command.", ephemeral=True
+        )
+        return
+
+    await handle_export_data_command(interaction, table.value, file_format.value if file_format else "csv")
+
+
+@bot.tree.command(name="recomputestats", description="Rebuild everyone's stats from the answer log")
+@app_commands.describe(full="Rebuild every user instead of only those who answered since the last run")
+async def recompute_stats(interaction: discord.Interaction, full: bool = False):
+    if not is_admin(interaction):
+        await interaction.response.send_message(
+            "You do not have permission to use this command.", ephemeral=True
+        )
+        return
+
+    await handle_recompute_stats_command(interaction, full)
+
+
+@bot.tree.command(name="sharedbank", description="Choose whether this server also gets questions from the shared bank")
+@app_commands.describe(enabled="Send questions from the shared bank as well as this server's own")
+@app_commands.guild_only()
+async def shared_bank(interaction: discord.Interaction, enabled: bool):
+    if not is_admin(interaction):
+        await interaction.response.send_message(
+            "You do not have permission to use this command.", ephemeral=True
+        )
+        return
+
+    await handle_shared_bank_command(interaction, enabled)
+
+
+@bot.tree.command(name="scheduledaily", description="Post a daily problem in a channel automatically every day")
+@app_commands.describe(
+    channel="Channel to post the daily problem in",
+    time="Time of day to post, as HH:MM in UTC",
+    question_type="Optional: Only post this type of question"
+)
+@app_commands.choices(
+    question_type=[
+        app_commands.Choice(name="Math", value="math"),
+        app_commands.Choice(name="EBRW", value="ebrw"),
+    ]
+)
+@app_commands.guild_only()
+async def schedule_daily(
+        interaction: discord.Interaction,
+        channel: discord.TextChannel,
+        time: str,
+        question_type: app_commands.Choice[str] = None
+):
+    if not is_admin(interaction):
+        await interaction.response.send_message(
+            "You do not have permission to use this command.", ephemeral=True
+        )
+        return
+
+    await handle_schedule_daily_command(interaction, channel, time, question_type.value if question_type else None)
+
+
+@bot.tree.command(name="unscheduledaily", description="Stop posting daily problems in a channel automatically")
+@app_commands.describe(channel="Channel to stop posting in")
+@app_commands.guild_only()
+async def unschedule_daily(interaction: discord.Interaction, channel: discord.TextChannel):
+    if not is_admin(interaction):
+        await interaction.response.send_message(
+            "You do not have permission to use this command.", ephemeral=True
+        )
+        return
+
+    await handle_unschedule_daily_command(interaction, channel)
+
+
+async def run_bot(token):
+    """
+    Run the bot until SIGINT or SIGTERM, then shut down in order before disconnecting.
+    """
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, lifecycle.request_stop)
+
+    async with bot:
+        # The caches warm up while the gateway connects
+        startup.begin("gateway")
+        runner = asyncio.create_task(bot.start(token))
+        startup.start_warm_up()
+        await lifecycle.wait_for_stop(runner)
+        # The gateway stays connected while the hooks run, so final stats and edits can still be sent
+        await lifecycle.shutdown()
+    # Closing the bot ends start(); raise whatever stopped it if it wasn't a signal, such as a bad token
+    runner.cancel()
     try:
-        init_db()  # Initialize the database
-        logger.info("Database initialized successfully.")
-    except Exception as e:
-        logger.error(f"Error initializing database: {e}")
+        await runner
+    except asyncio.CancelledError:
+        pass
+
+
+def main():
+    # With a writer process, it owns the schema and this process only reads and forwards writes
+    if writer_socket():
+        logger.info(f"Forwarding writes to the writer at {writer_socket()}")
+    else:
+        try:
+            with startup.phase("db init"):
+                init_db()  # Initialize the database
+            logger.info("Database initialized successfully.")
+        except MigrationError as e:
+            # Starting on a half-configured upgrade would file the old data under the wrong guild
+            raise SystemExit(f"Error initializing database: {e}")
+        except Exception as e:
+            logger.error(f"Error initializing database: {e}")
+    if snapshots is not None:
+        with startup.phase("snapshot restore"):
+            restored = restore_snapshot(snapshots.path)
+        if restored:
+            logger.info(f"Restored {restored[0]} cached question(s) from {snapshots.path}, {restored[1]} changed since")
+    else:
+        # Only snapshots read question_changes, and without them nothing else prunes it
+        try:
+            prune_question_changes(keep=1)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not prune question_changes: {e}")
     TOKEN = os.getenv('DISCORD_TOKEN')
 
     if TOKEN:
-        bot.run(TOKEN)
+        asyncio.run(run_bot(TOKEN))
     else:
         logger.error("DISCORD_TOKEN not found in environment variables.")
 
@@ -1,60 +1,18 @@
 import re
-import aiohttp
+import asyncio
 import discord
 from discord import Interaction, Embed, ui, SelectOption
-from utils.database import get_database_connection
-
-# Constants remain the same
-MATH_DOMAINS = {
-    "Algebra": [
-        "Linear equations in one variable",
-        "Linear functions",
-        "Linear equations in two variables",
-        "Systems of two linear equations in two variables",
-        "Linear inequalities in one or two variables"
-    ],
-    "Advanced Math": [
-        "Nonlinear functions",
-        "Nonlinear equations in one variable and systems of equations in two variables",
-        "Equivalent expressions"
-    ],
-    "Problem-Solving and Data Analysis": [
-        "Ratios, rates, proportional relationships, and units",
-        "Percentages",
-        "One-variable data: Distributions and measures of center and spread",
-        "Two-variable data: Models and scatterplots",
-        "Probability and conditional probability",
-        "Inference from sample statistics and margin of error",
-        "Evaluating statistical claims: Observational studies and experiments"
-    ],
-    "Geometry and Trigonometry": [
-        "Area and volume",
-        "Lines, angles, and triangles",
-        "Right triangles and trigonometry",
-        "Circles"
-    ]
-}
-
-EBRW_DOMAINS = {
-    "Information and Ideas": [
-        "Central Ideas and Details",
-        "Inferences",
-        "Command of Evidence"
-    ],
-    "Craft and Structure": [
-        "Words in Context",
-        "Text Structure and Purpose",
-        "Cross-Text Connections"
-    ],
-    "Expression of Ideas": [
-        "Rhetorical Synthesis",
-        "Transitions"
-    ],
-    "Standard English Conventions": [
-        "Boundaries",
-        "Form, Structure, and Sense"
-    ]
-}
+from utils.database import get_database_connection, question_content_hash, find_duplicate_question
+from utils.drafts import question_drafts
+from utils.guilds import question_guild_ids
+from utils.taxonomy import MATH_DOMAINS, EBRW_DOMAINS
+from utils.images import ImageCheck, image_validator
+from utils.image_store import mirror_image
+from utils.pagination import (
+    DESCRIPTION_LIMIT, EMBED_TOTAL_LIMIT, FIELD_COUNT_LIMIT, FIELD_NAME_LIMIT, FIELD_VALUE_LIMIT, TITLE_LIMIT,
+    EmbedPages, split_text
+)
+
 
 
 class SmartEmbed:
@@ -62,46 +20,76 @@ class SmartEmbed:
 
     def __init__(self, title, color=discord.Color.blue()):
         self.pages = []
-        self.current_embed = None
-        self.title = title[:256]
+        self.title = title[:TITLE_LIMIT]
         self.color = color
-        self.create_new_embed()
+        self.new_page()
 
-    def create_new_embed(self):
-        """Create a new embed page"""
-        self.current_embed = Embed(title=self.title, color=self.color)
+    def new_page(self):
+        """Start a new embed page; pages are only turned into embeds by get_embeds"""
+        self.current_page = {"description": None, "fields": [], "image_url": None}
+        self.pages.append(self.current_page)
         self.char_count = len(self.title)
         self.field_count = 0
 
     def should_paginate(self, content_length):
         """Check if content would exceed Discord's limits"""
-        return (self.field_count >= 25 or
-                self.char_count + content_length > 6000)
+        return (self.field_count >= FIELD_COUNT_LIMIT or
+                self.char_count + content_length > EMBED_TOTAL_LIMIT)
 
     def add_field(self, name, value, inline=False):
-        """Add a field, paginating if necessary"""
-        name = name[:256]
-        value = value[:1024]
+        """Add a field, paginating if necessary. Long values continue in extra fields"""
+        name = name[:FIELD_NAME_LIMIT]
+        spans = list(split_text(value, FIELD_VALUE_LIMIT)) or [(0, 0)]
 
-        if self.should_paginate(len(name) + len(value)):
-            self.pages.append(self.current_embed)
-            self.create_new_embed()
+        for index, (start, end) in enumerate(spans):
+            field_name = name if index == 0 else f"{name} (cont.)"[:FIELD_NAME_LIMIT]
+            field_value = value[start:end]
+            if self.should_paginate(len(field_name) + len(field_value)):
+                self.new_page()
 
-        self.current_embed.add_field(name=name, value=value, inline=inline)
-        self.field_count += 1
-        self.char_count += len(name) + len(value)
+            self.current_page["fields"].append((field_name, field_value, inline))
+            self.field_count += 1
+            self.char_count += len(field_name) + len(field_value)
 
     def set_description(self, description):
-        """Set description with proper length limit"""
-        description = description[:4096]
-        self.current_embed.description = description
-        self.char_count += len(description)
+        """Set description, continuing on new pages past the description limit"""
+        for index, (start, end) in enumerate(split_text(description, DESCRIPTION_LIMIT)):
+            chunk = description[start:end]
+            if index > 0 or self.should_paginate(len(chunk)):
+                self.new_page()
+
+            self.current_page["description"] = chunk
+            self.char_count += len(chunk)
+
+    def set_image(self, url):
+        """Show an image on the current page"""
+        self.current_page["image_url"] = url
+
+    def build_embed(self, index):
+        """Build the embed for one page"""
+        page = self.pages[index]
+        embed = Embed(title=self.title, description=page["description"], color=self.color)
+        for name, value, inline in page["fields"]:
+            embed.add_field(name=name, value=value, inline=inline)
+        if page["image_url"]:
+            embed.set_image(url=page["image_url"])
+        return embed
 
     def get_embeds(self):
-        """Get all embeds including the current one"""
-        if self.current_embed and (self.current_embed not in self.pages):
-            self.pages.append(self.current_embed)
-        return self.pages
+        """Get all pages as embeds, each built when it is first shown"""
+        return EmbedPages(len(self.pages), self.build_embed)
+
+
+async def send_draft_expired(interaction: Interaction):
+    """Tell the author their draft is gone, e.g. after it expired"""
+    smart_embed = SmartEmbed("Draft Expired", color=discord.Color.red())
+    smart_embed.set_description("This question draft has expired. Please run `/addquestion` again.")
+    embed = smart_embed.get_embeds()[0]
+
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 class PaginationView(ui.View):
@@ -179,10 +167,11 @@ class AddQuestionModal(ui.Modal, title="Add a New SAT Question"):
             }
         }
 
-        interaction.client.question_data = question_data
+        # Each author gets their own draft so concurrent sessions don't overwrite each other
+        session_id = question_drafts.create(interaction.user.id, question_data)
         domains = MATH_DOMAINS if self.question_type == "math" else EBRW_DOMAINS
         domain_options = [SelectOption(label=domain, value=domain) for domain in domains.keys()]
-        view = DomainSelectionView(domain_options)
+        view = DomainSelectionView(domain_options, session_id)
 
         smart_embed = SmartEmbed("Select Domain")
         smart_embed.set_description(
@@ -207,6 +196,10 @@ class AddQuestionModal(ui.Modal, title="Add a New SAT Question"):
 
 
 class ExplanationModal(ui.Modal, title="Add Explanation"):
+    def __init__(self, session_id):
+        super().__init__()
+        self.session_id = session_id
+
     explanation = ui.TextInput(
         label="Enter explanation",
         style=discord.TextStyle.paragraph,
@@ -222,41 +215,37 @@ class ExplanationModal(ui.Modal, title="Add Explanation"):
     )
 
     async def validate_url(self, url):
+        """
+        Return an ImageCheck for the URL. Obviously malformed links are rejected before any
+        request is made; everything else is checked against the image host.
+        """
         if not url:
-            return True
-
-        # Accept almost any URL that might be an image
-        url_pattern = re.compile(
-            r'^https?:\/\/'  # http:// or https://
-            r'[^\s<>\"]*'  # Anything that's not whitespace or angle brackets
-            r'(?:'  # Non-capturing group for optional image extensions
-            r'\.(jpg|jpeg|png|gif|webp|svg|bmp|ico)|'  # Common image extensions
-            r'\/[\w\-]+\.(jpg|jpeg|png|gif|webp|svg|bmp|ico)|'  # Path ending with extension
-            r'.*\?.*=.*|'  # URLs with query parameters
-            r'.*\.(com|net|org|edu)\/.*|'  # General domain URLs
-            r'.*\/(id|image|img|photo|picture)\/.*|'  # Common image path keywords
-            r'.*\/(static|media|images|photos|pictures)\/.*'  # Common media paths
-            r')'
-        )
+            return ImageCheck(True, None, None)
 
-        return bool(url_pattern.match(url))
+        if not re.match(r'^https?://[^\s<>"]+$', url):
+            return ImageCheck(False, "the link is not a valid http(s) URL", None)
 
-        return bool(url_pattern.match(url))
+        return await image_validator.check(url)
 
     async def on_submit(self, interaction: Interaction):
         await interaction.response.defer(ephemeral=True)
 
         image_url = self.image_url.value.strip() if self.image_url.value else None
 
+        question_data = question_drafts.get(interaction.user.id, self.session_id)
+        if question_data is None:
+            await send_draft_expired(interaction)
+            return
+
         # Store the explanation and image URL regardless of validation
-        interaction.client.question_data["explanation"] = self.explanation.value
-        interaction.client.question_data["image_url"] = image_url
-        question_data = interaction.client.question_data
+        question_data["explanation"] = self.explanation.value
+        question_data["image_url"] = image_url
 
         # If there's an image URL but it's invalid, show a warning but continue the flow
-        if image_url and not await self.validate_url(image_url):
+        image_check = await self.validate_url(image_url)
+        if not image_check.ok:
             await interaction.followup.send(
-                "⚠️ Warning: The image URL provided might not work correctly. "
+                f"⚠️ Warning: The image URL provided might not work correctly: {image_check.reason}. "
                 "The question will still be saved, but please verify the image URL.",
                 ephemeral=True
             )
@@ -273,58 +262,69 @@ class ExplanationModal(ui.Modal, title="Add Explanation"):
         )
 
         embeds = smart_embed.get_embeds()
-        view = CorrectAnswerView(question_data['choices'])
+        view = CorrectAnswerView(question_data['choices'], self.session_id)
 
         if len(embeds) > 1:
             view = PaginationView(embeds)
             view.add_item(CorrectAnswerSelect([
                 SelectOption(label=f"{letter}) {question_data['choices'][letter]}"[:100], value=letter)
                 for letter in ["A", "B", "C", "D"]
-            ]))
+            ], self.session_id))
 
         await interaction.followup.send(embed=embeds[0], view=view, ephemeral=True)
 
 
 class DomainSelectionView(ui.View):
-    def __init__(self, options):
+    def __init__(self, options, session_id):
         super().__init__()
-        self.add_item(DomainSelect(options))
+        self.add_item(DomainSelect(options, session_id))
 
 
 class DomainSelect(ui.Select):
-    def __init__(self, options):
+    def __init__(self, options, session_id):
         super().__init__(placeholder="Select domain...", options=options)
+        self.session_id = session_id
 
     async def callback(self, interaction: Interaction):
-        interaction.client.question_data["domain"] = self.values[0]
-        modal = ExplanationModal()
+        question_data = question_drafts.get(interaction.user.id, self.session_id)
+        if question_data is None:
+            await send_draft_expired(interaction)
+            return
+
+        question_data["domain"] = self.values[0]
+        modal = ExplanationModal(self.session_id)
         await interaction.response.send_modal(modal)
 
 
 class CorrectAnswerView(ui.View):
-    def __init__(self, choices):
+    def __init__(self, choices, session_id):
         super().__init__()
         options = [
             SelectOption(label=f"{letter}) {choices[letter]}"[:100], value=letter)
             for letter in ["A", "B", "C", "D"]
         ]
-        self.add_item(CorrectAnswerSelect(options))
+        self.add_item(CorrectAnswerSelect(options, session_id))
 
 
 class CorrectAnswerSelect(ui.Select):
-    def __init__(self, options):
+    def __init__(self, options, session_id):
         super().__init__(placeholder="Select correct answer...", options=options)
+        self.session_id = session_id
 
     async def callback(self, interaction: Interaction):
-        interaction.client.question_data["correct_answer"] = self.values[0]
-        question_data = interaction.client.question_data
+        question_data = question_drafts.get(interaction.user.id, self.session_id)
+        if question_data is None:
+            await send_draft_expired(interaction)
+            return
+
+        question_data["correct_answer"] = self.values[0]
         question_type = question_data["type"]
         domain = question_data["domain"]
 
         domains = MATH_DOMAINS if question_type == "math" else EBRW_DOMAINS
         skill_options = [SelectOption(label=skill, value=skill) for skill in domains[domain]]
 
-        view = SkillSelectionView(skill_options)
+        view = SkillSelectionView(skill_options, self.session_id)
         smart_embed = SmartEmbed("Select Skill")
         smart_embed.set_description(f"Please select the specific skill under domain **{domain}**")
 
@@ -333,17 +333,23 @@ class CorrectAnswerSelect(ui.Select):
 
 
 class SkillSelectionView(ui.View):
-    def __init__(self, options):
+    def __init__(self, options, session_id):
         super().__init__()
-        self.add_item(SkillSelect(options))
+        self.add_item(SkillSelect(options, session_id))
 
 
 class SkillSelect(ui.Select):
-    def __init__(self, options):
+    def __init__(self, options, session_id):
         super().__init__(placeholder="Select skill...", options=options)
+        self.session_id = session_id
 
     async def callback(self, interaction: Interaction):
-        interaction.client.question_data["skill"] = self.values[0]
+        question_data = question_drafts.get(interaction.user.id, self.session_id)
+        if question_data is None:
+            await send_draft_expired(interaction)
+            return
+
+        question_data["skill"] = self.values[0]
 
         difficulty_options = [
             SelectOption(label="Easy", value="easy"),
@@ -351,7 +357,7 @@ class SkillSelect(ui.Select):
             SelectOption(label="Hard", value="hard")
         ]
 
-        view = DifficultySelectionView(difficulty_options)
+        view = DifficultySelectionView(difficulty_options, self.session_id)
         smart_embed = SmartEmbed("Select Difficulty")
         smart_embed.set_description("Please select the difficulty level for this question.")
 
@@ -360,31 +366,54 @@ class SkillSelect(ui.Select):
 
 
 class DifficultySelectionView(ui.View):
-    def __init__(self, options):
+    def __init__(self, options, session_id):
         super().__init__()
-        self.add_item(FinalizeEverything(options))
+        self.add_item(FinalizeEverything(options, session_id))
 
 
 class FinalizeEverything(ui.Select):
-    def __init__(self, options):
+    def __init__(self, options, session_id):
         super().__init__(placeholder="Select difficulty...", options=options)
+        self.session_id = session_id
 
     async def callback(self, interaction: Interaction):
+        question_data = question_drafts.get(interaction.user.id, self.session_id)
+        if question_data is None:
+            await send_draft_expired(interaction)
+            return
+
         try:
-            question_data = interaction.client.question_data
             question_data["difficulty"] = self.values[0]
 
             conn = get_database_connection()
             c = conn.cursor()
 
+            # Reject questions the guild already has, live or archived, or sees in the shared bank
+            content_hash = question_content_hash(
+                question_data["question"], *(question_data['choices'][letter] for letter in "ABCD")
+            )
+            duplicate = find_duplicate_question(c, content_hash, question_guild_ids(conn, interaction.guild_id))
+            if duplicate:
+                conn.close()
+                question_drafts.discard(interaction.user.id, self.session_id)
+
+                table, duplicate_id = duplicate
+                smart_embed = SmartEmbed("Duplicate Question", color=discord.Color.orange())
+                smart_embed.set_description(
+                    f"This question already exists as Question ID {duplicate_id}"
+                    f"{' (archived)' if table == 'question_archives' else ''}, so it was not added again."
+                )
+                await interaction.response.edit_message(embed=smart_embed.get_embeds()[0], view=None)
+                return
+
             c.execute(
                 '''
                 INSERT INTO questions (
                     type, question, correct_answer, 
                     option_a, option_b, option_c, option_d, 
-                    explanation, difficulty, domain, skill, image_url
+                    explanation, difficulty, domain, skill, image_url, content_hash, guild_id
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''',
                 (
                     question_data["type"],
@@ -398,7 +427,9 @@ class FinalizeEverything(ui.Select):
                     question_data["difficulty"],
                     question_data["domain"],
                     question_data["skill"],
-                    question_data["image_url"]
+                    question_data["image_url"],
+                    content_hash,
+                    interaction.guild_id
                 )
             )
 
@@ -408,6 +439,13 @@ class FinalizeEverything(ui.Select):
             conn.commit()
             conn.close()
 
+            # The draft is saved, so the session is over
+            question_drafts.discard(interaction.user.id, self.session_id)
+
+            # Keep a local copy of the image for daily posts, without holding up the reply
+            if question_data["image_url"]:
+                asyncio.create_task(mirror_image(question_data["image_url"]))
+
             # Update the embed creation part to reflect the new structure
             smart_embed = SmartEmbed(f"Question ID {str(question_id)} Added Successfully", color=discord.Color.green())
 
@@ -419,14 +457,12 @@ class FinalizeEverything(ui.Select):
 
             # Make sure question gets its own embed if it's long
             if len(question_data["question"]) > 1000:
-                smart_embed.pages.append(smart_embed.current_embed)
-                smart_embed.create_new_embed()
+                smart_embed.new_page()
             smart_embed.add_field("Question", question_data["question"], False)
 
             # Second embed: Answer choices and correct answer
             if smart_embed.should_paginate(1000):  # Approximate length of answer choices
-                smart_embed.pages.append(smart_embed.current_embed)
-                smart_embed.create_new_embed()
+                smart_embed.new_page()
 
             answer_choices = (
                 f"A) {question_data['choices']['A']}\n"
@@ -443,16 +479,14 @@ class FinalizeEverything(ui.Select):
 
             # Third embed: Explanation (if needed)
             if len(question_data["explanation"]) > 1000:
-                smart_embed.pages.append(smart_embed.current_embed)
-                smart_embed.create_new_embed()
+                smart_embed.new_page()
             smart_embed.add_field("Explanation", question_data["explanation"], False)
 
             # Add image to the last embed
             if question_data["image_url"]:
                 if smart_embed.should_paginate(100):  # Small buffer for image
-                    smart_embed.pages.append(smart_embed.current_embed)
-                    smart_embed.create_new_embed()
-                smart_embed.current_embed.set_image(url=question_data["image_url"])
+                    smart_embed.new_page()
+                smart_embed.set_image(question_data["image_url"])
 
             embeds = smart_embed.get_embeds()
 
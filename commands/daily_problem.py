@@ -1,32 +1,53 @@
 import random
 import asyncio
-from datetime import datetime, timedelta
+import logging
+import time
 
 import discord
 from discord import Interaction, Embed, ui, ButtonStyle
 
 from commands.view_questions import AddQuestionButton
-from utils.database import get_database_connection, archive_question
+from utils.database import get_database_connection, archive_question, answer_code, answer_letter
+from utils.fanout import FanOut
+from utils.guilds import guild_placeholders, question_guild_ids
+from utils.image_store import attach_mirrored_image, remember_cdn_url
+from utils.lifecycle import lifecycle
+from utils.question_cache import QUESTION_COLUMNS, cache_question, get_question_payload, render_question
+from utils.writer import WriteError, submit_write
+
+logger = logging.getLogger(__name__)
+
+QUESTION_DURATION = 24 * 60 * 60  # Seconds a posted question stays open
+TIMER_UPDATE_INTERVAL = 60  # Seconds between countdown edits
+
+# Sends and edits to the channels showing questions share one concurrency limit
+_fan_out = FanOut()
+_active_questions = set()
+
+
+def answer_distribution(conn, posting_id):
+    """
+    Return {answer letter: count} over every channel showing the posting.
+    """
+    return {answer_letter(code): count for code, count in conn.execute("""
+        SELECT selected_answer, COUNT(*) as count
+        FROM daily_problem
+        WHERE posting_id = ?
+        GROUP BY selected_answer
+    """, (posting_id,))}
 
 
 class AnswerButton(ui.Button):
-    def __init__(self, label, question_id):
+    def __init__(self, label, question_id, posting_id):
         super().__init__(label=label, style=discord.ButtonStyle.primary)
         self.question_id = question_id
+        self.posting_id = posting_id
 
     async def callback(self, interaction: Interaction):
-        conn = get_database_connection()
-        c = conn.cursor()
-
-        # Get question details
-        c.execute("""
-            SELECT correct_answer, explanation, type, domain, skill, difficulty
-            FROM questions 
-            WHERE id = ?
-        """, (self.question_id,))
-        question_data = c.fetchone()
+        # Question details come from the rendered question cache
+        payload = get_question_payload(self.question_id)
 
-        if not question_data:
+        if not payload:
             await interaction.response.send_message(
                 embed=Embed(
                     title="Error",
@@ -37,16 +58,31 @@ class AnswerButton(ui.Button):
             )
             return
 
-        correct_answer, explanation, q_type, domain, skill, difficulty = question_data
+        correct_answer = payload.correct_answer
+        explanation = payload.explanation
+        q_type, domain, skill = payload.question_type, payload.domain, payload.skill
 
-        # Check if user has already attempted
-        c.execute("""
-            SELECT is_correct FROM daily_problem
-            WHERE question_id = ? AND user_id = ?
-        """, (self.question_id, interaction.user.id))
-        existing_attempt = c.fetchone()
+        # Record the attempt through the single writer; the (posting_id, user_id, guild_id)
+        # primary key rejects a second answer
+        guild_id = interaction.guild_id
+        is_correct = (self.label == correct_answer)
+        try:
+            recorded = await submit_write(
+                "record_answer", guild_id, self.posting_id, self.question_id, interaction.user.id,
+                answer_code(self.label), is_correct, int(time.time()), q_type, domain, skill
+            )
+        except WriteError:
+            await interaction.response.send_message(
+                embed=Embed(
+                    title="Error",
+                    description="Your answer could not be recorded. Please try again.",
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+            return
 
-        if existing_attempt:
+        if not recorded:
             await interaction.response.send_message(
                 embed=Embed(
                     title="Already Attempted",
@@ -57,39 +93,9 @@ class AnswerButton(ui.Button):
             )
             return
 
-        # Record the attempt
-        is_correct = (self.label == correct_answer)
-        c.execute("""
-            INSERT INTO daily_problem (user_id, question_id, correct_answer, selected_answer, is_correct, response_time)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (interaction.user.id, self.question_id, correct_answer, self.label, is_correct, datetime.utcnow()))
-
-        # Update user stats
-        c.execute("""
-            INSERT INTO user_stats (user_id, total_correct, total_attempts)
-            VALUES (?, ?, 1)
-            ON CONFLICT(user_id) DO UPDATE SET
-            total_correct = total_correct + ?,
-            total_attempts = total_attempts + 1
-        """, (interaction.user.id, 1 if is_correct else 0, 1 if is_correct else 0))
-
-        # Update skill stats
-        c.execute("""
-            INSERT INTO user_skill_stats (user_id, question_type, domain, skill, total_correct, total_attempts)
-            VALUES (?, ?, ?, ?, ?, 1)
-            ON CONFLICT(user_id, question_type, domain, skill) DO UPDATE SET
-            total_correct = total_correct + ?,
-            total_attempts = total_attempts + 1
-        """, (interaction.user.id, q_type, domain, skill, 1 if is_correct else 0, 1 if is_correct else 0))
-
-        # Get current answer distribution
-        c.execute("""
-            SELECT selected_answer, COUNT(*) as count
-            FROM daily_problem
-            WHERE question_id = ?
-            GROUP BY selected_answer
-        """, (self.question_id,))
-        answer_stats = dict(c.fetchall())
+        conn = get_database_connection()
+        answer_stats = answer_distribution(conn, self.posting_id)
+        conn.close()
 
         total_attempts = sum(answer_stats.values())
         percentages = {
@@ -128,9 +134,6 @@ class AnswerButton(ui.Button):
                 color=discord.Color.red()
             )
 
-        conn.commit()
-        conn.close()
-
         await interaction.response.send_message(embed=result_embed, ephemeral=True)
 
 
@@ -140,19 +143,9 @@ class DetailsButton(ui.Button):
         self.question_id = question_id
 
     async def callback(self, interaction: Interaction):
-        conn = get_database_connection()
-        c = conn.cursor()
-
-        c.execute("""
-            SELECT type, domain, skill, difficulty
-            FROM questions
-            WHERE id = ?
-        """, (self.question_id,))
+        payload = get_question_payload(self.question_id)
 
-        details = c.fetchone()
-        conn.close()
-
-        if not details:
+        if not payload:
             await interaction.response.send_message(
                 embed=Embed(
                     title="Error",
@@ -163,236 +156,353 @@ class DetailsButton(ui.Button):
             )
             return
 
-        q_type, domain, skill, difficulty = details
-
-        details_embed = Embed(
-            title="Question Details",
-            color=discord.Color.blue()
-        )
-        details_embed.add_field(name="Type", value=q_type.capitalize(), inline=True)
-        details_embed.add_field(name="Domain", value=domain, inline=True)
-        details_embed.add_field(name="Skill", value=skill, inline=True)
-        details_embed.add_field(name="Difficulty", value=difficulty.capitalize(), inline=True)
-
-        await interaction.response.send_message(embed=details_embed, ephemeral=True)
+        await interaction.response.send_message(embed=payload.details_embed(), ephemeral=True)
 
 
 class MainGameView(ui.View):
-    def __init__(self, question_id):
+    def __init__(self, question_id, posting_id):
         super().__init__(timeout=None)
 
         for choice in ["A", "B", "C", "D"]:
-            self.add_item(AnswerButton(label=choice, question_id=question_id))
+            self.add_item(AnswerButton(label=choice, question_id=question_id, posting_id=posting_id))
 
         self.add_item(DetailsButton(question_id))
 
+    async def interaction_check(self, interaction: Interaction):
+        # Clicks stop being taken once a shutdown starts, so every answer accepted is flushed
+        return await lifecycle.admit(interaction)
 
-async def update_timer(message, end_time):
-    try:
-        while datetime.utcnow() < end_time:
-            remaining_time = end_time - datetime.utcnow()
-            hours, remainder = divmod(remaining_time.total_seconds(), 3600)
-            minutes, seconds = divmod(remainder, 60)
-
-            if hours < 0:
-                break
 
-            footer_text = f"Time remaining: {int(hours)}h {int(minutes)}m {int(seconds)}s"
-            embed = message.embeds[0]
-            embed.set_footer(text=footer_text)
+def create_posting(conn, question_id, ends_at):
+    """
+    Start a new posting of question_id, open until ends_at, and return its ID.
+    """
+    cursor = conn.execute(
+        "INSERT INTO postings (question_id, posted_at, ends_at) VALUES (?, ?, ?)",
+        (question_id, int(time.time()), ends_at)
+    )
+    return cursor.lastrowid
+
+
+def final_stats_embed(conn, posting_id, question_id):
+    payload = get_question_payload(question_id)
+    if payload is None:
+        # Archived while the posting was open; the archive still has the question's details
+        row = conn.execute(f"SELECT {QUESTION_COLUMNS} FROM question_archives WHERE id = ?", (question_id,)).fetchone()
+        payload = render_question(row) if row else None
+
+    # Get answer statistics from the posting's range of the primary key
+    rows = conn.execute("""
+        SELECT selected_answer, COUNT(*) as count
+        FROM daily_problem
+        WHERE posting_id = ?
+        GROUP BY selected_answer
+    """, (posting_id,)).fetchall()
+
+    stats = {answer_letter(code): count for code, count in rows}
+    total_attempts = sum(stats.values())
+    total_participants = conn.execute(
+        "SELECT COUNT(DISTINCT user_id) FROM daily_problem WHERE posting_id = ?", (posting_id,)
+    ).fetchone()[0]
+
+    percentages = {
+        key: round((count / total_attempts) * 100, 2)
+        for key, count in stats.items()
+    }
 
-            try:
-                await message.edit(embed=embed)
-            except discord.NotFound:
-                # Message was deleted
-                return
-            except discord.HTTPException:
-                # Handle other Discord API errors
-                continue
+    stats_embed = Embed(
+        title="Final Question Statistics",
+        description=(
+            f"**Total Participants:** {total_participants}\n\n"
+            f"**Answer Distribution:**\n"
+            f"A: {percentages.get('A', 0)}% ({stats.get('A', 0)} votes)\n"
+            f"B: {percentages.get('B', 0)}% ({stats.get('B', 0)} votes)\n"
+            f"C: {percentages.get('C', 0)}% ({stats.get('C', 0)} votes)\n"
+            f"D: {percentages.get('D', 0)}% ({stats.get('D', 0)} votes)"
+        ),
+        color=discord.Color.gold()
+    )
 
-            await asyncio.sleep(1)  # Update every minute instead of every second
+    # A question deleted outright only loses its details, not the answer counts
+    if payload is not None:
+        stats_embed.add_field(name="Question Type", value=payload.question_type.capitalize(), inline=True)
+        stats_embed.add_field(name="Domain", value=payload.domain, inline=True)
+        stats_embed.add_field(name="Skill", value=payload.skill, inline=True)
+        stats_embed.add_field(name="Difficulty", value=(payload.difficulty or "unknown").capitalize(), inline=True)
+    return stats_embed
 
-        # Time's up - post final statistics
-        await post_final_stats(message)
-    except Exception as e:
-        print(f"Error in update_timer: {e}")
 
+class ActiveQuestion:
+    """
+    Every message showing one posting of a question. They share one countdown, and when it
+    ends every message gets the same final stats, counted over the whole posting. The
+    messages are also kept in posting_messages.
+    """
 
-async def post_final_stats(message):
-    try:
+    def __init__(self, posting_id, question_id, ends_at):
+        self.posting_id = posting_id
+        self.question_id = question_id
+        self.ends_at = ends_at
+        self.messages = []  # [(guild_id, channel_id, message)]
+        self.finishing = False  # Set once the final stats are being posted
+        self._task = None
+
+    @classmethod
+    def create(cls, question_id):
+        """
+        Start a new posting of question_id.
+        """
+        ends_at = int(time.time()) + QUESTION_DURATION
         conn = get_database_connection()
-        c = conn.cursor()
+        with conn:
+            posting_id = create_posting(conn, question_id, ends_at)
+        conn.close()
+        return cls(posting_id, question_id, ends_at)
 
-        # Extract question_id from the message
-        question_id = int(message.embeds[0].footer.text.split()[-1])
+    def view(self):
+        return MainGameView(self.question_id, self.posting_id)
 
-        # Get question details
-        c.execute("""
-            SELECT type, domain, skill, difficulty
-            FROM questions
-            WHERE id = ?
-        """, (question_id,))
-        q_type, domain, skill, difficulty = c.fetchone()
-
-        # Get answer statistics
-        c.execute("""
-            SELECT selected_answer, COUNT(*) as count,
-                   SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) as correct_count
-            FROM daily_problem
-            WHERE question_id = ?
-            GROUP BY selected_answer
-        """, (question_id,))
-
-        stats = dict(c.fetchall())
-        total_attempts = sum(stats.values())
-        total_participants = c.execute(
-            "SELECT COUNT(DISTINCT user_id) FROM daily_problem WHERE question_id = ?",
-            (question_id,)
-        ).fetchone()[0]
+    def add(self, messages):
+        """
+        Add [(guild_id, channel_id, message)] that show the posting.
+        """
+        conn = get_database_connection()
+        with conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO posting_messages (posting_id, guild_id, channel_id, message_id)
+                VALUES (?, ?, ?, ?)
+            """, [(self.posting_id, guild_id, channel_id, message.id) for guild_id, channel_id, message in messages])
+        conn.close()
+        self.messages.extend(messages)
 
-        percentages = {
-            key: round((count / total_attempts) * 100, 2)
-            for key, count in stats.items()
-        }
+    def start(self):
+        _active_questions.add(self)
+        self._task = asyncio.create_task(self._run())
 
-        stats_embed = Embed(
-            title="Final Question Statistics",
-            description=(
-                f"**Total Participants:** {total_participants}\n\n"
-                f"**Answer Distribution:**\n"
-                f"A: {percentages.get('A', 0)}% ({stats.get('A', 0)} votes)\n"
-                f"B: {percentages.get('B', 0)}% ({stats.get('B', 0)} votes)\n"
-                f"C: {percentages.get('C', 0)}% ({stats.get('C', 0)} votes)\n"
-                f"D: {percentages.get('D', 0)}% ({stats.get('D', 0)} votes)"
-            ),
-            color=discord.Color.gold()
-        )
+    async def _edit_all(self, footer_text):
+        async def edit(target):
+            _, _, message = target
+            embed = message.embeds[0]
+            embed.set_footer(text=footer_text)
+            await message.edit(embed=embed)
+
+        results = await _fan_out.run(edit, self.messages, route=lambda target: target[1])
+        # Stop updating messages that were deleted
+        self.messages = [
+            target for target, result in zip(self.messages, results) if not isinstance(result, discord.NotFound)
+        ]
+        return results
+
+    async def _run(self):
+        try:
+            while (remaining := self.ends_at - time.time()) > 0:
+                await asyncio.sleep(min(TIMER_UPDATE_INTERVAL, remaining))
+                hours, remainder = divmod(max(self.ends_at - time.time(), 0), 3600)
+                minutes, seconds = divmod(remainder, 60)
+                await self._edit_all(
+                    f"Time remaining: {int(hours)}h {int(minutes)}m {int(seconds)}s | Question ID: {self.question_id}"
+                )
+
+            # Time's up - post final statistics
+            self.finishing = True
+            await self.post_final_stats()
+        except Exception:
+            logger.exception(f"Error in the countdown of posting {self.posting_id}")
+        finally:
+            _active_questions.discard(self)
+
+    async def post_final_stats(self):
+        if not self.messages:
+            return
+
+        conn = get_database_connection()
+        try:
+            stats_embed = final_stats_embed(conn, self.posting_id, self.question_id)
+        finally:
+            conn.close()
 
-        stats_embed.add_field(name="Question Type", value=q_type.capitalize(), inline=True)
-        stats_embed.add_field(name="Domain", value=domain, inline=True)
-        stats_embed.add_field(name="Skill", value=skill, inline=True)
-        stats_embed.add_field(name="Difficulty", value=difficulty.capitalize(), inline=True)
+        await self._edit_all(f"This question has ended. Question ID: {self.question_id}")
 
-        # Update original message footer
-        embed = message.embeds[0]
-        embed.set_footer(text=f"This question has ended. Question ID: {question_id}")
-        await message.edit(embed=embed)
+        async def reply(target):
+            await target[2].reply(embed=stats_embed)
 
         # Send stats as a reply
-        await message.reply(embed=stats_embed)
-
+        await _fan_out.run(reply, self.messages, route=lambda target: target[1])
+
+
+async def pause_active_questions():
+    """
+    Shutdown hook: stop every countdown and record the messages it was updating in
+    paused_timers, for resume_active_questions to pick up after the restart. Final stats that
+    are already being posted are finished instead.
+    """
+    finishing = [active for active in _active_questions if active.finishing]
+    paused = [active for active in _active_questions if not active.finishing]
+    for active in paused:
+        active._task.cancel()
+    await asyncio.gather(*(active._task for active in paused), return_exceptions=True)
+
+    rows = [(active.posting_id, guild_id, channel_id)
+            for active in paused for guild_id, channel_id, _ in active.messages]
+    if rows:
+        conn = get_database_connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO paused_timers (posting_id, guild_id, channel_id) VALUES (?, ?, ?)", rows
+            )
         conn.close()
-    except Exception as e:
-        print(f"Error in post_final_stats: {e}")
+        logger.info(f"Paused {len(paused)} countdown(s) on {len(rows)} message(s)")
 
+    await asyncio.gather(*(active._task for active in finishing), return_exceptions=True)
 
-async def handle_daily_problem_command(bot, interaction: Interaction, question_type: str = None,
-                                       question_id: int = None):
+
+async def resume_active_questions(bot):
+    """
+    Restart the countdowns paused by the last shutdown in the guilds this process serves; a
+    posting that ended while the bot was down gets its final stats right away. Returns the
+    number of postings resumed.
+    """
     conn = get_database_connection()
-    c = conn.cursor()
+    rows = [row for row in conn.execute("""
+        SELECT t.posting_id, p.question_id, p.ends_at, t.guild_id, t.channel_id, m.message_id
+        FROM paused_timers t
+        JOIN postings p ON p.id = t.posting_id
+        JOIN posting_messages m
+        ON m.posting_id = t.posting_id AND m.guild_id = t.guild_id AND m.channel_id = t.channel_id
+    """) if bot.get_guild(row[3]) is not None]
+    # Taken off the table before the awaits below, so a reconnect's on_ready can't resume them twice
+    with conn:
+        conn.executemany(
+            "DELETE FROM paused_timers WHERE posting_id = ? AND guild_id = ? AND channel_id = ?",
+            [(posting_id, guild_id, channel_id) for posting_id, _, _, guild_id, channel_id, _ in rows]
+        )
+    conn.close()
+
+    actives = {}
+    for posting_id, question_id, ends_at, _, _, _ in rows:
+        if posting_id not in actives:
+            actives[posting_id] = ActiveQuestion(posting_id, question_id, ends_at)
+
+    async def fetch(row):
+        channel = bot.get_channel(row[4]) or await bot.fetch_channel(row[4])
+        message = await channel.fetch_message(row[5])
+        # The buttons belonged to a view in the old process, so the message gets a new one
+        await message.edit(view=actives[row[0]].view())
+        return message
+
+    results = await _fan_out.run(fetch, rows, route=lambda row: row[4])
+    for row, message in zip(rows, results):
+        if isinstance(message, BaseException):
+            logger.warning(f"Could not resume the countdown on message {row[5]}: {message}")
+            continue
+        actives[row[0]].messages.append((row[3], row[4], message))
+
+    resumed = [active for active in actives.values() if active.messages]
+    for active in resumed:
+        active.start()
+    return len(resumed)
+
+
+async def post_question(payload, channels):
+    """
+    Post a rendered question to every channel as one posting, with bounded concurrency, and
+    start their shared countdown. Returns the ActiveQuestion and [(channel, exception)] for
+    the sends that failed.
+    """
+    active = ActiveQuestion.create(payload.question_id)
+
+    async def send(channel):
+        main_embed = payload.main_embed()
+        # Serve the image from the local mirror when there is one
+        image_url = main_embed.image.url
+        image_kwargs = attach_mirrored_image(main_embed)
+        message = await channel.send(embed=main_embed, view=active.view(), **image_kwargs)
+        if image_kwargs:
+            remember_cdn_url(image_url, message)
+        return message
+
+    results = await _fan_out.run(send, channels)
+    sent = [(channel.guild.id, channel.id, message)
+            for channel, message in zip(channels, results) if not isinstance(message, BaseException)]
+    if sent:
+        active.add(sent)
+        active.start()
+    return active, [(channel, error) for channel, error in zip(channels, results) if isinstance(error, BaseException)]
+
+
+def pick_question(conn, guild_id, question_type=None, question_id=None):
+    """
+    Return a questions row (in QUESTION_COLUMNS order) guild_id can post: question_id if given,
+    else a random one, of question_type if given. None if there is no such question.
+    """
+    # Only the guild's own questions, plus the shared bank if it opted in
+    guild_ids = question_guild_ids(conn, guild_id)
+    guild_filter = f"guild_id IN ({guild_placeholders(guild_ids)})"
+    type_filter = "AND type = ?" if question_type else ""
+    type_params = (question_type,) if question_type else ()
 
-    # Fetch question logic (same as before)
     if question_id:
-        if question_type:
-            c.execute("""
-                SELECT id, question, correct_answer, 
-                       option_a, option_b, option_c, option_d, 
-                       explanation, difficulty, domain, skill, image_url, type
-                FROM questions
-                WHERE id = ? AND type = ?
-            """, (question_id, question_type))
-        else:
-            c.execute("""
-                SELECT id, question, correct_answer, 
-                       option_a, option_b, option_c, option_d, 
-                       explanation, difficulty, domain, skill, image_url, type
-                FROM questions
-                WHERE id = ?
-            """, (question_id,))
-
-        question = c.fetchone()
-
-        if not question:
-            no_question_embed = Embed(
-                title="Question Not Found",
-                description=f"No question found with ID `{question_id}` {'and type `' + question_type + '`' if question_type else ''}. Please check and try again.",
-                color=discord.Color.red()
-            )
-            await interaction.response.send_message(embed=no_question_embed, ephemeral=True)
-            conn.close()
-            return
-    else:
-        if question_type:
-            c.execute("""
-                SELECT id, question, correct_answer, 
-                       option_a, option_b, option_c, option_d, 
-                       explanation, difficulty, domain, skill, image_url, type
-                FROM questions
-                WHERE type = ?
-            """, (question_type,))
-        else:
-            c.execute("""
-                SELECT id, question, correct_answer, 
-                       option_a, option_b, option_c, option_d, 
-                       explanation, difficulty, domain, skill, image_url, type
-                FROM questions
-            """)
-
-        questions = c.fetchall()
-
-        if not questions:
-            no_questions_embed = Embed(
-                title="No Questions Available",
-                description=f"There are no questions available {'for `' + question_type + '`' if question_type else ''} right now. Would you like to add one?",
-                color=discord.Color.orange()
-            )
-            view = AddQuestionButton()
-            await interaction.response.send_message(embed=no_questions_embed, view=view, ephemeral=True)
-            conn.close()
-            return
-
-        question = random.choice(questions)
+        return conn.execute(f"""
+            SELECT {QUESTION_COLUMNS}
+            FROM questions
+            WHERE id = ? {type_filter} AND {guild_filter}
+        """, (question_id, *type_params, *guild_ids)).fetchone()
 
-    # Unpack question data
-    (question_id, question_text, correct_answer,
-     option_a, option_b, option_c, option_d,
-     explanation, difficulty, domain, skill, image_url, q_type) = question
+    # Pick an ID from the guild's range of the (guild_id, type) index, then load one row
+    question_ids = [row[0] for row in conn.execute(
+        f"SELECT id FROM questions WHERE {guild_filter} {type_filter}", (*guild_ids, *type_params)
+    )]
+    if not question_ids:
+        return None
+    return conn.execute(f"SELECT {QUESTION_COLUMNS} FROM questions WHERE id = ?", (random.choice(question_ids),)).fetchone()
 
-    options_dict = {
-        "A": option_a,
-        "B": option_b,
-        "C": option_c,
-        "D": option_d
-    }
 
-    # Create main embed
-    main_embed = Embed(
-        title="Daily Problem",
-        description=question_text,
-        color=0x3498db,
-    )
-
-    main_embed.add_field(
-        name="Answer Choices",
-        value="\n".join([f"{key}) {value}" for key, value in options_dict.items()]),
-        inline=False,
-    )
+async def handle_daily_problem_command(bot, interaction: Interaction, question_type: str = None,
+                                       question_id: int = None):
+    conn = get_database_connection()
+    question = pick_question(conn, interaction.guild_id, question_type, question_id)
+    conn.close()
+
+    if not question and question_id:
+        no_question_embed = Embed(
+            title="Question Not Found",
+            description=f"No question found with ID `{question_id}` {'and type `' + question_type + '`' if question_type else ''}. Please check and try again.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=no_question_embed, ephemeral=True)
+        return
+
+    if not question:
+        no_questions_embed = Embed(
+            title="No Questions Available",
+            description=f"There are no questions available {'for `' + question_type + '`' if question_type else ''} right now. Would you like to add one?",
+            color=discord.Color.orange()
+        )
+        view = AddQuestionButton()
+        await interaction.response.send_message(embed=no_questions_embed, view=view, ephemeral=True)
+        return
 
-    if image_url:
-        main_embed.set_image(url=image_url)
+    # Render the question once; button clicks reuse the cached payload
+    payload = cache_question(question)
+    question_id = payload.question_id
+    main_embed = payload.main_embed()
 
-    main_embed.set_footer(text=f"Time remaining: 24h 0m 0s | Question ID: {question_id}")
+    # Serve the image from the local mirror when there is one
+    image_url = main_embed.image.url
+    image_kwargs = attach_mirrored_image(main_embed)
 
-    # Create and send main view
-    main_view = MainGameView(question_id)
-    await interaction.response.send_message(embed=main_embed, view=main_view)
+    # Create and send main view, as a new posting of the question
+    active = ActiveQuestion.create(question_id)
+    await interaction.response.send_message(embed=main_embed, view=active.view(), **image_kwargs)
 
     # Get the original message
     message = await interaction.original_response()
+    if image_kwargs:
+        remember_cdn_url(image_url, message)
 
     # Start the countdown timer
-    end_time = datetime.utcnow() + timedelta(hours=24)
-    asyncio.create_task(update_timer(message, end_time))
+    active.add([(interaction.guild_id, interaction.channel_id, message)])
+    active.start()
 
     # Create and send admin embed (ephemeral)
     admin_embed = Embed(
@@ -409,5 +519,3 @@ async def handle_daily_problem_command(bot, interaction: Interaction, question_t
     ))
 
     await interaction.followup.send(embed=admin_embed, view=admin_view, ephemeral=True)
-
-    conn.close()
\ No newline at end of file
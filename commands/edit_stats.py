@@ -1,58 +1,191 @@
+import asyncio
+import csv
+import io
+
 import discord
 from discord.ext.commands import Bot
 from utils.database import get_database_connection
+from utils.taxonomy import MATH_DOMAINS, EBRW_DOMAINS, DOMAINS_BY_TYPE, skill_registry
+from commands.import_questions import ImportResult, detect_format, read_rows
+from utils.writer import WriteError, submit_write
+
+
+STAT_EDIT_FIELDS = ("user_id", "question_type", "domain", "skill", "total_correct", "total_attempts")
+
+
+def apply_stat_edits(conn, guild_id, edits):
+    """
+    Set many skill stats of one guild's members at once. edits are (user_id, question_type,
+    domain, skill, total_correct, total_attempts) tuples; a later edit of the same skill wins. Each change
+    is recorded in stat_adjustments so stats recomputed from the attempt log keep it, and the
+    affected users' overall totals are re-summed with one grouped UPDATE.
+
+    Runs in the caller's transaction.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.stat_edits")
+    conn.execute("""
+        CREATE TEMP TABLE stat_edits (
+            user_id INTEGER NOT NULL,
+            skill_id INTEGER NOT NULL,
+            total_correct INTEGER NOT NULL,
+            total_attempts INTEGER NOT NULL,
+            PRIMARY KEY (user_id, skill_id)
+        ) WITHOUT ROWID
+    """)
+    conn.executemany("INSERT OR REPLACE INTO temp.stat_edits VALUES (?, ?, ?, ?)", (
+        (user_id, skill_registry.id_for(conn, question_type, domain, skill), total_correct, total_attempts)
+        for user_id, question_type, domain, skill, total_correct, total_attempts in edits
+    ))
+
+    # The difference from the current value becomes part of the admin adjustment
+    conn.execute("""
+        INSERT INTO stat_adjustments (guild_id, user_id, skill_id, correct_delta, attempts_delta)
+        SELECT ?, e.user_id, e.skill_id,
+               e.total_correct - COALESCE(s.total_correct, 0),
+               e.total_attempts - COALESCE(s.total_attempts, 0)
+        FROM temp.stat_edits e
+        LEFT JOIN user_skill_stats s ON s.guild_id = ? AND s.user_id = e.user_id AND s.skill_id = e.skill_id
+        WHERE true
+        ON CONFLICT(guild_id, user_id, skill_id)
+        DO UPDATE SET correct_delta = correct_delta + excluded.correct_delta,
+                      attempts_delta = attempts_delta + excluded.attempts_delta
+    """, (guild_id, guild_id))
+
+    conn.execute("""
+        INSERT INTO user_skill_stats (guild_id, user_id, skill_id, total_correct, total_attempts)
+        SELECT ?, user_id, skill_id, total_correct, total_attempts
+        FROM temp.stat_edits
+        WHERE true
+        ON CONFLICT(guild_id, user_id, skill_id)
+        DO UPDATE SET total_correct = excluded.total_correct, total_attempts = excluded.total_attempts
+    """, (guild_id,))
+
+    # Overall stats are the sum of the skill stats, as in the single-skill editor
+    conn.execute("""
+        INSERT OR IGNORE INTO user_stats (guild_id, user_id)
+        SELECT DISTINCT ?, user_id FROM temp.stat_edits
+    """, (guild_id,))
+    conn.execute("""
+        UPDATE user_stats
+        SET total_correct = totals.total_correct, total_attempts = totals.total_attempts
+        FROM (
+            SELECT user_id, SUM(total_correct) AS total_correct, SUM(total_attempts) AS total_attempts
+            FROM user_skill_stats
+            WHERE guild_id = ? AND user_id IN (SELECT user_id FROM temp.stat_edits)
+            GROUP BY user_id
+        ) AS totals
+        WHERE user_stats.guild_id = ? AND user_stats.user_id = totals.user_id
+    """, (guild_id, guild_id))
+
+    edited_users = conn.execute("SELECT COUNT(DISTINCT user_id) FROM temp.stat_edits").fetchone()[0]
+    conn.execute("DROP TABLE temp.stat_edits")
+    return edited_users
+
+
+def validate_stat_edit(row):
+    """
+    Check one row of a bulk edit file. Returns (edit tuple, None) or (None, error message).
+    """
+    values = {field: str(row.get(field) or "").strip() for field in STAT_EDIT_FIELDS}
+
+    try:
+        user_id = int(values["user_id"])
+        total_correct = int(values["total_correct"])
+        total_attempts = int(values["total_attempts"])
+    except ValueError:
+        return None, "user_id, total_correct and total_attempts must be whole numbers"
+
+    question_type = values["question_type"].lower()
+    if question_type not in ("math", "ebrw"):
+        return None, f"question_type must be 'math' or 'ebrw', got {values['question_type']!r}"
+
+    domains = DOMAINS_BY_TYPE[question_type]
+    if values["domain"] not in domains:
+        return None, f"unknown {question_type} domain {values['domain']!r}"
+    if values["skill"] not in domains[values["domain"]]:
+        return None, f"unknown skill {values['skill']!r} for domain {values['domain']!r}"
+
+    if not 0 <= total_correct <= total_attempts:
+        return None, "total_correct must be between 0 and total_attempts"
+
+    return (user_id, question_type, values["domain"], values["skill"], total_correct, total_attempts), None
+
+
+def read_stat_edits(stream, file_format):
+    """
+    Parse and validate a CSV or JSONL edit file. Returns (edits, ImportResult with the errors).
+    """
+    edits = []
+    result = ImportResult()
+    try:
+        for line_number, row, error in read_rows(stream, file_format):
+            if error is None:
+                edit, error = validate_stat_edit(row)
+            if error is not None:
+                result.add_error(line_number, error)
+                continue
+            edits.append(edit)
+    except (csv.Error, UnicodeDecodeError) as e:
+        result.add_error("?", f"could not read file: {e}")
+    return edits, result
+
+
+async def handle_edit_stats_bulk_command(interaction: discord.Interaction, attachment: discord.Attachment):
+    file_format = detect_format(attachment.filename)
+    if not file_format:
+        await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Bulk Edit Failed",
+                description=(
+                    "❌ Please attach a `.csv` or `.jsonl` file with the columns "
+                    f"`{', '.join(STAT_EDIT_FIELDS)}`."
+                ),
+                color=discord.Color.red()
+            ),
+            ephemeral=True
+        )
+        return
+
+    await interaction.response.defer(ephemeral=True)
+
+    data = await attachment.read()
+    stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline="")
+    # Validate the whole file off the event loop; it is applied in one write, or not at all
+    # if any row is invalid
+    edits, result = await asyncio.to_thread(read_stat_edits, stream, file_format)
+
+    if result.error_count:
+        embed = discord.Embed(
+            title="Bulk Edit Failed",
+            description=f"❌ {result.error_count} row(s) are invalid, so no stats were changed.",
+            color=discord.Color.red()
+        )
+        preview = "\n".join(f"Line {line}: {message}" for line, message in result.errors[:10])
+        embed.add_field(name="Errors", value=preview[:1024], inline=False)
+        await interaction.followup.send(
+            embed=embed,
+            file=discord.File(io.BytesIO(result.error_report().encode()), filename="edit_errors.txt"),
+            ephemeral=True
+        )
+        return
+
+    try:
+        edited_users = await submit_write("edit_stats", interaction.guild_id, edits) if edits else 0
+    except WriteError as e:
+        await interaction.followup.send(
+            embed=discord.Embed(title="Bulk Edit Failed", description=f"❌ {e}", color=discord.Color.red()),
+            ephemeral=True
+        )
+        return
 
-# Predefined domains and skills
-MATH_DOMAINS = {
-    "Algebra": [
-        "Linear equations in one variable",
-        "Linear functions",
-        "Linear equations in two variables",
-        "Systems of two linear equations in two variables",
-        "Linear inequalities in one or two variables"
-    ],
-    "Advanced Math": [
-        "Nonlinear functions",
-        "Nonlinear equations in one variable and systems of equations in two variables",
-        "Equivalent expressions"
-    ],
-    "Problem-Solving and Data Analysis": [
-        "Ratios, rates, proportional relationships, and units",
-        "Percentages",
-        "One-variable data: Distributions and measures of center and spread",
-        "Two-variable data: Models and scatterplots",
-        "Probability and conditional probability",
-        "Inference from sample statistics and margin of error",
-        "Evaluating statistical claims: Observational studies and experiments"
-    ],
-    "Geometry and Trigonometry": [
-        "Area and volume",
-        "Lines, angles, and triangles",
-        "Right triangles and trigonometry",
-        "Circles"
-    ]
-}
-
-EBRW_DOMAINS = {
-    "Information and Ideas": [
-        "Central Ideas and Details",
-        "Inferences",
-        "Command of Evidence"
-    ],
-    "Craft and Structure": [
-        "Words in Context",
-        "Text Structure and Purpose",
-        "Cross-Text Connections"
-    ],
-    "Expression of Ideas": [
-        "Rhetorical Synthesis",
-        "Transitions"
-    ],
-    "Standard English Conventions": [
-        "Boundaries",
-        "Form, Structure, and Sense"
-    ]
-}
+    await interaction.followup.send(
+        embed=discord.Embed(
+            title="Stats Updated Successfully!",
+            description=f"✅ Applied {len(edits)} skill edit(s) for {edited_users} member(s).",
+            color=discord.Color.green()
+        ),
+        ephemeral=True
+    )
 
 
 async def handle_edit_stats_command(bot: Bot, interaction: discord.Interaction, member: discord.Member):
@@ -161,11 +294,12 @@ class DetailedStatsSkillSelect(discord.ui.Select):
         # Fetch stats for the selected type, domain, and skill
         conn = get_database_connection()
         cursor = conn.cursor()
+        skill_id = skill_registry.id_for(conn, self.question_type, self.domain, skill)  # Lowercases question_type
         cursor.execute("""
             SELECT total_correct, total_attempts
             FROM user_skill_stats
-            WHERE user_id = ? AND question_type = ? AND domain = ? AND skill = ?
-        """, (self.member.id, self.question_type.lower(), self.domain, skill))  # Ensure question_type is lowercase
+            WHERE guild_id = ? AND user_id = ? AND skill_id = ?
+        """, (interaction.guild_id, self.member.id, skill_id))
         result = cursor.fetchone()
         conn.close()
 
@@ -218,34 +352,15 @@ class DetailedStatsEditModal(discord.ui.Modal, title="Edit Stats for Skill"):
             # Convert question_type to lowercase for database insertion
             lowercase_question_type = self.question_type.lower()
 
+            await submit_write("edit_stats", interaction.guild_id, [(
+                self.member.id, lowercase_question_type, self.domain, self.skill,
+                new_total_correct, new_total_attempts
+            )])
             conn = get_database_connection()
-            cursor = conn.cursor()
-
-            # Update or insert the data into the database
-            cursor.execute("""
-                INSERT INTO user_skill_stats (user_id, question_type, domain, skill, total_correct, total_attempts)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(user_id, question_type, domain, skill)
-                DO UPDATE SET total_correct = excluded.total_correct, total_attempts = excluded.total_attempts
-            """, (
-                self.member.id, lowercase_question_type, self.domain, self.skill, new_total_correct, new_total_attempts
-            ))
-
-            # Update overall stats in user_stats table
-            cursor.execute("""
-                SELECT SUM(total_correct), SUM(total_attempts)
-                FROM user_skill_stats
-                WHERE user_id = ?
-            """, (self.member.id,))
-            correct_sum, attempts_sum = cursor.fetchone()
-            cursor.execute("""
-                INSERT INTO user_stats (user_id, total_correct, total_attempts)
-                VALUES (?, ?, ?)
-                ON CONFLICT(user_id)
-                DO UPDATE SET total_correct = excluded.total_correct, total_attempts = excluded.total_attempts
-            """, (self.member.id, correct_sum, attempts_sum))
-
-            conn.commit()
+            correct_sum, attempts_sum = conn.execute(
+                "SELECT total_correct, total_attempts FROM user_stats WHERE guild_id = ? AND user_id = ?",
+                (interaction.guild_id, self.member.id)
+            ).fetchone()
             conn.close()
 
             # Create a success embed message
@@ -0,0 +1,250 @@
+"""
+Streaming export of the bot's tables to CSV, JSONL or Parquet.
+
+Rows are read in bounded batches using keyset pagination on rowid (or the primary key of
+WITHOUT ROWID tables), each batch in its own short read, so an export never holds a table in
+memory and never keeps a lock that would block answers from being recorded while the bot is
+live. /exportdata only exports the guild's own rows; run locally, every guild's rows are
+exported unless --guild is given. daily_problem exports include the attempts moved to cold
+storage (see commands/tier_attempts.py). Parquet output needs pyarrow.
+
+    python -m commands.export_data daily_problem --format jsonl -o attempts.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sqlite3
+import tempfile
+
+import discord
+from discord import Interaction, Embed
+
+import utils.database as database
+
+EXPORT_TABLES = ("questions", "question_archives", "daily_problem", "user_stats", "user_skill_stats", "skills")
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+EXPORT_BATCH_SIZE = 1000
+
+# Tables read through a view that also covers their rows in cold storage
+EXPORT_SOURCES = {"daily_problem": "all_attempts"}
+
+# Discord's upload limit for servers without boosts
+DEFAULT_UPLOAD_LIMIT = 10 * 1024 * 1024
+
+
+def get_export_connection():
+    """
+    Read-only connection in autocommit mode, so every batch query is its own transaction.
+    """
+    conn = sqlite3.connect(database.DATABASE_NAME, isolation_level=None)
+    # Creates a temp view, so it has to come before the connection is made read-only
+    database.attach_cold_storage(conn)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def table_columns(conn, table):
+    """
+    Return [(column name, declared type)] for a table.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table {table!r}")
+    return [(row[1], row[2].upper()) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def key_columns(conn, table):
+    """
+    Return the columns to page a table by: rowid, or the primary key of a WITHOUT ROWID table.
+    """
+    try:
+        conn.execute(f"SELECT rowid FROM {table} LIMIT 0")
+        return ["rowid"]
+    except sqlite3.OperationalError:
+        primary_key = sorted((row[5], row[1]) for row in conn.execute(f"PRAGMA table_info({table})") if row[5])
+        return [name for _, name in primary_key]
+
+
+def iter_batches(conn, table, batch_size=EXPORT_BATCH_SIZE, guild_id=None):
+    """
+    Yield lists of at most batch_size rows, in key order. With guild_id, tables that are
+    partitioned by guild only yield that guild's rows.
+    """
+    columns = [name for name, _ in table_columns(conn, table)]
+    column_list = ", ".join(columns)
+    # The view's rows are paged by the key of the table it extends
+    keys = key_columns(conn, table)
+    source = EXPORT_SOURCES.get(table, table)
+    key_list = ", ".join(keys)
+    last_key = None
+
+    if guild_id is not None and "guild_id" in columns:
+        guild_filter, guild_params = "guild_id = ? AND", (guild_id,)
+    else:
+        guild_filter, guild_params = "", ()
+
+    while True:
+        if last_key is None:
+            rows = conn.execute(
+                f"SELECT {key_list}, {column_list} FROM {source} WHERE {guild_filter} true "
+                f"ORDER BY {key_list} LIMIT ?",
+                (*guild_params, batch_size)
+            ).fetchall()
+        else:
+            # Row value comparison continues after the last key, also for composite keys
+            rows = conn.execute(
+                f"SELECT {key_list}, {column_list} FROM {source} "
+                f"WHERE {guild_filter} ({key_list}) > ({', '.join('?' for _ in keys)}) "
+                f"ORDER BY {key_list} LIMIT ?",
+                (*guild_params, *last_key, batch_size)
+            ).fetchall()
+        if not rows:
+            return
+
+        last_key = rows[-1][:len(keys)]
+        yield [row[len(keys):] for row in rows]
+
+
+def _write_csv(conn, table, path, batch_size, guild_id):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in table_columns(conn, table)])
+        for batch in iter_batches(conn, table, batch_size, guild_id):
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def _write_jsonl(conn, table, path, batch_size, guild_id):
+    names = [name for name, _ in table_columns(conn, table)]
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for batch in iter_batches(conn, table, batch_size, guild_id):
+            f.writelines(json.dumps(dict(zip(names, row)), ensure_ascii=False) + "\n" for row in batch)
+            count += len(batch)
+    return count
+
+
+def _write_parquet(conn, table, path, batch_size, guild_id):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    # Map SQLite's declared types so every row group shares one schema
+    types = {"INTEGER": pa.int64(), "BOOLEAN": pa.bool_(), "TIMESTAMP": pa.string(), "TEXT": pa.string()}
+    columns = table_columns(conn, table)
+    schema = pa.schema([(name, types.get(declared_type, pa.string())) for name, declared_type in columns])
+
+    converters = {pa.int64(): int, pa.bool_(): bool, pa.string(): str}
+
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in iter_batches(conn, table, batch_size, guild_id):
+            arrays = []
+            for values, field in zip(zip(*batch), schema):
+                convert = converters[field.type]
+                arrays.append(pa.array([None if value is None else convert(value) for value in values], type=field.type))
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(batch)
+    return count
+
+
+WRITERS = {
+    "csv": _write_csv,
+    "jsonl": _write_jsonl,
+    "parquet": _write_parquet,
+}
+
+
+def export_table(table, file_format, path, batch_size=EXPORT_BATCH_SIZE, guild_id=None):
+    """
+    Export one table to path, only guild_id's rows if given, and return the number of rows written.
+    """
+    conn = get_export_connection()
+    try:
+        return WRITERS[file_format](conn, table, path, batch_size, guild_id)
+    finally:
+        conn.close()
+
+
+async def handle_export_data_command(interaction: Interaction, table: str, file_format: str):
+    await interaction.response.defer(ephemeral=True)
+
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, f"{table}.{file_format}")
+    try:
+        # Run the export off the event loop so the bot keeps answering while it works
+        try:
+            count = await asyncio.to_thread(
+                export_table, table, file_format, path, EXPORT_BATCH_SIZE, interaction.guild_id
+            )
+        except (RuntimeError, sqlite3.Error) as e:
+            await interaction.followup.send(
+                embed=Embed(title="Export Failed", description=f"❌ {e}", color=discord.Color.red()),
+                ephemeral=True
+            )
+            return
+
+        upload_limit = interaction.guild.filesize_limit if interaction.guild else DEFAULT_UPLOAD_LIMIT
+        size = os.path.getsize(path)
+        if size > upload_limit:
+            await interaction.followup.send(
+                embed=Embed(
+                    title="Export Too Large",
+                    description=(
+                        f"❌ The export is {size / 1024 / 1024:.1f} MiB, over Discord's upload limit. "
+                        f"Run `python -m commands.export_data {table} --format {file_format} "
+                        f"--guild {interaction.guild_id}` on the bot's host instead."
+                    ),
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+            return
+
+        await interaction.followup.send(
+            embed=Embed(
+                title="Export Complete",
+                description=f"✅ Exported {count} row(s) from `{table}`.",
+                color=discord.Color.green()
+            ),
+            file=discord.File(path),
+            ephemeral=True
+        )
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(tmp_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tables", nargs="*", metavar="table", help=f"Tables to export: {', '.join(EXPORT_TABLES)} (default: all)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("-o", "--output", help="Output file (single table) or directory (default: current directory)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--guild", type=int, help="Only export this guild's rows (default: every guild)")
+    parser.add_argument("--db", default=database.DATABASE_NAME, help="Database file")
+    args = parser.parse_args()
+
+    tables = args.tables or EXPORT_TABLES
+    for table in tables:
+        if table not in EXPORT_TABLES:
+            parser.error(f"unknown table {table!r}")
+
+    database.DATABASE_NAME = args.db
+    for table in tables:
+        if args.output and len(tables) == 1 and not os.path.isdir(args.output):
+            path = args.output
+        else:
+            path = os.path.join(args.output or ".", f"{table}.{args.format}")
+        count = export_table(table, args.format, path, args.batch_size, args.guild)
+        print(f"{table:<20} {count:>10} rows -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Bulk import of questions from CSV or JSONL.
+
+Rows use the questions table's column names (type, question, correct_answer, option_a ...
+option_d, explanation, difficulty, domain, skill, image_url). Rows are streamed, validated
+against the SAT taxonomy and inserted in chunked transactions; invalid rows are reported by
+line number and skipped, as are duplicates of existing questions. Image URLs of imported
+questions are then checked concurrently and broken ones are reported as warnings. Questions
+go to the importing guild; run locally, they go to the shared bank unless --guild is given:
+
+    python -m commands.import_questions questions.csv --check-images
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import sqlite3
+
+import discord
+from discord import Interaction, Embed
+
+import utils.database as database
+from utils.database import QUESTION_TABLES, question_content_hash
+from utils.guilds import SHARED_BANK_ID, guild_placeholders, question_guild_ids
+from utils.images import image_validator
+from utils.image_store import mirror_images
+from utils.taxonomy import MATH_DOMAINS, EBRW_DOMAINS
+
+QUESTION_FIELDS = (
+    "type", "question", "correct_answer", "option_a", "option_b", "option_c", "option_d",
+    "explanation", "difficulty", "domain", "skill", "image_url"
+)
+REQUIRED_FIELDS = ("question", "option_a", "option_b", "option_c", "option_d")
+DIFFICULTIES = ("easy", "medium", "hard")
+
+# Same limits as the /addquestion modals
+FIELD_MAX_LENGTHS = {
+    "question": 2000,
+    "option_a": 250,
+    "option_b": 250,
+    "option_c": 250,
+    "option_d": 250,
+    "explanation": 2000,
+    "image_url": 500,
+}
+
+IMPORT_BATCH_SIZE = 5000
+HASH_LOOKUP_CHUNK = 500  # Stays under SQLite's bound parameter limit
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    """
+    Counts of an import plus the first MAX_REPORTED_ERRORS row errors, and the image URLs
+    of the imported rows (url -> first line number) for check_images.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+        self.image_urls = {}
+        self.warnings = []
+
+    def add_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, message))
+
+    def error_report(self):
+        lines = [f"Line {line_number}: {message}" for line_number, message in self.errors]
+        if self.error_count > len(self.errors):
+            lines.append(f"... and {self.error_count - len(self.errors)} more")
+        lines.extend(f"Line {line_number}: warning: {message}" for line_number, message in self.warnings)
+        return "\n".join(lines)
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename.lower())[1]
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return None
+
+
+def read_rows(stream, file_format):
+    """
+    Yield (line number, row dict, error message) for each record in a text stream.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "expected a JSON object"
+            continue
+        yield line_number, row, None
+
+
+def validate_row(row):
+    """
+    Check a row against the taxonomy and schema. Returns (values in QUESTION_FIELDS order
+    followed by the content hash, None) or (None, error message).
+    """
+    values = {field: str(row.get(field) or "").strip() for field in QUESTION_FIELDS}
+
+    question_type = values["type"].lower()
+    if question_type not in ("math", "ebrw"):
+        return None, f"type must be 'math' or 'ebrw', got {values['type']!r}"
+    values["type"] = question_type
+
+    domains = MATH_DOMAINS if question_type == "math" else EBRW_DOMAINS
+    if values["domain"] not in domains:
+        return None, f"unknown {question_type} domain {values['domain']!r}"
+    if values["skill"] not in domains[values["domain"]]:
+        return None, f"unknown skill {values['skill']!r} for domain {values['domain']!r}"
+
+    values["difficulty"] = values["difficulty"].lower()
+    if values["difficulty"] not in DIFFICULTIES:
+        return None, f"difficulty must be one of {', '.join(DIFFICULTIES)}"
+
+    values["correct_answer"] = values["correct_answer"].upper()
+    if values["correct_answer"] not in ("A", "B", "C", "D"):
+        return None, "correct_answer must be A, B, C or D"
+
+    for field in REQUIRED_FIELDS:
+        if not values[field]:
+            return None, f"{field} is required"
+    for field, max_length in FIELD_MAX_LENGTHS.items():
+        if len(values[field]) > max_length:
+            return None, f"{field} is longer than {max_length} characters"
+
+    values["explanation"] = values["explanation"] or None
+    values["image_url"] = values["image_url"] or None
+    content_hash = question_content_hash(
+        values["question"], values["option_a"], values["option_b"], values["option_c"], values["option_d"]
+    )
+    return tuple(values[field] for field in QUESTION_FIELDS) + (content_hash,), None
+
+
+def _insert_batch(conn, batch, result, guild_id):
+    """
+    Insert a batch of (line number, values) into guild_id in one transaction. Rows whose content
+    the guild already has, or that are earlier in the batch, are reported instead of inserted.
+    """
+    hashes = [values[-1] for _, values in batch]
+    guild_ids = question_guild_ids(conn, guild_id)
+    existing = {}
+    for table in QUESTION_TABLES:
+        for start in range(0, len(hashes), HASH_LOOKUP_CHUNK):
+            chunk = hashes[start:start + HASH_LOOKUP_CHUNK]
+            for content_hash, question_id in conn.execute(
+                f"SELECT content_hash, id FROM {table} "
+                f"WHERE guild_id IN ({guild_placeholders(guild_ids)}) "
+                f"AND content_hash IN ({', '.join('?' for _ in chunk)})",
+                (*guild_ids, *chunk)
+            ):
+                existing.setdefault(content_hash, question_id)
+
+    rows = []
+    seen = {}
+    for line_number, values in batch:
+        content_hash = values[-1]
+        if content_hash in existing:
+            result.add_error(line_number, f"duplicate of question ID {existing[content_hash]}")
+        elif content_hash in seen:
+            result.add_error(line_number, f"duplicate of line {seen[content_hash]}")
+        else:
+            seen[content_hash] = line_number
+            rows.append(values + (guild_id,))
+            image_url = values[QUESTION_FIELDS.index("image_url")]
+            if image_url:
+                result.image_urls.setdefault(image_url, line_number)
+
+    columns = QUESTION_FIELDS + ("content_hash", "guild_id")
+    with conn:
+        conn.executemany(f"""
+            INSERT INTO questions ({', '.join(columns)})
+            VALUES ({', '.join('?' for _ in columns)})
+        """, rows)
+    result.inserted += len(rows)
+
+
+def import_questions(stream, file_format, guild_id=SHARED_BANK_ID, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Stream rows from a text stream into guild_id's questions. Only one batch of rows is held
+    in memory at a time, and each batch is committed in its own transaction.
+    """
+    result = ImportResult()
+    batch = []
+    conn = database.get_database_connection()
+
+    try:
+        for line_number, row, error in read_rows(stream, file_format):
+            if error is None:
+                values, error = validate_row(row)
+            if error is not None:
+                result.add_error(line_number, error)
+                continue
+
+            batch.append((line_number, values))
+            if len(batch) >= batch_size:
+                _insert_batch(conn, batch, result, guild_id)
+                batch = []
+
+        if batch:
+            _insert_batch(conn, batch, result, guild_id)
+    except (csv.Error, UnicodeDecodeError) as e:
+        result.add_error("?", f"could not read file: {e}")
+    finally:
+        conn.close()
+
+    return result
+
+
+async def check_images(result):
+    """
+    Check the image URLs of imported questions concurrently and record broken ones as
+    warnings. The questions stay imported, like an unchecked image in /addquestion.
+    Working images are then copied into the image store, if it is enabled.
+    """
+    checks = await image_validator.check_many(result.image_urls)
+    for url, check in checks.items():
+        if not check.ok:
+            result.warnings.append((result.image_urls[url], f"image {url}: {check.reason}"))
+    result.warnings.sort()
+
+    # Mirror the working images locally when the image store is on
+    await mirror_images(url for url, check in checks.items() if check.ok)
+
+
+async def handle_import_questions_command(interaction: Interaction, attachment: discord.Attachment):
+    file_format = detect_format(attachment.filename)
+    if not file_format:
+        await interaction.response.send_message(
+            embed=Embed(
+                title="Import Failed",
+                description="❌ Please attach a `.csv` or `.jsonl` file.",
+                color=discord.Color.red()
+            ),
+            ephemeral=True
+        )
+        return
+
+    await interaction.response.defer(ephemeral=True)
+
+    data = await attachment.read()
+    stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline="")
+
+    # Run the import off the event loop so the bot keeps answering while it works
+    try:
+        result = await asyncio.to_thread(import_questions, stream, file_format, interaction.guild_id)
+    except sqlite3.Error as e:
+        await interaction.followup.send(
+            embed=Embed(
+                title="Import Failed",
+                description=f"❌ {e}\nQuestions imported before the error were kept; importing the file "
+                            "again skips them as duplicates.",
+                color=discord.Color.red()
+            ),
+            ephemeral=True
+        )
+        return
+    await check_images(result)
+
+    embed = Embed(
+        title="Import Results",
+        color=discord.Color.green() if not result.error_count else discord.Color.orange()
+    )
+    embed.add_field(name="Imported", value=f"✅ {result.inserted} question(s)", inline=True)
+    embed.add_field(name="Skipped", value=f"❌ {result.error_count} row(s)", inline=True)
+    if result.warnings:
+        embed.add_field(name="Broken Images", value=f"⚠️ {len(result.warnings)} question(s)", inline=True)
+
+    kwargs = {}
+    if result.errors or result.warnings:
+        preview = "\n".join(f"Line {line}: {message}" for line, message in (result.errors + result.warnings)[:10])
+        embed.add_field(name="Errors", value=preview[:1024], inline=False)
+        kwargs["file"] = discord.File(io.BytesIO(result.error_report().encode()), filename="import_errors.txt")
+
+    await interaction.followup.send(embed=embed, ephemeral=True, **kwargs)
+
+
+async def _check_images_and_close(result):
+    try:
+        await check_images(result)
+    finally:
+        await image_validator.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or JSONL file to import")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="File format (default: from the extension)")
+    parser.add_argument("--check-images", action="store_true", help="Check the imported image URLs")
+    parser.add_argument("--guild", type=int, default=SHARED_BANK_ID,
+                        help="Guild ID to import into (default: the shared bank)")
+    parser.add_argument("--db", default=database.DATABASE_NAME, help="Database file")
+    args = parser.parse_args()
+
+    file_format = args.format or detect_format(args.path)
+    if not file_format:
+        parser.error("could not tell the file format from the extension, pass --format")
+
+    database.DATABASE_NAME = args.db
+    database.init_db()
+    with open(args.path, encoding="utf-8-sig", newline="") as stream:
+        try:
+            result = import_questions(stream, file_format, args.guild)
+        except sqlite3.Error as e:
+            raise SystemExit(f"Import failed: {e}")
+
+    if args.check_images:
+        asyncio.run(_check_images_and_close(result))
+
+    print(f"Imported {result.inserted} question(s), skipped {result.error_count} row(s)")
+    if result.warnings:
+        print(f"{len(result.warnings)} question(s) have broken images")
+    if result.errors or result.warnings:
+        print(result.error_report())
+
+
+if __name__ == "__main__":
+    main()
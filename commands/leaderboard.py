@@ -2,11 +2,14 @@ from discord import Interaction, Embed
 from utils.database import get_database_connection
 
 
-async def handle_leaderboard_command(interaction: Interaction):
-    conn = get_database_connection()
+def leaderboard_rows(conn, guild_id):
+    """
+    Return the guild's top 10 users by accuracy, as (user_id, correct, attempts, accuracy),
+    and by total correct answers, as (user_id, correct, attempts).
+    """
     c = conn.cursor()
 
-    # Fetch top 10 users by accuracy
+    # Fetch the guild's top 10 users by accuracy; its rows are one range of the primary key
     c.execute('''
         SELECT 
             user_id, 
@@ -14,25 +17,31 @@ async def handle_leaderboard_command(interaction: Interaction):
             total_attempts, 
             (total_correct * 100.0 / total_attempts) as accuracy 
         FROM user_stats 
-        WHERE total_attempts > 0
+        WHERE guild_id = ? AND total_attempts > 0
         ORDER BY accuracy DESC 
         LIMIT 10
-    ''')
+    ''', (guild_id,))
     accuracy_leaderboard = c.fetchall()
 
-    # Fetch top 10 users by total correct answers
+    # Fetch the guild's top 10 users by total correct answers
     c.execute('''
         SELECT 
             user_id, 
             total_correct, 
             total_attempts 
         FROM user_stats 
-        WHERE total_attempts > 0
+        WHERE guild_id = ? AND total_attempts > 0
         ORDER BY total_correct DESC 
         LIMIT 10
-    ''')
+    ''', (guild_id,))
     total_correct_leaderboard = c.fetchall()
 
+    return accuracy_leaderboard, total_correct_leaderboard
+
+
+async def handle_leaderboard_command(interaction: Interaction):
+    conn = get_database_connection()
+    accuracy_leaderboard, total_correct_leaderboard = leaderboard_rows(conn, interaction.guild_id)
     conn.close()
 
     # Create leaderboard embed for accuracy
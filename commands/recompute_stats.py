@@ -0,0 +1,445 @@
+"""
+Rebuild user_stats and user_skill_stats from the daily_problem attempt log.
+
+The counters are derived data: every skill row is the sum of the user's attempts in that guild
+on questions with that skill, plus any admin adjustments recorded by /editstats in
+stat_adjustments. A user's stats in each guild are rebuilt separately.
+
+A full rebuild sums the log in one sequential pass of short user range reads into temp tables,
+then swaps the totals in a batch of users per transaction, so answers can still be recorded
+while it runs. A high-water mark (the answer time, in epoch seconds, the last run started at)
+lets later runs recompute only the users who answered since. Answers are stamped when they are
+clicked but committed in batches, so they don't commit in answer time order: an answer is
+only taken as settled ANSWER_COMMIT_LAG seconds after its time, and the window before the mark
+is read again. Attempts moved to cold storage
+(see commands/tier_attempts.py) are counted from their totals in attempt_rollups. Can also be
+run locally:
+
+    python -m commands.recompute_stats --full
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+from datetime import datetime
+
+import discord
+from discord import Interaction, Embed
+
+import utils.database as database
+
+RECOMPUTE_USER_BATCH = 400  # Also keeps the IN lists under SQLite's bound parameter limit
+LOG_SCAN_CHUNK = 250_000  # Attempts summed per read during a full rebuild
+RECOMPUTE_CACHE_KIB = 64 * 1024
+HIGH_WATER_MARK_KEY = "stats_high_water_mark"
+TIERED_ATTEMPTS_KEY = "tiered_attempts"  # Attempts moved to cold storage, counted by commands/tier_attempts.py
+LOG_PASS_RETRIES = 3
+# Longest an answer can take from its click to its commit, with a wide margin: the writer
+# usually commits within a second, but a batch can wait out a lock or a slow disk
+ANSWER_COMMIT_LAG = 3600
+
+
+class RecomputeResult:
+    def __init__(self, full):
+        self.full = full
+        self.users = 0
+        self.high_water_mark = 0
+        self.seconds = 0.0
+
+
+def _load_question_skills(conn):
+    """
+    Fill temp.question_skills with every question's skill ID, live questions taking priority
+    over archived copies, so the per-batch joins are primary key lookups on a small table.
+    """
+    for table in ("question_archives", "questions"):
+        # Questions may carry skills from before the taxonomy was fixed
+        conn.execute(f"""
+            INSERT OR IGNORE INTO skills (question_type, domain, skill)
+            SELECT DISTINCT lower(type), domain, skill
+            FROM {table}
+            WHERE domain IS NOT NULL AND skill IS NOT NULL
+        """)
+
+    conn.execute("DROP TABLE IF EXISTS temp.question_skills")
+    conn.execute("""
+        CREATE TEMP TABLE question_skills (
+            id INTEGER PRIMARY KEY,
+            skill_id INTEGER NOT NULL
+        )
+    """)
+    for table in ("question_archives", "questions"):
+        conn.execute(f"""
+            INSERT OR REPLACE INTO temp.question_skills (id, skill_id)
+            SELECT q.id, s.id
+            FROM {table} q
+            JOIN skills s ON s.question_type = lower(q.type) AND s.domain = q.domain AND s.skill = q.skill
+        """)
+    conn.commit()
+
+
+def get_high_water_mark(conn):
+    row = conn.execute("SELECT value FROM stats_state WHERE key = ?", (HIGH_WATER_MARK_KEY,)).fetchone()
+    return row[0] if row else None
+
+
+def get_tiered_attempts(conn):
+    row = conn.execute("SELECT value FROM stats_state WHERE key = ?", (TIERED_ATTEMPTS_KEY,)).fetchone()
+    return row[0] if row else 0
+
+
+def _affected_users(conn, high_water_mark):
+    """
+    Return the sorted (guild ID, user ID) pairs to recompute; a user's stats in each guild
+    are rebuilt separately.
+    """
+    if high_water_mark is None:
+        # Everyone with attempts, adjustments or existing counters
+        rows = conn.execute("""
+            SELECT guild_id, user_id FROM daily_problem
+            UNION SELECT guild_id, user_id FROM attempt_rollups
+            UNION SELECT guild_id, user_id FROM stat_adjustments
+            UNION SELECT guild_id, user_id FROM user_stats
+            UNION SELECT guild_id, user_id FROM user_skill_stats
+        """)
+    else:
+        # Answers stamped just before the mark may have committed after the last run read them
+        rows = conn.execute(
+            "SELECT DISTINCT guild_id, user_id FROM daily_problem WHERE response_time >= ?",
+            (high_water_mark - ANSWER_COMMIT_LAG,)
+        )
+    return sorted(rows)
+
+
+def _user_batches(pairs, batch_size):
+    """
+    Yield (guild ID, [user IDs]) batches of at most batch_size users from sorted pairs, so
+    every batch stays inside one guild's key range.
+    """
+    guild_id, user_ids = None, []
+    for pair_guild_id, user_id in pairs:
+        if user_ids and (pair_guild_id != guild_id or len(user_ids) >= batch_size):
+            yield guild_id, user_ids
+            user_ids = []
+        guild_id = pair_guild_id
+        user_ids.append(user_id)
+    if user_ids:
+        yield guild_id, user_ids
+
+
+def _replace_user_rows(conn, guild_id, user_ids, skill_log_sql, user_log_sql, log_params):
+    """
+    Replace the counters of user_ids in guild_id with log totals plus their admin adjustments.
+    The log SELECTs must name their columns like the temp totals table (skill_id, correct,
+    attempts).
+    """
+    placeholders = ", ".join("?" for _ in user_ids)
+    user_params = [guild_id] + user_ids
+
+    conn.execute(f"DELETE FROM user_skill_stats WHERE guild_id = ? AND user_id IN ({placeholders})", user_params)
+    conn.execute(f"""
+        INSERT INTO user_skill_stats (guild_id, user_id, skill_id, total_correct, total_attempts)
+        SELECT ?, user_id, skill_id, SUM(correct), SUM(attempts)
+        FROM (
+            {skill_log_sql.format(placeholders=placeholders)}
+            UNION ALL
+            SELECT user_id, skill_id, correct_delta, attempts_delta
+            FROM stat_adjustments
+            WHERE guild_id = ? AND user_id IN ({placeholders})
+        )
+        GROUP BY user_id, skill_id
+    """, [guild_id] + log_params + user_params)
+
+    # Overall totals count every attempt, including ones on deleted questions
+    conn.execute(f"DELETE FROM user_stats WHERE guild_id = ? AND user_id IN ({placeholders})", user_params)
+    conn.execute(f"""
+        INSERT INTO user_stats (guild_id, user_id, total_correct, total_attempts)
+        SELECT ?, user_id, SUM(correct), SUM(attempts)
+        FROM (
+            {user_log_sql.format(placeholders=placeholders)}
+            UNION ALL
+            SELECT user_id, SUM(correct_delta), SUM(attempts_delta)
+            FROM stat_adjustments
+            WHERE guild_id = ? AND user_id IN ({placeholders})
+            GROUP BY user_id
+        )
+        GROUP BY user_id
+    """, [guild_id] + log_params + user_params)
+
+
+def _recompute_users(conn, guild_id, user_ids):
+    """
+    Recompute users straight from their attempts, read from the covering user index, and
+    their rollups. Cheap for the handful of users an incremental run touches.
+    """
+    user_params = [guild_id] + user_ids
+    _replace_user_rows(
+        conn, guild_id, user_ids,
+        """
+            SELECT d.user_id, q.skill_id, d.is_correct AS correct, 1 AS attempts
+            FROM daily_problem d
+            JOIN temp.question_skills q ON q.id = d.question_id
+            WHERE d.guild_id = ? AND d.user_id IN ({placeholders})
+            UNION ALL
+            SELECT user_id, skill_id, total_correct, total_attempts
+            FROM attempt_rollups
+            WHERE guild_id = ? AND user_id IN ({placeholders}) AND skill_id != -1
+        """,
+        """
+            SELECT user_id, SUM(is_correct) AS correct, COUNT(*) AS attempts
+            FROM daily_problem
+            WHERE guild_id = ? AND user_id IN ({placeholders})
+            GROUP BY user_id
+            UNION ALL
+            SELECT user_id, SUM(total_correct), SUM(total_attempts)
+            FROM attempt_rollups
+            WHERE guild_id = ? AND user_id IN ({placeholders})
+            GROUP BY user_id
+        """,
+        user_params + user_params
+    )
+
+
+def _log_chunks(conn, chunk_size):
+    """
+    Yield (guild ID, low, high) user ID bounds splitting each guild's range of daily_problem
+    into runs of about chunk_size attempts that never split a user; low is exclusive, high
+    inclusive and None for the last run of the guild.
+    """
+    guild_id = -1
+    while True:
+        # Step from guild to guild along the index instead of scanning for distinct IDs
+        guild_id = conn.execute("SELECT MIN(guild_id) FROM daily_problem WHERE guild_id > ?", (guild_id,)).fetchone()[0]
+        if guild_id is None:
+            return
+
+        low = -1
+        while True:
+            high = conn.execute("""
+                SELECT user_id
+                FROM daily_problem
+                WHERE guild_id = ? AND user_id > ?
+                ORDER BY user_id
+                LIMIT 1 OFFSET ?
+            """, (guild_id, low, chunk_size - 1)).fetchone()
+            yield guild_id, low, high and high[0]
+            if high is None:
+                break
+            low = high[0]
+
+
+def _accumulate_log(conn, settled, chunk_size):
+    """
+    Sum every attempt answered before settled into temp.log_totals with one sequential
+    pass over the covering user index, in user ranges of about chunk_size attempts so no single
+    read holds the database for long, then adds the rollups of moved attempts. Attempts on
+    deleted questions land under skill ID -1 and only count toward the overall totals.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.log_totals")
+    conn.execute("""
+        CREATE TEMP TABLE log_totals (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            skill_id INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            attempts INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id, skill_id)
+        ) WITHOUT ROWID
+    """)
+
+    for guild_id, low, high in _log_chunks(conn, chunk_size):
+        # The last chunk runs to the end of the guild's range
+        high_sql = "AND d.user_id <= ?" if high is not None else ""
+        with conn:
+            conn.execute(f"""
+                INSERT INTO temp.log_totals (guild_id, user_id, skill_id, correct, attempts)
+                SELECT d.guild_id, d.user_id, COALESCE(q.skill_id, -1), SUM(d.is_correct), COUNT(*)
+                FROM daily_problem d INDEXED BY idx_daily_problem_user
+                LEFT JOIN temp.question_skills q ON q.id = d.question_id
+                WHERE d.guild_id = ? AND d.user_id > ? {high_sql} AND d.response_time < ?
+                GROUP BY 2, 3
+            """, (guild_id, low, *(() if high is None else (high,)), settled))
+
+    with conn:
+        conn.execute("""
+            INSERT INTO temp.log_totals (guild_id, user_id, skill_id, correct, attempts)
+            SELECT guild_id, user_id, skill_id, total_correct, total_attempts
+            FROM attempt_rollups
+            WHERE true
+            ON CONFLICT(guild_id, user_id, skill_id) DO UPDATE SET
+            correct = correct + excluded.correct,
+            attempts = attempts + excluded.attempts
+        """)
+
+
+def _swap_in_totals(conn, guild_id, user_ids, settled):
+    """
+    Replace users' counters with the accumulated totals plus any attempts they made at or
+    after settled, which the log pass leaves out. Those are read in the same transaction as the
+    swap, so they include answers committed after the log pass read the user; answers committed
+    after the swap add themselves to the new counters.
+    """
+    user_params = [guild_id] + user_ids
+    _replace_user_rows(
+        conn, guild_id, user_ids,
+        """
+            SELECT user_id, skill_id, correct, attempts
+            FROM temp.log_totals
+            WHERE guild_id = ? AND user_id IN ({placeholders}) AND skill_id != -1
+            UNION ALL
+            SELECT d.user_id, q.skill_id, d.is_correct, 1
+            FROM daily_problem d
+            JOIN temp.question_skills q ON q.id = d.question_id
+            WHERE d.guild_id = ? AND d.user_id IN ({placeholders}) AND d.response_time >= ?
+        """,
+        """
+            SELECT user_id, SUM(correct) AS correct, SUM(attempts) AS attempts
+            FROM temp.log_totals
+            WHERE guild_id = ? AND user_id IN ({placeholders})
+            GROUP BY user_id
+            UNION ALL
+            SELECT user_id, SUM(is_correct), COUNT(*)
+            FROM daily_problem
+            WHERE guild_id = ? AND user_id IN ({placeholders}) AND response_time >= ?
+            GROUP BY user_id
+        """,
+        user_params + user_params + [settled]
+    )
+
+
+def capture_adjustments(conn):
+    """
+    Record the current difference between user_skill_stats and the attempt log as admin
+    adjustments, so a rebuild keeps edits made before stat_adjustments existed.
+    """
+    _load_question_skills(conn)
+    with conn:
+        conn.execute("DELETE FROM stat_adjustments")
+        conn.execute("""
+            INSERT INTO stat_adjustments (guild_id, user_id, skill_id, correct_delta, attempts_delta)
+            SELECT guild_id, user_id, skill_id, SUM(correct), SUM(attempts)
+            FROM (
+                SELECT guild_id, user_id, skill_id, total_correct AS correct, total_attempts AS attempts
+                FROM user_skill_stats
+                UNION ALL
+                SELECT d.guild_id, d.user_id, q.skill_id, -d.is_correct, -1
+                FROM daily_problem d
+                JOIN temp.question_skills q ON q.id = d.question_id
+                UNION ALL
+                SELECT guild_id, user_id, skill_id, -total_correct, -total_attempts
+                FROM attempt_rollups
+                WHERE skill_id != -1
+            )
+            GROUP BY guild_id, user_id, skill_id
+            HAVING SUM(correct) != 0 OR SUM(attempts) != 0
+        """)
+
+
+def recompute_stats(full=False, batch_size=RECOMPUTE_USER_BATCH, log_chunk_size=LOG_SCAN_CHUNK):
+    """
+    Recompute the counters of every user (full, or when no high-water mark is stored yet)
+    or only of users with attempts past the high-water mark.
+    """
+    start = time.perf_counter()
+    conn = database.get_database_connection()
+    # Room for the temp tables and sorts; this only applies to this connection
+    conn.execute(f"PRAGMA cache_size = -{RECOMPUTE_CACHE_KIB}")
+    try:
+        _load_question_skills(conn)
+
+        high_water_mark = None if full else get_high_water_mark(conn)
+        result = RecomputeResult(full=high_water_mark is None)
+
+        # Answers from ANSWER_COMMIT_LAG before this second on are picked up again by the next
+        # run, which is harmless since each run recomputes users from scratch
+        new_high_water_mark = int(time.time())
+        settled = new_high_water_mark - ANSWER_COMMIT_LAG
+        user_ids = _affected_users(conn, high_water_mark)
+
+        if result.full:
+            # One sequential pass over the log beats an index lookup per attempt. The pass spans
+            # many reads, so if attempts were moved to cold storage meanwhile, some may have been
+            # counted both in the log and in their rollup, or in neither; the pass starts over.
+            for attempt in range(LOG_PASS_RETRIES + 1):
+                tiered = get_tiered_attempts(conn)
+                _accumulate_log(conn, settled, log_chunk_size)
+                if get_tiered_attempts(conn) == tiered:
+                    break
+                if attempt == LOG_PASS_RETRIES:
+                    raise RuntimeError("Attempts kept being moved to cold storage during the rebuild, try again later")
+            for guild_id, batch in _user_batches(user_ids, batch_size):
+                with conn:
+                    _swap_in_totals(conn, guild_id, batch, settled)
+            conn.execute("DROP TABLE temp.log_totals")
+        else:
+            for guild_id, batch in _user_batches(user_ids, batch_size):
+                with conn:
+                    _recompute_users(conn, guild_id, batch)
+
+        with conn:
+            conn.execute("""
+                INSERT INTO stats_state (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """, (HIGH_WATER_MARK_KEY, new_high_water_mark))
+
+        result.users = len(user_ids)
+        result.high_water_mark = new_high_water_mark
+    finally:
+        conn.close()
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+async def handle_recompute_stats_command(interaction: Interaction, full: bool = False):
+    await interaction.response.defer(ephemeral=True)
+
+    # Run off the event loop; each batch only holds the write lock briefly
+    try:
+        result = await asyncio.to_thread(recompute_stats, full)
+    except (RuntimeError, sqlite3.Error) as e:
+        await interaction.followup.send(
+            embed=Embed(title="Recompute Failed", description=f"❌ {e}", color=discord.Color.red()),
+            ephemeral=True
+        )
+        return
+
+    embed = Embed(
+        title="Stats Recomputed",
+        description=(
+            f"✅ Rebuilt the stats of **{result.users}** user(s) from the attempt log "
+            f"({'full rebuild' if result.full else 'since the last run'}) in {result.seconds:.1f}s."
+        ),
+        color=discord.Color.green()
+    )
+    embed.set_footer(text=f"Counted answers up to {datetime.utcfromtimestamp(result.high_water_mark):%Y-%m-%d %H:%M:%S} UTC")
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="Recompute every user, not just recent ones")
+    parser.add_argument("--capture-adjustments", action="store_true",
+                        help="First record the current drift from the log as admin adjustments, "
+                             "so the rebuild keeps past /editstats edits")
+    parser.add_argument("--batch-size", type=int, default=RECOMPUTE_USER_BATCH, help="Users per transaction")
+    parser.add_argument("--db", default=database.DATABASE_NAME, help="Database file")
+    args = parser.parse_args()
+
+    database.DATABASE_NAME = args.db
+    database.init_db()
+
+    if args.capture_adjustments:
+        conn = database.get_database_connection()
+        capture_adjustments(conn)
+        count = conn.execute("SELECT COUNT(*) FROM stat_adjustments").fetchone()[0]
+        conn.close()
+        print(f"Captured {count} adjustment(s)")
+
+    result = recompute_stats(args.full, args.batch_size)
+    print(f"Recomputed {result.users} user(s) ({'full' if result.full else 'incremental'}) "
+          f"in {result.seconds:.2f}s, high-water mark {datetime.utcfromtimestamp(result.high_water_mark)} UTC")
+
+
+if __name__ == "__main__":
+    main()
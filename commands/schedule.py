@@ -0,0 +1,315 @@
+"""
+Automatic daily problems.
+
+/scheduledaily stores a posting time for a channel in daily_schedules, and the DailyScheduler
+started in on_ready posts there every day. Times are in UTC. Shortly before each slot the
+scheduler picks the question, renders it into the question cache and mirrors its image, and
+keeps the pick in the schedule row, so the post itself is a single send and a restart in
+between posts the same question. Channels of a guild scheduled for the same time get the same
+question, posted to all of them at once and counted together.
+
+Schedules live in the database, so they survive restarts. After downtime, a slot missed by
+less than CATCH_UP_WINDOW is posted late, once; older missed slots are skipped and logged,
+so a long outage never ends in a burst of posts. In a sharded deployment every process only
+posts for the guilds on its own shards.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import discord
+from discord import Interaction, Embed
+
+from commands.daily_problem import pick_question, post_question
+from utils.database import get_database_connection
+from utils.image_store import mirror_image
+from utils.question_cache import cache_question, get_question_payload
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_TICK = 30  # Seconds between checks for due schedules
+PREFETCH_AHEAD = 10 * 60  # Seconds before a slot that its question is picked and rendered
+CATCH_UP_WINDOW = 6 * 60 * 60  # Missed slots older than this are skipped
+
+
+def parse_post_time(text):
+    """
+    Parse an HH:MM time into (hour, minute). Raises ValueError if it isn't one.
+    """
+    hour, minute = (int(part) for part in text.strip().split(":"))
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"{text!r} is not a time of day")
+    return hour, minute
+
+
+def next_slot(post_time, after):
+    """
+    Return the first epoch time strictly after `after` that falls on post_time (HH:MM, UTC).
+    """
+    hour, minute = parse_post_time(post_time)
+    slot = datetime.fromtimestamp(after, timezone.utc).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if slot.timestamp() <= after:
+        slot += timedelta(days=1)
+    return int(slot.timestamp())
+
+
+def set_schedule(conn, guild_id, channel_id, post_time, question_type=None, now=None):
+    """
+    Post to channel_id every day at post_time, replacing the channel's previous schedule.
+    Returns the epoch time of the first post.
+    """
+    hour, minute = parse_post_time(post_time)
+    post_time = f"{hour:02d}:{minute:02d}"
+    next_run = next_slot(post_time, time.time() if now is None else now)
+    conn.execute("""
+        INSERT INTO daily_schedules (guild_id, channel_id, post_time, question_type, next_run, next_question_id)
+        VALUES (?, ?, ?, ?, ?, NULL)
+        ON CONFLICT(guild_id, channel_id) DO UPDATE SET
+        post_time = excluded.post_time,
+        question_type = excluded.question_type,
+        next_run = excluded.next_run,
+        next_question_id = NULL
+    """, (guild_id, channel_id, post_time, question_type, next_run))
+    return next_run
+
+
+def remove_schedule(conn, guild_id, channel_id):
+    """
+    Stop posting to channel_id. Returns False if it had no schedule.
+    """
+    cursor = conn.execute(
+        "DELETE FROM daily_schedules WHERE guild_id = ? AND channel_id = ?", (guild_id, channel_id)
+    )
+    return cursor.rowcount > 0
+
+
+def guild_schedules(conn, guild_id):
+    """
+    Return [(channel_id, post_time, question_type, next_run)] for a guild, earliest first.
+    """
+    return conn.execute("""
+        SELECT channel_id, post_time, question_type, next_run
+        FROM daily_schedules
+        WHERE guild_id = ?
+        ORDER BY next_run
+    """, (guild_id,)).fetchall()
+
+
+class DailyScheduler:
+    """
+    Posts the daily problem to every scheduled channel of the guilds this process serves.
+    """
+
+    def __init__(self, bot, tick=SCHEDULER_TICK):
+        self.bot = bot
+        self.tick = tick
+        self.posted = 0
+        self.skipped = 0
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_due()
+            except Exception as e:
+                logger.error(f"Daily scheduler tick failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    def _load(self, until):
+        conn = get_database_connection()
+        try:
+            return conn.execute("""
+                SELECT guild_id, channel_id, post_time, question_type, next_run, next_question_id
+                FROM daily_schedules
+                WHERE next_run <= ?
+                ORDER BY next_run
+            """, (until,)).fetchall()
+        finally:
+            conn.close()
+
+    def _update(self, schedules, next_run, next_question_id):
+        conn = get_database_connection()
+        try:
+            with conn:
+                conn.executemany("""
+                    UPDATE daily_schedules SET next_run = ?, next_question_id = ?
+                    WHERE guild_id = ? AND channel_id = ?
+                """, [(next_run, next_question_id, schedule[0], schedule[1]) for schedule in schedules])
+        finally:
+            conn.close()
+
+    def _pick(self, guild_id, question_type):
+        conn = get_database_connection()
+        try:
+            return pick_question(conn, guild_id, question_type)
+        finally:
+            conn.close()
+
+    async def run_due(self, now=None):
+        """
+        Prefetch the questions of slots coming up soon and post the slots that are due.
+        """
+        now = time.time() if now is None else now
+        schedules = await asyncio.to_thread(self._load, now + PREFETCH_AHEAD)
+
+        # Channels of one guild sharing a slot and question type get the same question, in one fan-out
+        groups = {}
+        for schedule in schedules:
+            # Other processes post for the guilds on their shards
+            if self.bot.get_guild(schedule[0]) is None:
+                continue
+            groups.setdefault((schedule[0], schedule[3], schedule[4]), []).append(schedule)
+
+        results = await asyncio.gather(*(
+            self.prefetch(group) if group[0][4] > now else self.post(group, now=now)
+            for group in groups.values()
+        ), return_exceptions=True)
+        for (guild_id, _, _), result in zip(groups, results):
+            if isinstance(result, Exception):
+                logger.error(f"Daily problem for guild {guild_id} failed: {result}")
+
+    async def prefetch(self, schedules):
+        """
+        Make sure the slot's question is picked, rendered and has its image mirrored. Returns
+        its payload, or None if the guild has no question to post.
+        """
+        guild_id, _, _, question_type, next_run, _ = schedules[0]
+        payload = None
+        for question_id in {schedule[5] for schedule in schedules if schedule[5]}:
+            payload = get_question_payload(question_id)
+            if payload is not None:
+                break
+
+        if payload is None:
+            # Not picked yet, or the pick has been archived since
+            question = await asyncio.to_thread(self._pick, guild_id, question_type)
+            if question is None:
+                return None
+            payload = cache_question(question)
+        if any(schedule[5] != payload.question_id for schedule in schedules):
+            await asyncio.to_thread(self._update, schedules, next_run, payload.question_id)
+
+        await mirror_image(payload.main_embed_dict.get("image", {}).get("url"))
+        return payload
+
+    async def post(self, schedules, now=None):
+        now = time.time() if now is None else now
+        guild_id, _, post_time, _, next_run, next_question_id = schedules[0]
+        following = next_slot(post_time, now)
+
+        if now - next_run > CATCH_UP_WINDOW:
+            # Too late to still count as that day's problem; the pick is kept for the next slot
+            logger.warning(
+                f"Skipped the {post_time} UTC daily problem for {len(schedules)} channel(s) in guild {guild_id}, "
+                f"missed by {(now - next_run) / 3600:.1f}h"
+            )
+            self.skipped += len(schedules)
+            await asyncio.to_thread(self._update, schedules, following, next_question_id)
+            return
+
+        payload = await self.prefetch(schedules)
+        guild = self.bot.get_guild(guild_id)
+        channels, missing = [], []
+        for schedule in schedules:
+            channel = guild.get_channel(schedule[1])
+            if channel is None or payload is None:
+                missing.append(schedule)
+            else:
+                channels.append((schedule, channel))
+        if missing:
+            reason = "there are no questions to post" if payload is None else "the channel no longer exists"
+            logger.warning(f"Skipped the daily problem for {len(missing)} channel(s) in guild {guild_id}: {reason}")
+            self.skipped += len(missing)
+            await asyncio.to_thread(self._update, missing, following, None)
+        if not channels:
+            return
+
+        _, failures = await post_question(payload, [channel for _, channel in channels])
+        failed = {channel.id: error for channel, error in failures}
+        posted, given_up = [], []
+        for schedule, channel in channels:
+            error = failed.get(channel.id)
+            if error is None:
+                posted.append(schedule)
+            elif isinstance(error, (discord.Forbidden, discord.NotFound)):
+                # Retrying won't help until an admin fixes the channel, so move on to the next slot
+                logger.warning(f"Could not post the daily problem to channel {channel.id} (guild {guild_id}): {error}")
+                given_up.append(schedule)
+            else:
+                # Left due, so the next tick tries again
+                logger.error(f"Posting the daily problem to channel {channel.id} (guild {guild_id}) failed: {error}")
+
+        self.posted += len(posted)
+        self.skipped += len(given_up)
+        await asyncio.to_thread(self._update, posted, following, None)
+        await asyncio.to_thread(self._update, given_up, following, payload.question_id)
+
+
+def _schedule_list_embed(conn, guild_id, title, description):
+    embed = Embed(title=title, description=description, color=discord.Color.green())
+    lines = [
+        f"<#{channel_id}> at **{post_time} UTC**{f' ({question_type.upper()})' if question_type else ''}, "
+        f"next <t:{next_run}:R>"
+        for channel_id, post_time, question_type, next_run in guild_schedules(conn, guild_id)
+    ]
+    embed.add_field(name="Scheduled Channels", value="\n".join(lines) or "None", inline=False)
+    return embed
+
+
+async def handle_schedule_daily_command(interaction: Interaction, channel, post_time: str, question_type: str = None):
+    try:
+        parse_post_time(post_time)
+    except ValueError:
+        await interaction.response.send_message(
+            embed=Embed(
+                title="Invalid Time",
+                description="❌ Give the time as `HH:MM` in UTC, for example `14:30`.",
+                color=discord.Color.red()
+            ),
+            ephemeral=True
+        )
+        return
+
+    conn = get_database_connection()
+    try:
+        with conn:
+            next_run = set_schedule(conn, interaction.guild_id, channel.id, post_time, question_type)
+        embed = _schedule_list_embed(
+            conn, interaction.guild_id, "Daily Problem Scheduled",
+            f"✅ A daily problem will be posted in {channel.mention} every day, starting <t:{next_run}:f>."
+        )
+    finally:
+        conn.close()
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+async def handle_unschedule_daily_command(interaction: Interaction, channel):
+    conn = get_database_connection()
+    try:
+        with conn:
+            removed = remove_schedule(conn, interaction.guild_id, channel.id)
+        embed = _schedule_list_embed(
+            conn, interaction.guild_id, "Daily Problem Unscheduled",
+            f"✅ Daily problems will no longer be posted in {channel.mention}." if removed
+            else f"{channel.mention} had no daily problem scheduled."
+        )
+    finally:
+        conn.close()
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
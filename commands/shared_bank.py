@@ -0,0 +1,31 @@
+import discord
+from discord import Interaction, Embed
+
+from utils.database import get_database_connection
+from utils.guilds import SHARED_BANK_ID, set_shared_bank
+
+
+async def handle_shared_bank_command(interaction: Interaction, enabled: bool):
+    """
+    Opt the guild into or out of posting questions from the shared bank. The shared questions
+    are read in place, so nothing is copied and the guild's own questions are untouched.
+    """
+    conn = get_database_connection()
+    try:
+        with conn:
+            set_shared_bank(conn, interaction.guild_id, enabled)
+        shared_count = conn.execute(
+            "SELECT COUNT(*) FROM questions WHERE guild_id = ?", (SHARED_BANK_ID,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+    if enabled:
+        description = f"✅ This server can now be sent the **{shared_count}** question(s) in the shared bank."
+    else:
+        description = "✅ This server will only be sent its own questions."
+
+    await interaction.response.send_message(
+        embed=Embed(title="Shared Question Bank", description=description, color=discord.Color.green()),
+        ephemeral=True
+    )
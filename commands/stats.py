@@ -1,5 +1,6 @@
 from discord import Interaction, Embed, Member
 from utils.database import get_database_connection
+from utils.taxonomy import skill_registry
 
 async def handle_stats_command(interaction: Interaction, someone_else: Member = None):
     # Determine whose stats to fetch
@@ -10,7 +11,10 @@ async def handle_stats_command(interaction: Interaction, someone_else: Member =
     c = conn.cursor()
 
     # Fetch overall user stats
-    c.execute('SELECT total_correct, total_attempts FROM user_stats WHERE user_id = ?', (user_id,))
+    c.execute(
+        'SELECT total_correct, total_attempts FROM user_stats WHERE guild_id = ? AND user_id = ?',
+        (interaction.guild_id, user_id)
+    )
     stats = c.fetchone()
 
     if stats is None or (stats[0] == 0 and stats[1] == 0):
@@ -26,13 +30,16 @@ async def handle_stats_command(interaction: Interaction, someone_else: Member =
     total_correct, total_attempts = stats
     overall_accuracy = (total_correct / total_attempts * 100) if total_attempts > 0 else 0
 
-    # Fetch per-skill stats
+    # Fetch per-skill stats, naming the skills from the in-memory registry
     c.execute('''
-        SELECT question_type, domain, skill, total_correct, total_attempts
+        SELECT skill_id, total_correct, total_attempts
         FROM user_skill_stats
-        WHERE user_id = ? AND total_attempts > 0
-    ''', (user_id,))
-    skill_stats = c.fetchall()
+        WHERE guild_id = ? AND user_id = ? AND total_attempts > 0
+    ''', (interaction.guild_id, user_id))
+    skill_stats = [
+        (*skill_registry.skill_for(conn, skill_id), total_correct, total_attempts)
+        for skill_id, total_correct, total_attempts in c.fetchall()
+    ]
 
     conn.close()
 
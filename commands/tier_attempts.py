@@ -0,0 +1,265 @@
+"""
+Move old attempts out of daily_problem into a cold database file.
+
+Only recent attempts are read on the hot path: answers are checked and counted per posting,
+and postings end a day after they are posted. Attempts on postings that ended more than
+ATTEMPT_RETENTION_DAYS ago are moved to the COLD_DATABASE file in batches: each batch is
+copied in one transaction, then deleted TIER_DELETE_SIZE attempts per transaction with a
+pause after each, so answers keep being recorded while the job runs. Every delete also adds
+its attempts' totals to attempt_rollups, which a stats recompute reads instead of the moved
+attempts; a rollup counts attempts under the skill their question had when they were moved. The rare query that needs every attempt, like an export, reads the
+all_attempts view that utils.database.attach_cold_storage creates.
+
+Each batch is copied to the cold file before it is deleted from daily_problem, in separate
+transactions, since SQLite doesn't commit WAL files atomically together. If the job stops
+between the two, the next run copies the batch again, which is ignored, and then deletes it.
+The pages a batch frees are given back to the file system with incremental_vacuum, without
+ever rewriting the whole file. Databases created before this job existed must be converted
+once with --enable-incremental-vacuum (a full VACUUM, run while the bot is stopped); until
+then freed pages are only reused for new attempts.
+
+With COLD_DATABASE set, the bot runs the job every TIER_INTERVAL_HOURS. It can also be run
+locally:
+
+    python -m commands.tier_attempts --cold sat_bot_cold.db --days 180
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+import utils.database as database
+from commands.recompute_stats import TIERED_ATTEMPTS_KEY, _load_question_skills
+
+logger = logging.getLogger(__name__)
+
+ATTEMPT_RETENTION_DAYS = 180
+TIER_BATCH_SIZE = 10000  # Attempts copied to the cold file per transaction
+TIER_DELETE_SIZE = 250  # Attempts deleted from daily_problem per transaction
+TIER_DELETE_PAUSE = 0.05  # Seconds between deletes, leaving the write lock and the disk to answers
+CHECKPOINT_EVERY_DELETES = 8  # Deletes between WAL checkpoints
+TIER_INTERVAL_HOURS = 24
+INCREMENTAL_VACUUM = 2  # PRAGMA auto_vacuum value
+VACUUM_STEP_PAGES = 128  # Pages given back per transaction
+
+
+class TierResult:
+    def __init__(self, cutoff):
+        self.cutoff = cutoff
+        self.postings = 0
+        self.attempts = 0
+        self.pages_freed = 0
+        self.seconds = 0.0
+
+
+def retention_days():
+    return float(os.getenv("ATTEMPT_RETENTION_DAYS") or ATTEMPT_RETENTION_DAYS)
+
+
+def _old_postings(conn, cutoff):
+    """
+    Return the IDs of postings that ended before cutoff and still have attempts in daily_problem.
+    """
+    return [row[0] for row in conn.execute("""
+        SELECT id
+        FROM postings p
+        WHERE ends_at < ? AND EXISTS (SELECT 1 FROM daily_problem d WHERE d.posting_id = p.id)
+        ORDER BY ends_at, id
+    """, (cutoff,))]
+
+
+def _move_batch(conn, delete_size):
+    """
+    Move the attempts in temp.tier_batch to the cold file and into attempt_rollups. Returns
+    the number of attempts moved.
+    """
+    # One synced copy for the whole batch, then short deletes, since only the deletes hold up answers
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO cold.daily_problem SELECT * FROM temp.tier_batch")
+
+    # The batch's rowids run from 1, as the table is emptied after every batch
+    moved = 0
+    size = conn.execute("SELECT COUNT(*) FROM temp.tier_batch").fetchone()[0]
+    for step, low in enumerate(range(0, size, delete_size), 1):
+        rows = (low, low + delete_size)
+        with conn:
+            conn.execute("""
+                INSERT INTO attempt_rollups (guild_id, user_id, skill_id, total_correct, total_attempts)
+                SELECT b.guild_id, b.user_id, COALESCE(q.skill_id, -1), SUM(b.is_correct), COUNT(*)
+                FROM temp.tier_batch b
+                LEFT JOIN temp.question_skills q ON q.id = b.question_id
+                WHERE b.rowid > ? AND b.rowid <= ?
+                GROUP BY 1, 2, 3
+                ON CONFLICT(guild_id, user_id, skill_id) DO UPDATE SET
+                total_correct = total_correct + excluded.total_correct,
+                total_attempts = total_attempts + excluded.total_attempts
+            """, rows)
+            deleted = conn.execute("""
+                DELETE FROM daily_problem
+                WHERE (posting_id, user_id, guild_id) IN (
+                    SELECT posting_id, user_id, guild_id FROM temp.tier_batch WHERE rowid > ? AND rowid <= ?
+                )
+            """, rows).rowcount
+            conn.execute("""
+                INSERT INTO stats_state (key, value) VALUES (?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = value + excluded.value
+            """, (TIERED_ATTEMPTS_KEY, deleted))
+        moved += deleted
+        if step % CHECKPOINT_EVERY_DELETES == 0:
+            _checkpoint(conn)
+        time.sleep(TIER_DELETE_PAUSE)
+    conn.execute("DELETE FROM temp.tier_batch")
+    conn.commit()
+    return moved
+
+
+def _checkpoint(conn):
+    """
+    Copy the WAL back into the hot file from this thread. Left to SQLite, the checkpoint runs
+    in whichever commit takes the WAL past its limit, which is usually an answer's.
+    """
+    conn.execute("PRAGMA main.wal_checkpoint(PASSIVE)").fetchall()
+
+
+def _free_pages(conn):
+    """
+    Give the hot file's free pages back to the file system, if it was created for it.
+    Returns the number of pages freed.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL_VACUUM:
+        return 0
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    for _ in range(0, free, VACUUM_STEP_PAGES):
+        # Each page takes a step of the statement, which execute() only takes once
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+        time.sleep(TIER_DELETE_PAUSE)
+    return free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def tier_attempts(cutoff=None, batch_size=TIER_BATCH_SIZE, cold_path=None, delete_size=TIER_DELETE_SIZE):
+    """
+    Move the attempts on postings that ended before cutoff (epoch seconds, default
+    retention_days() ago) to the cold file.
+    """
+    start = time.perf_counter()
+    cutoff = int(time.time() - retention_days() * 86400) if cutoff is None else cutoff
+    result = TierResult(cutoff)
+
+    conn = database.get_database_connection()
+    try:
+        database.attach_cold_storage(conn, cold_path, create=True)
+        _load_question_skills(conn)
+        conn.execute("DROP TABLE IF EXISTS temp.tier_batch")
+        conn.execute("CREATE TEMP TABLE tier_batch AS SELECT * FROM main.daily_problem LIMIT 0")
+
+        postings = _old_postings(conn, cutoff)
+        pending = 0
+        for posting_id in postings:
+            while True:
+                # Moved attempts are gone from daily_problem, so this continues where the last batch stopped
+                pending += conn.execute("""
+                    INSERT INTO temp.tier_batch
+                    SELECT * FROM main.daily_problem WHERE posting_id = ? ORDER BY user_id, guild_id LIMIT ?
+                """, (posting_id, batch_size - pending)).rowcount
+                if pending < batch_size:
+                    break
+                result.attempts += _move_batch(conn, delete_size)
+                result.pages_freed += _free_pages(conn)
+                pending = 0
+        if pending:
+            result.attempts += _move_batch(conn, delete_size)
+            result.pages_freed += _free_pages(conn)
+        conn.commit()
+        result.postings = len(postings)
+        if result.attempts and conn.execute("PRAGMA auto_vacuum").fetchone()[0] != INCREMENTAL_VACUUM:
+            logger.warning(
+                "The database was created without incremental vacuum, so moved attempts free space "
+                "for new ones but don't shrink the file; see python -m commands.tier_attempts --help"
+            )
+    finally:
+        conn.close()
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def enable_incremental_vacuum():
+    """
+    Convert an existing database so freed pages can be given back, with one full VACUUM.
+    """
+    conn = database.get_database_connection()
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+class TieringJob:
+    """
+    Moves old attempts to cold storage every interval, starting when it is started.
+    """
+
+    def __init__(self, interval=TIER_INTERVAL_HOURS * 3600):
+        self.interval = interval
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(tier_attempts)
+                if result.attempts:
+                    logger.info(
+                        f"Moved {result.attempts} attempt(s) on {result.postings} posting(s) to cold storage "
+                        f"in {result.seconds:.1f}s, freeing {result.pages_freed} page(s)"
+                    )
+            except Exception as e:
+                logger.error(f"Moving attempts to cold storage failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cold", default=database.cold_database_name(), help="Cold database file (default: COLD_DATABASE)")
+    parser.add_argument("--days", type=float, default=retention_days(),
+                        help="Move attempts on postings that ended more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=TIER_BATCH_SIZE, help="Attempts copied to the cold file per transaction")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="First convert the database so moved attempts shrink the file; rewrites the "
+                             "whole file, so run it while the bot is stopped")
+    parser.add_argument("--db", default=database.DATABASE_NAME, help="Database file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.cold:
+        parser.error("give --cold or set COLD_DATABASE")
+    database.DATABASE_NAME = args.db
+    database.init_db()
+
+    if args.enable_incremental_vacuum:
+        started = time.perf_counter()
+        enable_incremental_vacuum()
+        print(f"Converted the database for incremental vacuum in {time.perf_counter() - started:.1f}s")
+
+    result = tier_attempts(int(time.time() - args.days * 86400), args.batch_size, args.cold)
+    print(f"Moved {result.attempts} attempt(s) on {result.postings} posting(s) to {args.cold} "
+          f"in {result.seconds:.1f}s, freed {result.pages_freed} page(s)")
+
+
+if __name__ == "__main__":
+    main()
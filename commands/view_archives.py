@@ -2,6 +2,8 @@ import discord
 from discord import Interaction, Embed, ui, SelectOption
 from commands.view_questions import ViewQuestionsPaginator
 from utils.database import get_database_connection
+from utils.pagination import paginate_texts
+from utils.question_cache import invalidate_question
 from datetime import datetime
 
 
@@ -46,66 +48,7 @@ def create_paginated_embeds(questions, title, max_chars=4000):
     """
     Create paginated embeds for archived questions, ensuring no embed exceeds the character limit.
     """
-    embeds = []
-    current_embed = None
-    character_count = 0
-    total_pages = 1  # Will be updated as we create embeds
-
-    def create_new_embed(page_num):
-        new_embed = Embed(
-            title=f"{title} (Page {page_num})",
-            color=discord.Color.blue()
-        )
-        new_embed.set_footer(text=f"Page {page_num}/{total_pages}")
-        new_embed.description = ""
-        return new_embed
-
-    for question in questions:
-        question_text, text_length = format_archived_question(question)
-
-        # If this single question is longer than max_chars, split it into multiple embeds
-        if text_length > max_chars:
-            if current_embed and current_embed.description:
-                embeds.append(current_embed)
-
-            # Split the long question into chunks
-            remaining_text = question_text
-            while remaining_text:
-                split_point = remaining_text[:max_chars].rfind('\n')
-                if split_point == -1:  # If no newline found, force split at max_chars
-                    split_point = max_chars
-
-                chunk = remaining_text[:split_point]
-                remaining_text = remaining_text[split_point:].lstrip()
-
-                new_embed = create_new_embed(len(embeds) + 1)
-                total_pages = max(total_pages, len(embeds) + 1)
-                new_embed.description = chunk
-                embeds.append(new_embed)
-
-            current_embed = None
-            character_count = 0
-            continue
-
-        if current_embed is None or character_count + text_length > max_chars:
-            if current_embed:
-                embeds.append(current_embed)
-            total_pages = max(total_pages, len(embeds) + 1)
-            current_embed = create_new_embed(len(embeds) + 1)
-            character_count = 0
-
-        current_embed.description += question_text
-        character_count += text_length
-
-    if current_embed and current_embed.description:
-        embeds.append(current_embed)
-
-    # Update all footers with the correct total page count
-    for i, embed in enumerate(embeds, 1):
-        embed.title = f"{title} (Page {i}/{total_pages})"
-        embed.set_footer(text=f"Page {i} of {total_pages}")
-
-    return embeds
+    return paginate_texts((format_archived_question(question)[0] for question in questions), title, max_chars)
 
 
 class ArchiveActionSelector(ui.View):
@@ -190,9 +133,15 @@ class DeleteButton(ui.Button):
                     c.execute("BEGIN TRANSACTION")
                     deleted_ids = []
                     for qid in dropdown.values:
-                        c.execute("DELETE FROM question_archives WHERE id = ?", (int(qid),))
-                        deleted_ids.append(qid)
+                        c.execute(
+                            "DELETE FROM question_archives WHERE id = ? AND guild_id = ?",
+                            (int(qid), confirm_interaction.guild_id)
+                        )
+                        if c.rowcount:
+                            deleted_ids.append(qid)
                     c.execute("COMMIT")
+                    for qid in deleted_ids:
+                        invalidate_question(qid)
 
                     # Create result embed
                     result_embed = Embed(
@@ -270,9 +219,9 @@ class RecoverButton(ui.Button):
                 # Retrieve the archived question
                 c.execute("""
                         SELECT id, type, question, correct_answer, option_a, option_b, option_c, option_d, 
-                               explanation, difficulty, domain, skill, image_url
-                        FROM question_archives WHERE id = ?
-                    """, (int(qid),))
+                               explanation, difficulty, domain, skill, image_url, content_hash, guild_id
+                        FROM question_archives WHERE id = ? AND guild_id = ?
+                    """, (int(qid), interaction.guild_id))
                 question_data = c.fetchone()
 
                 if question_data:
@@ -283,8 +232,8 @@ class RecoverButton(ui.Button):
                     c.execute("""
                             INSERT OR REPLACE INTO questions (
                                 id, type, question, correct_answer, option_a, option_b, option_c, option_d, 
-                                explanation, difficulty, domain, skill, image_url
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                explanation, difficulty, domain, skill, image_url, content_hash, guild_id
+                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                         """, (orig_id, *data))
 
                     # Remove from archives
@@ -292,6 +241,8 @@ class RecoverButton(ui.Button):
                     recovered_ids.append(str(orig_id))
 
             c.execute("COMMIT")
+            for qid in recovered_ids:
+                invalidate_question(qid)
 
             # Create result embed
             result_embed = Embed(
@@ -319,7 +270,7 @@ class RecoverButton(ui.Button):
 
 async def handle_view_archives_command(interaction: Interaction):
     """
-    Command to view all archived questions with options to recover or delete.
+    Command to view the guild's archived questions with options to recover or delete.
     """
     conn = get_database_connection()
     c = conn.cursor()
@@ -328,8 +279,9 @@ async def handle_view_archives_command(interaction: Interaction):
         SELECT id, type, question, correct_answer, option_a, option_b, option_c, option_d, 
                difficulty, domain, skill, archived_at
         FROM question_archives
+        WHERE guild_id = ?
         ORDER BY archived_at DESC
-    """)
+    """, (interaction.guild_id,))
     questions = c.fetchall()
     conn.close()
 
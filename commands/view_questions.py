@@ -1,6 +1,9 @@
 import discord
 from discord import Interaction, Embed, ui
-from utils.database import get_database_connection, archive_question
+from utils.database import get_database_connection
+from utils.pagination import paginate_texts
+from utils.question_cache import invalidate_question
+from utils.writer import WriteError, submit_write
 
 
 class ViewQuestionsPaginator(ui.View):
@@ -99,7 +102,12 @@ class ArchiveButton(ui.Button):
         success_ids = []
         fail_ids = []
         for question_id in dropdown.values:
-            if archive_question(int(question_id)):
+            try:
+                archived = await submit_write("archive_question", int(question_id), interaction.guild_id)
+            except WriteError:
+                archived = False
+            if archived:
+                invalidate_question(int(question_id))
                 success_ids.append(question_id)
             else:
                 fail_ids.append(question_id)
@@ -186,85 +194,17 @@ def format_question(question) -> tuple[str, int]:
 def create_paginated_embeds(questions, title, max_chars=4000):
     """
     Create paginated embeds for a specific question type, ensuring no embed exceeds
-    the character limit. Using 2000 as a conservative limit (about half of Discord's
-    actual limit) to account for any potential formatting or hidden characters.
+    the character limit. Pages are laid out up front and each embed is only built when
+    its page is shown.
     """
-    embeds = []
-    current_embed = None
-    character_count = 0
-    total_pages = 1  # Will be updated as we create embeds
-
-    def create_new_embed(page_num):
-        new_embed = Embed(
-            title=f"{title} (Page {page_num})",
-            color=discord.Color.blue()
-        )
-        new_embed.set_footer(text=f"Page {page_num}/{total_pages}")
-        new_embed.description = ""
-        return new_embed
-
-    for question in questions:
-        question_text, text_length = format_question(question)
-
-        # If this single question is longer than max_chars, split it into multiple embeds
-        if text_length > max_chars:
-            # If current embed has content, add it to embeds
-            if current_embed and current_embed.description:
-                embeds.append(current_embed)
-
-            # Split the long question into chunks
-            chunks = []
-            remaining_text = question_text
-            while remaining_text:
-                # Find the last newline before max_chars
-                split_point = remaining_text[:max_chars].rfind('\n')
-                if split_point == -1:  # If no newline found, force split at max_chars
-                    split_point = max_chars
-
-                chunks.append(remaining_text[:split_point])
-                remaining_text = remaining_text[split_point:].lstrip()
-
-            # Update total pages count
-            total_pages = max(total_pages, len(embeds) + len(chunks))
-
-            # Create new embeds for each chunk
-            for chunk in chunks:
-                new_embed = create_new_embed(len(embeds) + 1)
-                new_embed.description = chunk
-                embeds.append(new_embed)
-
-            # Start fresh embed for next question
-            current_embed = create_new_embed(len(embeds) + 1)
-            character_count = 0
-            continue
-
-        # If this is the first question or adding this question would exceed the limit
-        if current_embed is None or character_count + text_length > max_chars:
-            if current_embed:
-                embeds.append(current_embed)
-            total_pages = max(total_pages, len(embeds) + 1)
-            current_embed = create_new_embed(len(embeds) + 1)
-            character_count = 0
-
-        current_embed.description += question_text
-        character_count += text_length
-
-    # Add the final embed if not empty
-    if current_embed and current_embed.description:
-        embeds.append(current_embed)
-
-    # Update all footers with the correct total page count
-    for i, embed in enumerate(embeds, 1):
-        embed.title = f"{title} (Page {i}/{total_pages})"
-        embed.set_footer(text=f"Page {i} of {total_pages}")
-
-    return embeds
+    return paginate_texts((format_question(question)[0] for question in questions), title, max_chars)
 
 
 async def handle_view_questions_command(interaction: Interaction):
     """
-    Command to view all questions split by type (e.g., Math, EBRW).
-    Each type has its own paginated embed.
+    Command to view the guild's own questions split by type (e.g., Math, EBRW).
+    Each type has its own paginated embed. Shared bank questions can't be archived from a guild,
+    so they aren't listed.
     """
     conn = get_database_connection()
     c = conn.cursor()
@@ -274,7 +214,9 @@ async def handle_view_questions_command(interaction: Interaction):
         SELECT id, type, question, correct_answer, option_a, option_b, option_c, option_d, 
                difficulty, domain, skill
         FROM questions
-        """
+        WHERE guild_id = ?
+        """,
+        (interaction.guild_id,)
     )
     questions = c.fetchall()
     conn.close()
@@ -0,0 +1,99 @@
+"""
+Run a sharded deployment on one machine: one writer process plus bot processes that split the
+shards between them and forward their writes to the writer over a Unix socket.
+
+    python run_sharded.py --shards 4 --processes 2
+
+Stops everything on Ctrl+C or SIGTERM, bot processes first so the writer can apply the
+writes they already sent.
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+WRITER_START_TIMEOUT = 60  # Seconds; the writer migrates the schema before it listens
+
+
+def shard_groups(shards, processes):
+    """
+    Split shard IDs 0..shards-1 into one contiguous group per process.
+    """
+    processes = min(processes, shards)
+    size, extra = divmod(shards, processes)
+    groups, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def wait_for_socket(writer, path, timeout=WRITER_START_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if writer.poll() is not None:
+            raise SystemExit(f"The writer exited with code {writer.returncode}")
+        if time.monotonic() > deadline:
+            writer.terminate()
+            raise SystemExit(f"The writer did not start listening on {path}")
+        time.sleep(0.1)
+
+
+def stop(processes):
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, required=True, help="Total shard count")
+    parser.add_argument("--processes", type=int, default=1, help="Bot processes to split the shards over")
+    parser.add_argument("--socket", default=os.path.abspath("crackd-writer.sock"), help="Writer socket path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    # Children get their own session so Ctrl+C reaches only this process, which stops them in order
+    writer = subprocess.Popen([sys.executable, "-m", "utils.writer", "--socket", args.socket], start_new_session=True)
+    wait_for_socket(writer, args.socket)
+
+    bots = []
+    for shard_ids in shard_groups(args.shards, args.processes):
+        env = dict(os.environ, SHARD_COUNT=str(args.shards), SHARD_IDS=",".join(map(str, shard_ids)),
+                   WRITER_SOCKET=args.socket)
+        bots.append(subprocess.Popen([sys.executable, "bot.py"], env=env, start_new_session=True))
+        logger.info(f"Started shards {shard_ids} (pid {bots[-1].pid})")
+
+    # Turn SIGTERM into the same clean shutdown as Ctrl+C
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        while all(process.poll() is None for process in bots + [writer]):
+            time.sleep(1)
+        logger.error("A process exited, stopping the deployment")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop(bots)
+        stop([writer])
+
+
+if __name__ == "__main__":
+    main()
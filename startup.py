@@ -0,0 +1,165 @@
+"""
+Startup warm-up and the startup timing breakdown.
+
+Right after a deploy the rendered-question cache is empty and none of the database pages the
+first /dailyproblem, /leaderboard or answer click reads are in memory. While the gateway
+connects, warm_up runs these phases concurrently, each in its own thread with its own
+connection:
+
+    questions         the questions index every random pick reads, and the questions the
+                      daily schedules will post next
+    leaderboard       every guild's leaderboard rankings
+    active questions  the questions and answer counts of the postings still open, including
+                      the ones paused by the last shutdown
+
+StartupTimer records how long each part of startup took and logs it as one line once the bot
+is ready, e.g.
+
+    Ready 4.12s after start: imports 0.71s, db init 0.04s, warm-up 0.35s (questions 0.02s,
+    leaderboard 0.31s, active questions 0.03s), gateway 2.90s, tree sync 0.45s
+
+The warm-up overlaps the gateway, so the parts add up to more than the total.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from commands.daily_problem import answer_distribution
+from commands.leaderboard import leaderboard_rows
+from utils.database import get_database_connection
+from utils.question_cache import QUESTION_CACHE_SIZE, QUESTION_COLUMNS, cache_question
+
+logger = logging.getLogger(__name__)
+
+
+def warm_questions(conn):
+    # Covered by idx_questions_guild, so this reads the whole index and nothing else
+    conn.execute("SELECT guild_id, type, COUNT(*) FROM questions GROUP BY guild_id, type").fetchall()
+    return conn.execute(f"""
+        SELECT {QUESTION_COLUMNS}
+        FROM questions
+        WHERE id IN (SELECT next_question_id FROM daily_schedules)
+        LIMIT ?
+    """, (QUESTION_CACHE_SIZE,)).fetchall()
+
+
+def warm_leaderboards(conn):
+    for (guild_id,) in conn.execute("SELECT DISTINCT guild_id FROM user_stats").fetchall():
+        leaderboard_rows(conn, guild_id)
+    return []
+
+
+def warm_active_questions(conn):
+    postings = conn.execute("""
+        SELECT id, question_id FROM postings WHERE ends_at > ?
+        UNION
+        SELECT id, question_id FROM postings WHERE id IN (SELECT posting_id FROM paused_timers)
+    """, (int(time.time()),)).fetchall()
+    for posting_id, _ in postings:
+        answer_distribution(conn, posting_id)
+    question_ids = list({question_id for _, question_id in postings})[:QUESTION_CACHE_SIZE]
+    return conn.execute(f"""
+        SELECT {QUESTION_COLUMNS}
+        FROM questions
+        WHERE id IN ({", ".join("?" for _ in question_ids)})
+    """, question_ids).fetchall()
+
+
+# Each phase reads what it needs and returns the questions rows to cache
+WARMUP_PHASES = {
+    "questions": warm_questions,
+    "leaderboard": warm_leaderboards,
+    "active questions": warm_active_questions,
+}
+
+
+def _run_phase(warm):
+    conn = get_database_connection()
+    try:
+        return warm(conn)
+    finally:
+        conn.close()
+
+
+async def warm_up():
+    """
+    Run the warm-up phases concurrently and return {phase: seconds}. A phase that fails is
+    logged and skipped; the bot works without it, only more slowly at first.
+    """
+    async def run(name, warm):
+        started = time.perf_counter()
+        try:
+            rows = await asyncio.to_thread(_run_phase, warm)
+        except sqlite3.Error as e:
+            logger.warning(f"Warm-up phase {name} failed: {e}")
+            rows = []
+        # Cached on the event loop, which owns the question cache
+        for row in rows:
+            cache_question(row)
+        return name, time.perf_counter() - started
+
+    return dict(await asyncio.gather(*(run(name, warm) for name, warm in WARMUP_PHASES.items())))
+
+
+class StartupTimer:
+    """
+    Times the parts of startup, from started (a time.perf_counter() value), and reports them once.
+    """
+
+    def __init__(self, started):
+        self.started = started
+        self.phases = {}  # {name: seconds, or (seconds, {sub-phase: seconds})}
+        self.reported = False
+        self._begun = {}
+        self._warm_up = None
+
+    def record(self, name, seconds):
+        self.phases[name] = seconds
+
+    def begin(self, name):
+        self._begun[name] = time.perf_counter()
+
+    def end(self, name):
+        # Ending a phase that isn't running does nothing, e.g. "gateway" on a reconnect
+        started = self._begun.pop(name, None)
+        if started is not None:
+            self.record(name, time.perf_counter() - started)
+
+    @contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def start_warm_up(self):
+        async def timed():
+            started = time.perf_counter()
+            breakdown = await warm_up()
+            self.record("warm-up", (time.perf_counter() - started, breakdown))
+
+        self._warm_up = asyncio.create_task(timed())
+
+    async def report(self):
+        """
+        Log the breakdown, after waiting for the warm-up to finish. Only the first call logs.
+        """
+        if self.reported:
+            return
+        self.reported = True
+        if self._warm_up is not None:
+            await self._warm_up
+        total = time.perf_counter() - self.started
+
+        parts = []
+        for name, seconds in self.phases.items():
+            if isinstance(seconds, tuple):
+                seconds, breakdown = seconds
+                details = ", ".join(f"{sub} {sub_seconds:.2f}s" for sub, sub_seconds in breakdown.items())
+                parts.append(f"{name} {seconds:.2f}s ({details})")
+            else:
+                parts.append(f"{name} {seconds:.2f}s")
+        logger.info(f"Ready {total:.2f}s after start: {', '.join(parts)}")
@@ -0,0 +1,76 @@
+"""
+Backups of the main database together with the cold attempt file.
+"""
+import os
+import sqlite3
+import time
+
+import pytest
+
+import utils.database as database
+from commands.tier_attempts import tier_attempts
+from utils.backup import cold_backup_path, list_backups, restore_backup, rotate_backups, take_backup
+
+GUILD_ID = 1234
+DAY = 86400
+
+
+@pytest.fixture
+def tiered_db(tmp_path, monkeypatch):
+    """
+    A database with two old postings whose attempts have been moved to the cold file, and one
+    recent posting whose attempts are still in daily_problem.
+    """
+    path = str(tmp_path / "sat_bot.db")
+    cold = str(tmp_path / "sat_bot_cold.db")
+    monkeypatch.setattr(database, "DATABASE_NAME", path)
+    monkeypatch.setenv("COLD_DATABASE", cold)
+    database.init_db()
+
+    now = int(time.time())
+    conn = sqlite3.connect(path)
+    with conn:
+        for posting_id, ends_at in ((1, now - 400 * DAY), (2, now - 300 * DAY), (3, now + DAY)):
+            conn.execute(
+                "INSERT INTO postings (id, question_id, posted_at, ends_at) VALUES (?, ?, ?, ?)",
+                (posting_id, posting_id, ends_at - DAY, ends_at),
+            )
+            conn.executemany("""
+                INSERT INTO daily_problem (posting_id, user_id, guild_id, question_id, selected_answer, is_correct, response_time)
+                VALUES (?, ?, ?, ?, 1, 1, ?)
+            """, [(posting_id, user_id, GUILD_ID, posting_id, ends_at - DAY) for user_id in range(5)])
+    conn.close()
+
+    assert tier_attempts(cutoff=now - 180 * DAY).attempts == 10
+    return path, cold
+
+
+def all_attempts(path, cold):
+    conn = sqlite3.connect(path)
+    try:
+        database.attach_cold_storage(conn, cold)
+        return sorted(conn.execute("SELECT posting_id, user_id FROM all_attempts").fetchall())
+    finally:
+        conn.close()
+
+
+def test_backup_includes_cold_file(tiered_db, tmp_path):
+    path, cold = tiered_db
+    before = all_attempts(path, cold)
+    assert len(before) == 15
+
+    backup = take_backup(str(tmp_path / "backups"), step_sleep=0)
+    assert os.path.exists(cold_backup_path(backup))
+    assert [p for _, p in list_backups(str(tmp_path / "backups"))] == [backup]
+
+    restored = str(tmp_path / "restored.db")
+    restored_cold = str(tmp_path / "restored_cold.db")
+    assert restore_backup(backup, restored, restored_cold) == [restored, restored_cold]
+    assert all_attempts(restored, restored_cold) == before
+
+
+def test_rotation_removes_cold_backups(tiered_db, tmp_path):
+    backup = take_backup(str(tmp_path / "backups"), step_sleep=0)
+
+    assert rotate_backups(str(tmp_path / "backups"), 0) == [backup]
+    assert os.listdir(tmp_path / "backups") == []
@@ -0,0 +1,46 @@
+"""
+Final stats of a posting whose question changed while it was open.
+"""
+import pytest
+
+import utils.database as database
+from commands.daily_problem import create_posting, final_stats_embed
+from utils.question_cache import invalidate_question
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME", str(tmp_path / "sat_bot.db"))
+    database.init_db()
+    conn = database.get_database_connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO questions (id, type, question, correct_answer, option_a, option_b, option_c, option_d,
+                                   difficulty, domain, skill, guild_id)
+            VALUES (1, 'math', 'What is 2 + 2?', 'B', '3', '4', '5', '6', 'easy', 'Algebra', 'Linear equations', 1)
+        """)
+        create_posting(conn, 1, 0)
+    yield conn
+    conn.close()
+
+
+def fields(embed):
+    return {field.name: field.value for field in embed.fields}
+
+
+def test_archived_question_keeps_its_details(conn):
+    with conn:
+        database.archive_question(conn, 1, 1)
+    invalidate_question(1)
+
+    assert fields(final_stats_embed(conn, 1, 1))["Skill"] == "Linear equations"
+
+
+def test_deleted_question_still_gets_stats(conn):
+    with conn:
+        conn.execute("DELETE FROM questions WHERE id = 1")
+    invalidate_question(1)
+
+    embed = final_stats_embed(conn, 1, 1)
+    assert embed.title == "Final Question Statistics"
+    assert "Skill" not in fields(embed)
@@ -0,0 +1,166 @@
+"""
+ImageValidator against a stand-in image host on localhost.
+"""
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+
+from utils.images import ImageValidator
+
+
+def image_host():
+    """
+    Return an aiohttp app and the Counter of (method, path) requests it has served.
+    """
+    requests = Counter()
+
+    async def handle(request):
+        requests[request.method, request.path] += 1
+        if request.path == "/slow.png":
+            await asyncio.sleep(2)
+        elif request.path == "/coalesced.png":
+            await asyncio.sleep(0.2)
+        elif request.path == "/no-head.png" and request.method == "HEAD":
+            return web.Response(status=405)
+        elif request.path == "/no-head.png":
+            assert request.headers["Range"] == "bytes=0-0"
+            return web.Response(status=206, body=b"\x89", content_type="image/png")
+        elif request.path == "/page.html":
+            return web.Response(text="<html></html>", content_type="text/html")
+        elif request.path == "/missing.png":
+            return web.Response(status=404)
+        elif request.path == "/moved.png":
+            raise web.HTTPFound("/image.png")
+        return web.Response(body=b"\x89PNG", content_type="image/png")
+
+    app = web.Application()
+    app.router.add_route("*", "/{name}", handle)
+    return app, requests
+
+
+def run(scenario, **validator_options):
+    """
+    Run scenario(validator, url_for, requests) with a validator and a host on a free port.
+    """
+    async def main():
+        app, requests = image_host()
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = runner.addresses[0][:2]
+        validator = ImageValidator(**validator_options)
+        try:
+            return await scenario(validator, lambda path: f"http://{host}:{port}{path}", requests)
+        finally:
+            await validator.close()
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def test_image_is_ok():
+    async def scenario(validator, url_for, requests):
+        result = await validator.check(url_for("/image.png"))
+        assert result.ok and result.content_type == "image/png"
+
+    run(scenario)
+
+
+def test_redirects_are_followed():
+    async def scenario(validator, url_for, requests):
+        assert (await validator.check(url_for("/moved.png"))).ok
+        assert requests["HEAD", "/image.png"] == 1
+
+    run(scenario)
+
+
+def test_errors_and_non_images_are_reported():
+    async def scenario(validator, url_for, requests):
+        missing = await validator.check(url_for("/missing.png"))
+        page = await validator.check(url_for("/page.html"))
+        assert not missing.ok and "HTTP 404" in missing.reason
+        assert not page.ok and "not an image" in page.reason
+
+    run(scenario)
+
+
+def test_results_are_cached_until_they_expire():
+    now = [0.0]
+
+    async def scenario(validator, url_for, requests):
+        url = url_for("/image.png")
+        await validator.check(url)
+        await validator.check(url)
+        assert requests["HEAD", "/image.png"] == 1
+
+        now[0] += 61
+        await validator.check(url)
+        assert requests["HEAD", "/image.png"] == 2
+
+    run(scenario, valid_ttl=60, clock=lambda: now[0])
+
+
+def test_failures_expire_sooner():
+    now = [0.0]
+
+    async def scenario(validator, url_for, requests):
+        url = url_for("/missing.png")
+        await validator.check(url)
+        now[0] += 11
+        await validator.check(url)
+        assert requests["HEAD", "/missing.png"] == 2
+
+    run(scenario, valid_ttl=60, invalid_ttl=10, clock=lambda: now[0])
+
+
+def test_concurrent_checks_share_one_request():
+    async def scenario(validator, url_for, requests):
+        url = url_for("/coalesced.png")
+        results = await asyncio.gather(*(validator.check(url) for _ in range(10)))
+        assert all(result.ok for result in results)
+        assert requests["HEAD", "/coalesced.png"] == 1
+
+    run(scenario)
+
+
+def test_cancelled_caller_does_not_cancel_shared_check():
+    async def scenario(validator, url_for, requests):
+        url = url_for("/coalesced.png")
+        first = asyncio.create_task(validator.check(url))
+        second = asyncio.create_task(validator.check(url))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        assert (await second).ok
+        assert requests["HEAD", "/coalesced.png"] == 1
+
+    run(scenario)
+
+
+def test_falls_back_to_ranged_get_when_head_is_refused():
+    async def scenario(validator, url_for, requests):
+        result = await validator.check(url_for("/no-head.png"))
+        assert result.ok
+        assert requests["HEAD", "/no-head.png"] == 1 and requests["GET", "/no-head.png"] == 1
+
+    run(scenario)
+
+
+def test_slow_host_times_out():
+    async def scenario(validator, url_for, requests):
+        result = await validator.check(url_for("/slow.png"))
+        assert not result.ok and "too long" in result.reason
+
+    run(scenario, timeout=0.5)
+
+
+def test_check_many_checks_each_url_once():
+    async def scenario(validator, url_for, requests):
+        urls = [url_for("/image.png"), url_for("/missing.png"), url_for("/image.png")]
+        results = await validator.check_many(urls)
+        assert set(results) == set(urls)
+        assert results[url_for("/image.png")].ok and not results[url_for("/missing.png")].ok
+        assert requests["HEAD", "/image.png"] == 1
+
+    run(scenario, concurrency=2)
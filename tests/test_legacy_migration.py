@@ -0,0 +1,100 @@
+"""
+Upgrading a database from before guilds were added.
+"""
+import sqlite3
+
+import pytest
+
+import utils.database as database
+
+BASELINE_SCHEMA = """
+    CREATE TABLE questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,
+        question TEXT NOT NULL,
+        correct_answer TEXT NOT NULL,
+        option_a TEXT NOT NULL,
+        option_b TEXT NOT NULL,
+        option_c TEXT NOT NULL,
+        option_d TEXT NOT NULL,
+        explanation TEXT,
+        difficulty TEXT CHECK(difficulty IN ('easy', 'medium', 'hard')),
+        domain TEXT,
+        skill TEXT,
+        image_url TEXT
+    );
+    CREATE TABLE user_stats (
+        user_id INTEGER NOT NULL,
+        total_correct INTEGER NOT NULL DEFAULT 0,
+        total_attempts INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id)
+    );
+    CREATE TABLE daily_problem (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        correct_answer TEXT NOT NULL,
+        selected_answer TEXT NOT NULL,
+        is_correct BOOLEAN NOT NULL,
+        response_time TIMESTAMP NOT NULL,
+        FOREIGN KEY (question_id) REFERENCES questions(id),
+        UNIQUE(user_id, question_id)
+    );
+    INSERT INTO questions (type, question, correct_answer, option_a, option_b, option_c, option_d,
+                           explanation, difficulty, domain, skill)
+    VALUES ('math', 'What is 2 + 2?', 'B', '3', '4', '5', '6', 'Add them.', 'easy', 'Algebra', 'Linear equations');
+    INSERT INTO user_stats VALUES (42, 1, 1);
+    INSERT INTO daily_problem (user_id, question_id, correct_answer, selected_answer, is_correct, response_time)
+    VALUES (42, 1, 'B', 'B', 1, '2024-01-01 12:00:00');
+"""
+
+
+def dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return list(conn.iterdump())
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "sat_bot.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    monkeypatch.setattr(database, "DATABASE_NAME", path)
+    return path
+
+
+def test_refuses_to_migrate_without_legacy_guild(baseline_db, monkeypatch):
+    monkeypatch.delenv("LEGACY_GUILD_ID", raising=False)
+    before = dump(baseline_db)
+
+    with pytest.raises(database.MigrationError, match="LEGACY_GUILD_ID"):
+        database.init_db()
+
+    assert dump(baseline_db) == before
+
+
+def test_migrates_into_legacy_guild(baseline_db, monkeypatch):
+    monkeypatch.setenv("LEGACY_GUILD_ID", "1234")
+
+    database.init_db()
+
+    conn = sqlite3.connect(baseline_db)
+    try:
+        assert conn.execute("SELECT guild_id FROM questions").fetchall() == [(1234,)]
+        assert conn.execute("SELECT guild_id, user_id, total_correct FROM user_stats").fetchall() == [(1234, 42, 1)]
+        assert conn.execute("SELECT guild_id, user_id FROM daily_problem").fetchall() == [(1234, 42)]
+    finally:
+        conn.close()
+
+
+def test_new_database_needs_no_legacy_guild(tmp_path, monkeypatch):
+    monkeypatch.delenv("LEGACY_GUILD_ID", raising=False)
+    monkeypatch.setattr(database, "DATABASE_NAME", str(tmp_path / "sat_bot.db"))
+
+    database.init_db()
+    # A second start sees partitioned tables only
+    database.init_db()
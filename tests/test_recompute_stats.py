@@ -0,0 +1,68 @@
+"""
+Rebuilding the stats counters while answers keep being committed.
+"""
+import sqlite3
+import time
+
+import pytest
+
+import commands.recompute_stats as recompute_stats
+import utils.database as database
+from utils.writer import record_answer
+
+GUILD_ID = 1234
+QUESTION = ("math", "Algebra", "Linear equations")
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE_NAME", str(tmp_path / "sat_bot.db"))
+    database.init_db()
+    conn = database.get_database_connection()
+    with conn:
+        conn.execute("""
+            INSERT INTO questions (id, type, question, correct_answer, option_a, option_b, option_c, option_d,
+                                   domain, skill, guild_id)
+            VALUES (1, ?, 'What is 2 + 2?', 'B', '3', '4', '5', '6', ?, ?, ?)
+        """, (*QUESTION, GUILD_ID))
+        for posting_id in (1, 2):
+            conn.execute("INSERT INTO postings (id, question_id, posted_at, ends_at) VALUES (?, 1, 0, 0)", (posting_id,))
+    yield conn
+    conn.close()
+
+
+def answer(conn, posting_id, user_id, response_time):
+    with conn:
+        record_answer(conn, GUILD_ID, posting_id, 1, user_id, 1, True, response_time, *QUESTION)
+
+
+def user_stats(conn, user_id):
+    return conn.execute(
+        "SELECT total_correct, total_attempts FROM user_stats WHERE guild_id = ? AND user_id = ?", (GUILD_ID, user_id)
+    ).fetchone()
+
+
+def test_full_rebuild_counts_answer_committed_after_log_pass(conn, monkeypatch):
+    answer(conn, 1, 42, int(time.time()) - 86400)
+    accumulate_log = recompute_stats._accumulate_log
+
+    def late_commit(*args):
+        accumulate_log(*args)
+        # Clicked before the rebuild started, committed after the log pass read the user
+        answer(conn, 2, 42, int(time.time()) - 5)
+
+    monkeypatch.setattr(recompute_stats, "_accumulate_log", late_commit)
+    recompute_stats.recompute_stats(full=True)
+
+    assert user_stats(conn, 42) == (2, 2)
+
+
+def test_incremental_run_rereads_answers_stamped_before_mark(conn):
+    recompute_stats.recompute_stats(full=True)
+    # Committed after the last run, but stamped just before its mark
+    answer(conn, 1, 7, recompute_stats.get_high_water_mark(conn) - 5)
+    with conn:
+        conn.execute("UPDATE user_stats SET total_attempts = 99 WHERE user_id = 7")
+
+    assert recompute_stats.recompute_stats().users == 1
+    assert user_stats(conn, 7) == (1, 1)
@@ -0,0 +1,395 @@
+"""
+Online backups of the bot's database.
+
+A backup copies the live database with SQLite's backup API in steps of BACKUP_STEP_PAGES
+pages, in a worker thread that sleeps between steps, so the event loop keeps running and the
+disk is never saturated. The copy reads from one snapshot: the source connection holds a read
+transaction for the whole backup, which in WAL mode never blocks the writer (answers keep
+being recorded while it runs) and keeps the backup from restarting every time an answer is
+committed. The copy is checked with PRAGMA integrity_check, gzipped and written to
+BACKUP_DIR, keeping the newest BACKUP_KEEP backups.
+
+With COLD_DATABASE set, the cold attempt file (see commands/tier_attempts.py) is backed up in
+the same way, from a snapshot pinned by the same read transaction, into a companion file with
+the same time in its name; it is checked, rotated and restored with the main backup.
+
+The rest of the work is kept from crowding out answer recording too: backups run on a thread
+of their own at a lower CPU priority, files are flushed to disk a few MiB at a time rather than all at once, and
+large files are shrunk step by step before they are deleted, since a single fsync or unlink
+of a database-sized file stalls every other commit on the disk until it finishes.
+
+With BACKUP_DIR set, the bot takes a backup every BACKUP_INTERVAL_HOURS. The newest backup's
+time is read from its file name, so a restart doesn't reset the schedule, and a backup that
+fell due while the bot was down is taken right away. Backups can also be taken or checked by
+hand:
+
+    python -m utils.backup --dir backups
+    python -m utils.backup --check backups/sat_bot-20240101-000000.db.gz
+
+and restored, while the bot is stopped, with
+
+    python -m utils.backup --restore backups/sat_bot-20240101-000000.db.gz --db sat_bot.db
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import utils.database as database
+
+logger = logging.getLogger(__name__)
+
+BACKUP_STEP_PAGES = 256  # Pages copied per step, 1 MiB with the default page size
+BACKUP_STEP_SLEEP = 0.005  # Seconds between steps
+BACKUP_NICENESS = 10  # Added to the backup thread's niceness
+FLUSH_EVERY_STEPS = 4  # Steps between flushes of the copy to disk
+BACKUP_KEEP = 7
+BACKUP_INTERVAL_HOURS = 24
+BACKUP_PREFIX = "sat_bot-"
+BACKUP_SUFFIX = ".db.gz"
+COLD_BACKUP_SUFFIX = ".cold.db.gz"
+BACKUP_TIME_FORMAT = "%Y%m%d-%H%M%S"
+COPY_CHUNK_BYTES = 1024 * 1024
+TRUNCATE_STEP_BYTES = 16 * 1024 * 1024
+
+
+class BackupError(Exception):
+    """
+    A backup could not be taken or failed its integrity check.
+    """
+
+
+def backup_dir():
+    """
+    Return the backup directory, or None when scheduled backups are turned off.
+    """
+    return os.getenv("BACKUP_DIR") or None
+
+
+def backup_interval():
+    return float(os.getenv("BACKUP_INTERVAL_HOURS") or BACKUP_INTERVAL_HOURS) * 3600
+
+
+def backup_keep():
+    return int(os.getenv("BACKUP_KEEP") or BACKUP_KEEP)
+
+
+def list_backups(directory):
+    """
+    Return [(taken at, path)] for the backups in directory, oldest first.
+    """
+    backups = []
+    for name in os.listdir(directory):
+        if not (name.startswith(BACKUP_PREFIX) and name.endswith(BACKUP_SUFFIX)) or name.endswith(COLD_BACKUP_SUFFIX):
+            continue
+        try:
+            taken_at = datetime.strptime(name[len(BACKUP_PREFIX):-len(BACKUP_SUFFIX)], BACKUP_TIME_FORMAT)
+        except ValueError:
+            continue
+        backups.append((taken_at.replace(tzinfo=timezone.utc).timestamp(), os.path.join(directory, name)))
+    return sorted(backups)
+
+
+def cold_backup_path(path):
+    """
+    Return the path of the cold file's backup that goes with the backup at path.
+    """
+    return path[:-len(BACKUP_SUFFIX)] + COLD_BACKUP_SUFFIX
+
+
+def copy_database(path, step_pages=BACKUP_STEP_PAGES, step_sleep=BACKUP_STEP_SLEEP, cold=None):
+    """
+    Copy the live database to path, a page range at a time, from a single snapshot, and if
+    cold is a (cold file, copy path) pair, the cold file too. Returns the number of pages copied.
+    """
+    source = sqlite3.connect(database.DATABASE_NAME, isolation_level=None)
+    try:
+        schemas = {"main": path}
+        if cold:
+            source.execute("ATTACH DATABASE ? AS cold", (cold[0],))
+            schemas["cold"] = cold[1]
+        # Pin a snapshot of every file at once; without it every commit made during the copy
+        # restarts it, and tiering could move attempts between the two copies
+        source.execute("BEGIN")
+        for schema in schemas:
+            source.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master").fetchone()
+        pages = sum(_copy_schema(source, schema, target, step_pages, step_sleep) for schema, target in schemas.items())
+        source.execute("COMMIT")
+        return pages
+    finally:
+        source.close()
+
+
+def _copy_schema(source, schema, path, step_pages, step_sleep):
+    # Flushing the whole copy at once would stall the writer's fsyncs for as long as that takes,
+    # so the copy is written without syncs and flushed every few steps instead
+    flush_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    target = sqlite3.connect(path)
+    try:
+        target.execute("PRAGMA synchronous = OFF")
+        steps = []
+
+        def pause(status, remaining, total):
+            # backup() only sleeps on its own when a step hits a lock, so pace the steps here
+            steps.append(total)
+            if len(steps) % FLUSH_EVERY_STEPS == 0:
+                os.fsync(flush_fd)
+            if remaining:
+                time.sleep(step_sleep)
+
+        source.backup(target, pages=step_pages, progress=pause, name=schema)
+        # The copy inherits WAL mode; a backup should be a single self-contained file
+        target.execute("PRAGMA journal_mode = DELETE")
+        os.fsync(flush_fd)
+        return steps[-1] if steps else 0
+    finally:
+        target.close()
+        os.close(flush_fd)
+
+
+def check_database(path, name=None):
+    """
+    Raise BackupError unless the database file at path passes PRAGMA integrity_check. name is
+    what the error calls the file.
+    """
+    name = name or path
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"{name} is not a readable database: {e}")
+    finally:
+        conn.close()
+    if problems != ["ok"]:
+        raise BackupError(f"{name} failed its integrity check: {'; '.join(problems[:5])}")
+
+
+def decompress(path, target):
+    """
+    Gunzip the backup at path into target and run its integrity check.
+    """
+    try:
+        with gzip.open(path, "rb") as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+    except (gzip.BadGzipFile, EOFError) as e:
+        raise BackupError(f"{path} is not a complete gzip file: {e}")
+    check_database(target, path)
+
+
+def check_backup(path):
+    """
+    Decompress a backup, and its cold file's backup if it has one, to a temporary file and run
+    the integrity checks.
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp:
+        copy = os.path.join(tmp, "check.db")
+        for backup in (path, cold_backup_path(path)):
+            if backup == path or os.path.exists(backup):
+                decompress(backup, copy)
+                remove_gradually(copy)
+
+
+def restore_backup(path, db_path, cold_path=None):
+    """
+    Replace the database at db_path with the backup at path, and the cold file at cold_path
+    with the backup's cold file if it has one. Only run it while the bot is stopped. Returns the
+    files restored.
+    """
+    restores = [(path, db_path)]
+    if os.path.exists(cold_backup_path(path)):
+        if not cold_path:
+            raise BackupError(f"{path} has a cold file backup; give the cold database to restore it to")
+        restores.append((cold_backup_path(path), cold_path))
+    # Every file is checked before any is replaced, so a bad backup leaves the database as it was
+    for backup, target in restores:
+        decompress(backup, f"{target}.restoring")
+    for backup, target in restores:
+        # A WAL left by the old file would be replayed into the restored one
+        for leftover in (f"{target}-wal", f"{target}-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        os.replace(f"{target}.restoring", target)
+    return [target for _, target in restores]
+
+
+def compress(path, gz_path):
+    """
+    Gzip path into gz_path, flushing the output as it goes, like copy_database.
+    """
+    with open(path, "rb") as src, open(gz_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as dst:
+            for i, chunk in enumerate(iter(lambda: src.read(COPY_CHUNK_BYTES), b"")):
+                dst.write(chunk)
+                if i % FLUSH_EVERY_STEPS == 0:
+                    raw.flush()
+                    os.fsync(raw.fileno())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def remove_gradually(path, step_bytes=TRUNCATE_STEP_BYTES):
+    """
+    Delete a large file by shrinking it a step at a time first. Freeing the whole file in one
+    unlink holds the file system journal long enough to stall the writer's commits.
+    """
+    size = os.path.getsize(path)
+    while size > 0:
+        size = max(size - step_bytes, 0)
+        os.truncate(path, size)
+        time.sleep(BACKUP_STEP_SLEEP)
+    os.remove(path)
+
+
+def rotate_backups(directory, keep):
+    """
+    Delete all but the newest keep backups in directory. Returns the deleted paths.
+    """
+    backups = list_backups(directory)
+    removed = [path for _, path in backups[:max(len(backups) - keep, 0)]]
+    for path in removed:
+        if os.path.exists(cold_backup_path(path)):
+            remove_gradually(cold_backup_path(path))
+        remove_gradually(path)
+    return removed
+
+
+def lower_priority():
+    """
+    Lower the calling thread's CPU priority for good, where the OS allows it per thread (Linux),
+    so the integrity check and compression never crowd out answer recording. Only call it on a
+    thread that does nothing but backups: raising a priority back can need privileges.
+    """
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKUP_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def take_backup(
+    directory, keep=BACKUP_KEEP, step_pages=BACKUP_STEP_PAGES, step_sleep=BACKUP_STEP_SLEEP, cold_path=None
+):
+    """
+    Back the database, and the cold file at cold_path (default COLD_DATABASE) if there is one,
+    up into directory as checked, gzipped files, then drop old backups. Returns the new
+    backup's path. Raises BackupError if a copy fails its integrity check.
+    """
+    os.makedirs(directory, exist_ok=True)
+    taken_at = datetime.now(timezone.utc)
+    path = os.path.join(directory, f"{BACKUP_PREFIX}{taken_at.strftime(BACKUP_TIME_FORMAT)}{BACKUP_SUFFIX}")
+
+    # Work files live next to the backups, so the final rename never crosses file systems
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        copies = {path: os.path.join(tmp, "copy.db")}
+        cold_path = database.cold_database_name() if cold_path is None else cold_path
+        cold = None
+        if cold_path and os.path.exists(cold_path):
+            copies[cold_backup_path(path)] = os.path.join(tmp, "cold.db")
+            cold = (cold_path, copies[cold_backup_path(path)])
+        started = time.perf_counter()
+        pages = copy_database(copies[path], step_pages, step_sleep, cold)
+        # The main file goes last, so a backup in the listing always has its cold file
+        for backup, copy in reversed(copies.items()):
+            check_database(copy)
+            partial = f"{copy}.gz"
+            compress(copy, partial)
+            os.replace(partial, backup)
+            remove_gradually(copy)
+
+    removed = rotate_backups(directory, keep)
+    logger.info(
+        f"Backed up {pages} page(s) to {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MiB) "
+        f"in {time.perf_counter() - started:.1f}s, removed {len(removed)} old backup(s)"
+    )
+    return path
+
+
+class BackupScheduler:
+    """
+    Takes a backup every interval, counting from the newest backup already in the directory.
+    """
+
+    def __init__(self, directory, interval=None, keep=None):
+        self.directory = directory
+        self.interval = backup_interval() if interval is None else interval
+        self.keep = backup_keep() if keep is None else keep
+        self._task = None
+        self._executor = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            # A thread of its own, so its lowered priority never reaches the shared to_thread
+            # workers that commit answers
+            self._executor = ThreadPoolExecutor(1, "backup", initializer=lower_priority)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._executor is not None:
+            # A backup already running finishes on its own thread
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def next_due(self):
+        os.makedirs(self.directory, exist_ok=True)
+        backups = list_backups(self.directory)
+        return backups[-1][0] + self.interval if backups else time.time()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(max(self.next_due() - time.time(), 0))
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    self._executor, take_backup, self.directory, self.keep
+                )
+            except (BackupError, sqlite3.Error, OSError) as e:
+                logger.error(f"Backup failed: {e}")
+                # Try again after a while instead of in a tight loop
+                await asyncio.sleep(min(self.interval, 3600))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=backup_dir(), help="Backup directory (default: BACKUP_DIR)")
+    parser.add_argument("--keep", type=int, default=backup_keep(), help="Backups to keep")
+    parser.add_argument("--check", metavar="BACKUP", help="Only check an existing backup")
+    parser.add_argument("--restore", metavar="BACKUP", help="Replace the database with a backup")
+    parser.add_argument("--db", default=database.DATABASE_NAME, help="Database file")
+    parser.add_argument("--cold", default=database.cold_database_name(), help="Cold database file (default: COLD_DATABASE)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        if args.check:
+            check_backup(args.check)
+            print(f"{args.check}: ok")
+            return
+        if args.restore:
+            for target in restore_backup(args.restore, args.db, args.cold):
+                print(f"Restored {target}")
+            return
+        if not args.dir:
+            parser.error("give --dir or set BACKUP_DIR")
+        database.DATABASE_NAME = args.db
+        lower_priority()
+        print(take_backup(args.dir, args.keep, cold_path=args.cold or ""))
+    except BackupError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,41 @@
 import sqlite3
 import os
 import logging
+import hashlib
+import unicodedata
+
+from utils.guilds import SHARED_BANK_ID, create_guild_settings_table, guild_placeholders, legacy_guild_id
+from utils.taxonomy import create_skills_table, skill_registry
 
 DATABASE_NAME = 'sat_bot.db'
 logger = logging.getLogger(__name__)
 
+CONTENT_HASH_BATCH_SIZE = 1000
+QUESTION_TABLES = ("questions", "question_archives")
+
+# Tables keyed by (user_id, skill_id) that used to be keyed by the skill's text, and their value columns
+SKILL_KEYED_TABLES = {
+    "user_skill_stats": ("total_correct", "total_attempts"),
+    "stat_adjustments": ("correct_delta", "attempts_delta"),
+}
+
+# Answers are stored in daily_problem as 0-3 for A-D
+ANSWER_CHOICES = "ABCD"
+
+# Tables whose key gained a leading guild_id, and their columns other than guild_id
+PARTITIONED_TABLES = {
+    "user_stats": ("user_id", "total_correct", "total_attempts"),
+    "user_skill_stats": ("user_id", "skill_id", "total_correct", "total_attempts"),
+    "stat_adjustments": ("user_id", "skill_id", "correct_delta", "attempts_delta"),
+    "daily_problem": ("question_id", "user_id", "selected_answer", "is_correct", "response_time"),
+}
+
+
+class MigrationError(Exception):
+    """
+    The database can't be upgraded without more configuration; nothing has been changed.
+    """
+
 
 def init_db():
     db_path = os.path.abspath(DATABASE_NAME)
@@ -14,6 +45,25 @@ def init_db():
         conn = sqlite3.connect(DATABASE_NAME)
         c = conn.cursor()
 
+        # Checked before anything is changed, as the renames below commit as they go
+        guild_id = legacy_guild_id()
+        unpartitioned = unpartitioned_tables_with_rows(c)
+        if unpartitioned and guild_id is None:
+            conn.close()
+            raise MigrationError(
+                f"{db_path} has rows from before guilds were added ({', '.join(unpartitioned)}). "
+                "Set LEGACY_GUILD_ID to the ID of the server they belong to, or to 0 to make the "
+                "questions the shared bank and keep the stats under guild 0, and start again."
+            )
+        if guild_id is None:
+            guild_id = SHARED_BANK_ID
+
+        # New files can hand pages freed by commands/tier_attempts.py back to the file system
+        # a few at a time; this only takes effect before the first table is created
+        c.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL lets every process read while the writer commits; the mode is stored in the file
+        c.execute("PRAGMA journal_mode = WAL")
+
         # Questions table - updated with separate option columns
         c.execute('''
             CREATE TABLE IF NOT EXISTS questions (
@@ -29,7 +79,9 @@ def init_db():
                 difficulty TEXT CHECK(difficulty IN ('easy', 'medium', 'hard')),
                 domain TEXT,
                 skill TEXT,
-                image_url TEXT
+                image_url TEXT,
+                content_hash TEXT,
+                guild_id INTEGER NOT NULL DEFAULT 0
             )
         ''')
 
@@ -49,50 +101,214 @@ def init_db():
                 domain TEXT,
                 skill TEXT,
                 image_url TEXT,
-                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                content_hash TEXT,
+                guild_id INTEGER NOT NULL DEFAULT 0
             )
         ''')
 
+        # Every guild's questions, stats and attempts are kept apart, see utils/guilds.py
+        create_guild_settings_table(c)
+        add_guild_columns(c, guild_id)
+
+        # Skills get small integer IDs, see utils/taxonomy.py
+        create_skills_table(c)
+        legacy_tables = rename_text_keyed_skill_tables(c)
+        legacy_attempts = rename_legacy_daily_problem(c)
+        unpartitioned_tables = rename_unpartitioned_tables(c)
+
         # User stats table
         c.execute('''
             CREATE TABLE IF NOT EXISTS user_stats (
+                guild_id INTEGER NOT NULL,
                 user_id INTEGER NOT NULL,
                 total_correct INTEGER NOT NULL DEFAULT 0,
                 total_attempts INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (user_id)
-            )
+                PRIMARY KEY (guild_id, user_id)
+            ) WITHOUT ROWID
         ''')
 
         # User skill-level stats table
         c.execute('''
             CREATE TABLE IF NOT EXISTS user_skill_stats (
+                guild_id INTEGER NOT NULL,
                 user_id INTEGER NOT NULL,
-                question_type TEXT NOT NULL,
-                domain TEXT NOT NULL,
-                skill TEXT NOT NULL,
+                skill_id INTEGER NOT NULL REFERENCES skills(id),
                 total_correct INTEGER NOT NULL DEFAULT 0,
                 total_attempts INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (user_id, question_type, domain, skill)
-            )
+                PRIMARY KEY (guild_id, user_id, skill_id)
+            ) WITHOUT ROWID
         ''')
 
-        # New table to better use daily problem command
+        # Attempts as they were keyed before postings. Older formats are converted into this
+        # shape first, then moved into postings by copy_unposted_daily_problem below; once
+        # daily_problem has postings this does nothing.
         c.execute('''
             CREATE TABLE IF NOT EXISTS daily_problem (
+                guild_id INTEGER NOT NULL,
+                question_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                selected_answer INTEGER NOT NULL,
+                is_correct INTEGER NOT NULL,
+                response_time INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, question_id, user_id)
+            ) WITHOUT ROWID
+        ''')
+
+        # Admin edits to skill stats, kept apart from the attempt log so stats can be rebuilt
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS stat_adjustments (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                skill_id INTEGER NOT NULL REFERENCES skills(id),
+                correct_delta INTEGER NOT NULL DEFAULT 0,
+                attempts_delta INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id, skill_id)
+            ) WITHOUT ROWID
+        ''')
+        copy_text_keyed_skill_tables(c, legacy_tables, guild_id)
+        copy_unpartitioned_tables(c, unpartitioned_tables, guild_id)
+
+        # Small key/value table for bookkeeping such as the stats high-water mark
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS stats_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        ''')
+        copy_legacy_daily_problem(c, legacy_attempts, guild_id)
+
+        # Local copies of question images, see utils/image_store.py
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS image_mirror (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                cdn_url TEXT,
+                cdn_expires_at INTEGER
+            )
+        ''')
+
+        # Automatic daily posts, see commands/schedule.py. next_question_id is the question
+        # picked ahead of next_run, kept so a restart posts the same one
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS daily_schedules (
+                guild_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                post_time TEXT NOT NULL,
+                question_type TEXT,
+                next_run INTEGER NOT NULL,
+                next_question_id INTEGER,
+                PRIMARY KEY (guild_id, channel_id)
+            ) WITHOUT ROWID
+        ''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_daily_schedules_next_run ON daily_schedules(next_run)")
+
+        # Every time a question is posted is a posting, with its own answers and final stats,
+        # so a question can be posted again without blocking the people who answered it before
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS postings (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question_id INTEGER NOT NULL,
+                posted_at INTEGER NOT NULL,
+                ends_at INTEGER NOT NULL
+            )
+        ''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_postings_ends_at ON postings(ends_at)")
+
+        # The messages showing each posting, see ActiveQuestion in commands/daily_problem.py
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS posting_messages (
+                posting_id INTEGER NOT NULL REFERENCES postings(id),
+                guild_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                PRIMARY KEY (posting_id, guild_id, channel_id)
+            ) WITHOUT ROWID
+        ''')
+        # Replaced by postings and posting_messages
+        c.execute("DROP TABLE IF EXISTS active_questions")
+        # The messages whose countdown was still running when the bot shut down, to be
+        # resumed when it starts again
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS paused_timers (
+                posting_id INTEGER NOT NULL REFERENCES postings(id),
+                guild_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                PRIMARY KEY (posting_id, guild_id, channel_id)
+            ) WITHOUT ROWID
+        ''')
+
+        # One row per answer, kept small because it grows with every click: the answer as
+        # an ANSWER_CHOICES index and the time in epoch seconds. The correct answer lives in
+        # the questions table. The primary key rejects a second answer to a posting, and
+        # keeps each posting's answers together so its counts read one short range.
+        unposted_attempts = rename_unposted_daily_problem(c)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS daily_problem (
+                posting_id INTEGER NOT NULL,
                 user_id INTEGER NOT NULL,
+                guild_id INTEGER NOT NULL,
                 question_id INTEGER NOT NULL,
-                correct_answer TEXT NOT NULL,
-                selected_answer TEXT NOT NULL,
-                is_correct BOOLEAN NOT NULL,
-                response_time TIMESTAMP NOT NULL,
-                FOREIGN KEY (question_id) REFERENCES questions(id),
-                UNIQUE(user_id, question_id)
+                selected_answer INTEGER NOT NULL,
+                is_correct INTEGER NOT NULL,
+                response_time INTEGER NOT NULL,
+                PRIMARY KEY (posting_id, user_id, guild_id)
+            ) WITHOUT ROWID
+        ''')
+        copy_unposted_daily_problem(c, unposted_attempts)
+        # Covers the per-user reads of a stats recompute, including "answered since" checks
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_daily_problem_user
+            ON daily_problem(guild_id, user_id, response_time, is_correct, question_id)
+        """)
+
+        # Per-skill totals of the attempts moved to cold storage by commands/tier_attempts.py,
+        # so a stats recompute counts them without opening the cold file; skill_id -1 holds
+        # attempts on questions that were deleted
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS attempt_rollups (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                skill_id INTEGER NOT NULL,
+                total_correct INTEGER NOT NULL,
+                total_attempts INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id, skill_id)
+            ) WITHOUT ROWID
+        ''')
+
+        # Content hashes let duplicate questions be found with one index lookup
+        add_content_hash_columns(c)
+
+        # Every change to what a question renders as, in order, so a cache snapshot can tell
+        # which of its questions changed since it was taken (see utils/snapshot.py)
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS question_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                question_id INTEGER NOT NULL
             )
         ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_inserted AFTER INSERT ON questions
+            BEGIN INSERT INTO question_changes (question_id) VALUES (NEW.id); END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_updated AFTER UPDATE OF
+            id, question, correct_answer, option_a, option_b, option_c, option_d,
+            explanation, difficulty, domain, skill, image_url, type ON questions
+            BEGIN INSERT INTO question_changes (question_id) SELECT OLD.id UNION SELECT NEW.id; END
+        ''')
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS questions_deleted AFTER DELETE ON questions
+            BEGIN INSERT INTO question_changes (question_id) VALUES (OLD.id); END
+        ''')
+        # Tells snapshots taken of a different database apart
+        c.execute("INSERT OR IGNORE INTO stats_state (key, value) VALUES ('database_id', abs(random()))")
 
         conn.commit()
+        backfill_content_hashes(conn)
         conn.close()
+        skill_registry.clear()
         logger.info("Database and tables created successfully.")
     except sqlite3.Error as e:
         logger.error(f"Database error: {e}")
@@ -102,48 +318,387 @@ def get_database_connection():
     return sqlite3.connect(DATABASE_NAME)
 
 
-def archive_question(question_id):
+def checkpoint_wal(path=None):
     """
-    Move a question from the questions table to the question_archives table,
-    preserving the original question ID and handling multiple archive attempts
+    Copy the whole WAL into the database file (or the file at path, such as the cold file) and
+    empty it, so the file is complete on its own and the next start has no WAL to recover.
+    Returns (busy, WAL pages, pages checkpointed); busy is 1 if a reader kept the WAL from
+    being emptied.
     """
+    conn = sqlite3.connect(path) if path else get_database_connection()
     try:
-        conn = get_database_connection()
-        c = conn.cursor()
+        return conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
 
-        # Check if the question is already in archives
-        c.execute("SELECT id FROM question_archives WHERE id = ?", (question_id,))
-        if c.fetchone():
-            # Question already archived
-            return False
 
-        # Get the full question data
-        c.execute("""
-            SELECT type, question, correct_answer, option_a, option_b, option_c, option_d, 
-                   explanation, difficulty, domain, skill, image_url
-            FROM questions 
-            WHERE id = ?
-        """, (question_id,))
-        question_data = c.fetchone()
-
-        if question_data:
-            # Insert into archives with the SAME id
-            c.execute("""
-                INSERT INTO question_archives 
-                (id, type, question, correct_answer, option_a, option_b, option_c, option_d, 
-                 explanation, difficulty, domain, skill, image_url)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (question_id,) + question_data)
-
-            # Delete from questions
-            c.execute("DELETE FROM questions WHERE id = ?", (question_id,))
-
-            conn.commit()
-            return True
+def cold_database_name():
+    """
+    Return the file old attempts are moved to, or None when tiering is turned off.
+    """
+    return os.getenv("COLD_DATABASE") or None
+
+
+def attach_cold_storage(conn, path=None, create=False):
+    """
+    Attach the cold attempt file as `cold` and create the temp view all_attempts, every attempt
+    whether hot or cold, with the columns of daily_problem. Without a cold file the view only
+    covers daily_problem, so historical queries can always use it. Must run outside a
+    transaction. Returns True if the cold file was attached.
+    """
+    path = path or cold_database_name()
+    attached = bool(path) and (create or os.path.exists(path))
+    if attached:
+        conn.execute("ATTACH DATABASE ? AS cold", (path,))
+        if create:
+            conn.execute("PRAGMA cold.journal_mode = WAL")
+            # The same table as daily_problem, holding attempts on long-ended postings
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cold.daily_problem (
+                    posting_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    guild_id INTEGER NOT NULL,
+                    question_id INTEGER NOT NULL,
+                    selected_answer INTEGER NOT NULL,
+                    is_correct INTEGER NOT NULL,
+                    response_time INTEGER NOT NULL,
+                    PRIMARY KEY (posting_id, user_id, guild_id)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS cold.idx_daily_problem_user
+                ON daily_problem(guild_id, user_id, response_time, is_correct, question_id)
+            """)
+
+    # Views in the main schema can't refer to attached files, so the view is per connection.
+    # Reads ordered by the primary key merge the two tables' key ranges.
+    columns = "posting_id, user_id, guild_id, question_id, selected_answer, is_correct, response_time"
+    conn.execute("DROP VIEW IF EXISTS temp.all_attempts")
+    conn.execute(f"""
+        CREATE TEMP VIEW all_attempts AS
+        SELECT {columns} FROM main.daily_problem
+        {f"UNION ALL SELECT {columns} FROM cold.daily_problem" if attached else ""}
+    """)
+    return attached
+
+
+def question_content_hash(question, option_a, option_b, option_c, option_d):
+    """
+    Hash the question text and answer choices. Text is normalized first so copies that only
+    differ in case, Unicode form or whitespace get the same hash.
+    """
+    parts = []
+    for text in (question, option_a, option_b, option_c, option_d):
+        text = unicodedata.normalize("NFKC", text or "").casefold()
+        parts.append(" ".join(text.split()))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def find_duplicate_question(c, content_hash, guild_ids):
+    """
+    Return (table, question ID) of a live or archived question with the same content in one
+    of guild_ids, or None.
+    """
+    for table in QUESTION_TABLES:
+        c.execute(
+            f"SELECT id FROM {table} WHERE guild_id IN ({guild_placeholders(guild_ids)}) AND content_hash = ?",
+            (*guild_ids, content_hash)
+        )
+        row = c.fetchone()
+        if row:
+            return table, row[0]
+    return None
+
+
+def add_content_hash_columns(c):
+    """
+    Add the content_hash column and its unique index to databases created before it existed.
+    Content only has to be unique within a guild.
+    """
+    for table in QUESTION_TABLES:
+        columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        if "content_hash" not in columns:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN content_hash TEXT")
+        c.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_guild_content_hash ON {table}(guild_id, content_hash)")
+
+
+def backfill_content_hashes(conn, batch_size=CONTENT_HASH_BATCH_SIZE):
+    """
+    Compute content hashes for rows that don't have one yet, one batch per transaction.
+    A row whose content duplicates an earlier row keeps a NULL hash instead of failing. The
+    last ID checked is kept in stats_state, so later starts skip those rows and report the
+    duplicates only once.
+    """
+    for table in QUESTION_TABLES:
+        key = f"content_hash_backfill_{table}"
+        row = conn.execute("SELECT value FROM stats_state WHERE key = ?", (key,)).fetchone()
+        last_id = row[0] if row else 0
+        duplicates = 0
+        while True:
+            rows = conn.execute(f"""
+                SELECT id, question, option_a, option_b, option_c, option_d
+                FROM {table}
+                WHERE content_hash IS NULL AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+
+            last_id = rows[-1][0]
+            with conn:
+                cursor = conn.executemany(
+                    f"UPDATE OR IGNORE {table} SET content_hash = ? WHERE id = ?",
+                    [(question_content_hash(*row[1:]), row[0]) for row in rows]
+                )
+                duplicates += len(rows) - cursor.rowcount
+                conn.execute("""
+                    INSERT INTO stats_state (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value
+                """, (key, last_id))
+
+        if duplicates:
+            logger.warning(f"{duplicates} row(s) in {table} duplicate another question and have no content hash")
+
+
+def unpartitioned_tables_with_rows(c):
+    """
+    Return the tables that still hold rows from before partitioning, including ones a migration
+    that stopped part way left renamed.
+    """
+    candidates = [
+        *QUESTION_TABLES, *PARTITIONED_TABLES, "daily_problem_legacy",
+        *(f"{table}_unpartitioned" for table in PARTITIONED_TABLES),
+        *(f"{table}_text_keyed" for table in SKILL_KEYED_TABLES),
+    ]
+    tables = []
+    for table in candidates:
+        columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        if columns and "guild_id" not in columns and c.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            tables.append(table)
+    return tables
+
+
+def add_guild_columns(c, guild_id):
+    """
+    Add guild_id to question tables created before partitioning, giving existing questions
+    to the legacy guild, and create the guild-leading indexes.
+    """
+    for table in QUESTION_TABLES:
+        columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        if "guild_id" not in columns:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN guild_id INTEGER NOT NULL DEFAULT {SHARED_BANK_ID}")
+            if guild_id != SHARED_BANK_ID:
+                c.execute(f"UPDATE {table} SET guild_id = ?", (guild_id,))
+            # Content hashes used to be unique across the whole bank
+            c.execute(f"DROP INDEX IF EXISTS idx_{table}_content_hash")
+            logger.info(f"Added guild_id to {table} (existing questions belong to guild {guild_id})")
+
+    # Posting picks a question ID from the guild's range of this index without reading rows
+    c.execute("CREATE INDEX IF NOT EXISTS idx_questions_guild ON questions(guild_id, type)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_question_archives_guild ON question_archives(guild_id, archived_at)")
+
+
+def rename_unpartitioned_tables(c):
+    """
+    Move stats and attempt tables without a guild_id out of the way so the guild-keyed
+    versions can be created. Returns the names they were moved to.
+    """
+    unpartitioned = {}
+    for table in PARTITIONED_TABLES:
+        columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        if columns and "guild_id" not in columns:
+            c.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+            unpartitioned[table] = f"{table}_unpartitioned"
+    return unpartitioned
+
+
+def copy_unpartitioned_tables(c, unpartitioned, guild_id):
+    """
+    Copy the rows of the tables renamed by rename_unpartitioned_tables into the legacy guild.
+    """
+    for table, old_table in unpartitioned.items():
+        columns = ", ".join(PARTITIONED_TABLES[table])
+        c.execute(f"INSERT INTO {table} (guild_id, {columns}) SELECT ?, {columns} FROM {old_table}", (guild_id,))
+        c.execute(f"DROP TABLE {old_table}")
+        logger.info(f"Moved {table} into guild {guild_id}")
+
+
+def rename_text_keyed_skill_tables(c):
+    """
+    Move skill tables still keyed by (question_type, domain, skill) out of the way so the
+    skill ID versions can be created. Returns the names they were moved to.
+    """
+    legacy_tables = {}
+    for table in SKILL_KEYED_TABLES:
+        columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        if "skill" in columns:
+            c.execute(f"ALTER TABLE {table} RENAME TO {table}_text_keyed")
+            legacy_tables[table] = f"{table}_text_keyed"
+    return legacy_tables
+
+
+def copy_text_keyed_skill_tables(c, legacy_tables, guild_id):
+    """
+    Copy rows from the tables renamed by rename_text_keyed_skill_tables into the skill ID
+    tables, adding any skills outside the taxonomy to the skills table first.
+    """
+    for table, legacy_table in legacy_tables.items():
+        correct_column, attempts_column = SKILL_KEYED_TABLES[table]
+        c.execute(f"""
+            INSERT OR IGNORE INTO skills (question_type, domain, skill)
+            SELECT DISTINCT lower(question_type), domain, skill FROM {legacy_table}
+        """)
+        # Older rows may differ only in the case of question_type, so they are summed
+        c.execute(f"""
+            INSERT INTO {table} (guild_id, user_id, skill_id, {correct_column}, {attempts_column})
+            SELECT ?, l.user_id, s.id, SUM(l.{correct_column}), SUM(l.{attempts_column})
+            FROM {legacy_table} l
+            JOIN skills s
+                ON s.question_type = lower(l.question_type) AND s.domain = l.domain AND s.skill = l.skill
+            GROUP BY l.user_id, s.id
+        """, (guild_id,))
+        c.execute(f"DROP TABLE {legacy_table}")
+        logger.info(f"Converted {table} to skill IDs")
+
+
+def answer_code(letter):
+    return ANSWER_CHOICES.index(letter)
+
+
+def answer_letter(code):
+    return ANSWER_CHOICES[code]
+
+
+def rename_legacy_daily_problem(c):
+    """
+    Move a daily_problem table still in the text format (with an id column and a copy of the
+    correct answer) out of the way so the compact table can be created. Returns its new name.
+    """
+    columns = {row[1] for row in c.execute("PRAGMA table_info(daily_problem)")}
+    if "correct_answer" not in columns:
+        return None
+    c.execute("ALTER TABLE daily_problem RENAME TO daily_problem_legacy")
+    return "daily_problem_legacy"
+
+
+def copy_legacy_daily_problem(c, legacy_table, guild_id):
+    """
+    Convert the rows of the table renamed by rename_legacy_daily_problem into the compact format.
+    """
+    if legacy_table is None:
+        return
+    # Rows are copied in primary key order so the new table is built by appending
+    c.execute(f"""
+        INSERT INTO daily_problem (guild_id, question_id, user_id, selected_answer, is_correct, response_time)
+        SELECT ?, question_id, user_id, instr('{ANSWER_CHOICES}', selected_answer) - 1, is_correct,
+               CAST(strftime('%s', response_time) AS INTEGER)
+        FROM {legacy_table}
+        ORDER BY question_id, user_id
+    """, (guild_id,))
+    moved = c.rowcount
+    c.execute(f"DROP TABLE {legacy_table}")
+    # The recompute high-water mark was an attempt ID, the next run has to start over
+    c.execute("DELETE FROM stats_state WHERE key = 'stats_high_water_mark'")
+    logger.info(f"Converted daily_problem to the compact format ({moved} row(s) moved)")
+
+
+def rename_unposted_daily_problem(c):
+    """
+    Move a daily_problem table keyed by (guild_id, question_id, user_id) out of the way so the
+    posting-keyed table can be created. Returns its new name.
+    """
+    columns = {row[1] for row in c.execute("PRAGMA table_info(daily_problem)")}
+    if "posting_id" in columns:
+        return None
+    if c.execute("SELECT 1 FROM daily_problem LIMIT 1").fetchone() is None:
+        # A new database, or one with no answers yet: nothing to move
+        c.execute("DROP TABLE daily_problem")
+        return None
+    c.execute("ALTER TABLE daily_problem RENAME TO daily_problem_unposted")
+    # The index moved with the table; its name is needed for the new one
+    c.execute("DROP INDEX IF EXISTS idx_daily_problem_user")
+    return "daily_problem_unposted"
+
+
+def copy_unposted_daily_problem(c, unposted_table):
+    """
+    Give every question a guild was asked before postings existed one posting, spanning its
+    answers, and move the rows of the table renamed by rename_unposted_daily_problem into it.
+    """
+    if unposted_table is None:
+        return
+    c.execute("""
+        CREATE TEMP TABLE posting_map (
+            guild_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            posting_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, question_id)
+        ) WITHOUT ROWID
+    """)
+    c.execute(f"""
+        INSERT INTO temp.posting_map (guild_id, question_id, posting_id)
+        SELECT guild_id, question_id,
+               (SELECT COALESCE(MAX(id), 0) FROM postings) + ROW_NUMBER() OVER (ORDER BY guild_id, question_id)
+        FROM {unposted_table}
+        GROUP BY guild_id, question_id
+    """)
+    c.execute(f"""
+        INSERT INTO postings (id, question_id, posted_at, ends_at)
+        SELECT m.posting_id, m.question_id, MIN(u.response_time), MAX(u.response_time)
+        FROM {unposted_table} u
+        JOIN temp.posting_map m ON m.guild_id = u.guild_id AND m.question_id = u.question_id
+        GROUP BY u.guild_id, u.question_id
+    """)
+    # Rows are read in primary key order, which is also posting order, so the new table is built by appending
+    c.execute(f"""
+        INSERT INTO daily_problem (posting_id, user_id, guild_id, question_id, selected_answer, is_correct, response_time)
+        SELECT m.posting_id, u.user_id, u.guild_id, u.question_id, u.selected_answer, u.is_correct, u.response_time
+        FROM {unposted_table} u
+        JOIN temp.posting_map m ON m.guild_id = u.guild_id AND m.question_id = u.question_id
+        ORDER BY u.guild_id, u.question_id, u.user_id
+    """)
+    moved = c.rowcount
+    c.execute("DROP TABLE temp.posting_map")
+    c.execute(f"DROP TABLE {unposted_table}")
+    logger.info(f"Moved daily_problem into postings ({moved} row(s) moved)")
+
+
+def archive_question(conn, question_id, guild_id):
+    """
+    Move one of guild_id's questions from the questions table to the question_archives table,
+    preserving the original question ID and handling multiple archive attempts. Runs in the
+    caller's transaction and returns whether the question was archived; the caller drops it
+    from the question cache.
+    """
+    c = conn.cursor()
+
+    # Check if the question is already in archives
+    c.execute("SELECT id FROM question_archives WHERE id = ?", (question_id,))
+    if c.fetchone():
+        # Question already archived
         return False
-    except sqlite3.Error as e:
-        logger.error(f"Error archiving question: {e}")
-        conn.rollback()
+
+    # Get the full question data
+    c.execute("""
+        SELECT type, question, correct_answer, option_a, option_b, option_c, option_d, 
+               explanation, difficulty, domain, skill, image_url, content_hash, guild_id
+        FROM questions 
+        WHERE id = ? AND guild_id = ?
+    """, (question_id, guild_id))
+    question_data = c.fetchone()
+
+    if not question_data:
         return False
-    finally:
-        conn.close()
+
+    # Insert into archives with the SAME id
+    c.execute("""
+        INSERT INTO question_archives 
+        (id, type, question, correct_answer, option_a, option_b, option_c, option_d, 
+         explanation, difficulty, domain, skill, image_url, content_hash, guild_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (question_id,) + question_data)
+
+    # Delete from questions
+    c.execute("DELETE FROM questions WHERE id = ?", (question_id,))
+    return True
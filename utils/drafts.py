@@ -0,0 +1,68 @@
+import secrets
+import time
+from collections import OrderedDict
+
+DRAFT_TTL_SECONDS = 30 * 60
+MAX_DRAFTS = 500
+
+
+class DraftStore:
+    """
+    In-memory drafts for multi-step flows, keyed by (user ID, session ID) so every author
+    has their own copy. Drafts expire after ttl seconds without use, and the least recently
+    used draft is dropped once max_drafts are held.
+    """
+
+    def __init__(self, ttl=DRAFT_TTL_SECONDS, max_drafts=MAX_DRAFTS, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_drafts = max_drafts
+        self.clock = clock
+        self._drafts = OrderedDict()  # (user_id, session_id) -> (last_used, data), oldest first
+
+    def __len__(self):
+        return len(self._drafts)
+
+    def _evict_expired(self, now):
+        while self._drafts:
+            key, (last_used, _) = next(iter(self._drafts.items()))
+            if now - last_used < self.ttl:
+                break
+            del self._drafts[key]
+
+    def create(self, user_id, data):
+        """
+        Store a new draft for user_id and return its session ID.
+        """
+        now = self.clock()
+        self._evict_expired(now)
+
+        session_id = secrets.token_hex(8)
+        self._drafts[(user_id, session_id)] = (now, data)
+        while len(self._drafts) > self.max_drafts:
+            self._drafts.popitem(last=False)
+        return session_id
+
+    def get(self, user_id, session_id):
+        """
+        Return the draft dict, or None if it expired or belongs to someone else.
+        The returned dict can be updated in place.
+        """
+        now = self.clock()
+        self._evict_expired(now)
+
+        key = (user_id, session_id)
+        entry = self._drafts.get(key)
+        if entry is None:
+            return None
+
+        data = entry[1]
+        self._drafts[key] = (now, data)
+        self._drafts.move_to_end(key)
+        return data
+
+    def discard(self, user_id, session_id):
+        self._drafts.pop((user_id, session_id), None)
+
+
+# Drafts for the /addquestion flow
+question_drafts = DraftStore()
@@ -0,0 +1,62 @@
+"""
+Bounded-concurrency fan-out of Discord calls, for posting one question to many channels.
+
+At most FANOUT_CONCURRENCY calls are in flight, and at most one per route, since Discord
+rate-limits message sends and edits per channel. A call that is still rate limited after
+discord.py's own retries waits out retry_after while holding its route, so the other targets
+on that route queue behind it instead of being rejected too, and is then retried.
+"""
+import asyncio
+import logging
+import weakref
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+FANOUT_CONCURRENCY = 8
+FANOUT_RETRIES = 3
+FANOUT_RETRY_AFTER = 5.0  # Seconds to wait on a 429 that doesn't say how long
+
+
+class FanOut:
+    """
+    Runs one call per target, with bounded concurrency and one call per route at a time.
+    """
+
+    def __init__(self, concurrency=FANOUT_CONCURRENCY, retries=FANOUT_RETRIES):
+        self.retries = retries
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # A route's lock lives only while calls on that route hold or wait for it
+        self._routes = weakref.WeakValueDictionary()
+
+    def _route_lock(self, route):
+        lock = self._routes.get(route)
+        if lock is None:
+            lock = self._routes[route] = asyncio.Lock()
+        return lock
+
+    async def _call(self, call, target, route):
+        async with self._route_lock(route), self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await call(target)
+                except discord.RateLimited as e:
+                    if attempt == self.retries:
+                        raise
+                    retry_after = e.retry_after
+                except discord.HTTPException as e:
+                    if e.status != 429 or attempt == self.retries:
+                        raise
+                    retry_after = FANOUT_RETRY_AFTER
+                logger.warning(f"Rate limited on route {route}, retrying in {retry_after:.1f}s")
+                await asyncio.sleep(retry_after)
+
+    async def run(self, call, targets, route=lambda target: target.id):
+        """
+        Await call(target) for every target and return the results in order. A failed call's
+        exception is returned in its place, so one bad channel doesn't stop the others.
+        """
+        return await asyncio.gather(
+            *(self._call(call, target, route(target)) for target in targets), return_exceptions=True
+        )
@@ -0,0 +1,59 @@
+"""
+Per-guild partitioning of the bot's data.
+
+Every question, attempt and stats row carries the ID of the guild (Discord server) it belongs
+to, and the guild ID leads each table's key and indexes, so one guild's reads and writes stay
+inside its own index range. Questions stored under SHARED_BANK_ID form a shared bank that
+guilds can opt into with /sharedbank; they are read in place, never copied into the guild.
+"""
+import os
+
+SHARED_BANK_ID = 0
+
+
+def legacy_guild_id():
+    """
+    Guild that rows from before partitioning are moved into, from LEGACY_GUILD_ID, or None when
+    it is unset. Setting it to 0 makes old questions the shared bank and keeps old stats under
+    guild 0.
+    """
+    value = os.getenv("LEGACY_GUILD_ID", "").strip()
+    return int(value) if value.isdigit() else None
+
+
+def create_guild_settings_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            use_shared_bank INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def uses_shared_bank(conn, guild_id):
+    row = conn.execute("SELECT use_shared_bank FROM guild_settings WHERE guild_id = ?", (guild_id,)).fetchone()
+    return bool(row and row[0])
+
+
+def set_shared_bank(conn, guild_id, enabled):
+    """
+    Opt a guild into or out of the shared question bank. Runs in the caller's transaction.
+    """
+    conn.execute("""
+        INSERT INTO guild_settings (guild_id, use_shared_bank) VALUES (?, ?)
+        ON CONFLICT(guild_id) DO UPDATE SET use_shared_bank = excluded.use_shared_bank
+    """, (guild_id, int(enabled)))
+
+
+def question_guild_ids(conn, guild_id):
+    """
+    Return the guild IDs whose questions guild_id can post: its own, plus the shared bank
+    if it opted in.
+    """
+    if guild_id != SHARED_BANK_ID and uses_shared_bank(conn, guild_id):
+        return (guild_id, SHARED_BANK_ID)
+    return (guild_id,)
+
+
+def guild_placeholders(guild_ids):
+    return ", ".join("?" for _ in guild_ids)
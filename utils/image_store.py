@@ -0,0 +1,217 @@
+"""
+Optional local mirror of question images.
+
+When IMAGE_STORE_DIR is set, each image URL is downloaded once and stored on disk under the
+SHA-256 of its bytes, so questions sharing an image share one file. Daily problems then upload
+the mirrored file as an attachment instead of pointing the embed at the original host, and the
+Discord CDN URL of that upload is reused until it expires.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import aiohttp
+import discord
+
+from utils.database import get_database_connection
+from utils.images import IMAGE_CHECK_CONCURRENCY, image_validator
+
+logger = logging.getLogger(__name__)
+
+MAX_IMAGE_BYTES = 8 * 1024 * 1024  # Stays under Discord's upload limit
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# The shared session's timeout is sized for HEAD checks; a full image on a slow host needs longer
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=120, sock_read=20)
+CDN_URL_TTL_SECONDS = 24 * 60 * 60  # Used when a CDN URL doesn't say when it expires
+CDN_URL_MARGIN_SECONDS = 60 * 60  # Stop reusing a CDN URL this long before it expires
+
+EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+    "image/svg+xml": ".svg",
+}
+
+_pending = {}  # url -> Task for downloads in flight
+_background = set()  # Mirroring tasks started by posts, kept so they aren't garbage collected
+
+
+def image_store_dir():
+    """
+    Return the mirror directory, or None when mirroring is turned off.
+    """
+    return os.getenv("IMAGE_STORE_DIR") or None
+
+
+def image_path(sha256, content_type):
+    return os.path.join(image_store_dir(), sha256[:2], sha256 + EXTENSIONS.get(content_type, ".img"))
+
+
+def get_mirrored_image(url):
+    """
+    Return (sha256, content_type, cdn_url, cdn_expires_at) for a mirrored URL, or None.
+    """
+    conn = get_database_connection()
+    row = conn.execute("""
+        SELECT sha256, content_type, cdn_url, cdn_expires_at
+        FROM image_mirror
+        WHERE url = ?
+    """, (url,)).fetchone()
+    conn.close()
+    return row
+
+
+def _write_file(path, data):
+    # Write to a temporary file first so a crash never leaves a half-written image
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+async def _download(url):
+    session = image_validator.get_session()
+    try:
+        async with session.get(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status >= 400:
+                logger.warning(f"Not mirroring {url}: HTTP {response.status}")
+                return None
+            content_type = response.content_type
+            if not content_type.startswith("image/"):
+                logger.warning(f"Not mirroring {url}: not an image ({content_type})")
+                return None
+
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                data.extend(chunk)
+                if len(data) > MAX_IMAGE_BYTES:
+                    logger.warning(f"Not mirroring {url}: larger than {MAX_IMAGE_BYTES} bytes")
+                    return None
+    except (asyncio.TimeoutError, aiohttp.ClientError, ValueError) as e:
+        logger.warning(f"Not mirroring {url}: {type(e).__name__}")
+        return None
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = image_path(sha256, content_type)
+    if not os.path.exists(path):
+        await asyncio.to_thread(_write_file, path, bytes(data))
+
+    conn = get_database_connection()
+    with conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO image_mirror (url, sha256, content_type, cdn_url, cdn_expires_at)
+            VALUES (?, ?, ?, NULL, NULL)
+        """, (url, sha256, content_type))
+    conn.close()
+    return sha256, content_type, None, None
+
+
+async def mirror_image(url):
+    """
+    Download url into the store unless it is already there. Returns the mirror row, or None
+    if mirroring is off or the download failed. Concurrent calls for one URL share a download.
+    """
+    if not url or not image_store_dir():
+        return None
+
+    row = get_mirrored_image(url)
+    if row and os.path.exists(image_path(row[0], row[1])):
+        return row
+
+    task = _pending.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_download(url))
+        _pending[url] = task
+        task.add_done_callback(lambda _: _pending.pop(url, None))
+    return await asyncio.shield(task)
+
+
+async def mirror_images(urls):
+    """
+    Mirror many URLs concurrently, for bulk imports.
+    """
+    semaphore = asyncio.Semaphore(IMAGE_CHECK_CONCURRENCY)
+
+    async def mirror_one(url):
+        async with semaphore:
+            await mirror_image(url)
+
+    await asyncio.gather(*(mirror_one(url) for url in set(urls)))
+
+
+def _mirror_in_background(url):
+    task = asyncio.create_task(mirror_image(url))
+    _background.add(task)
+
+    def done(task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Mirroring {url} failed: {task.exception()}")
+
+    task.add_done_callback(done)
+
+
+def attach_mirrored_image(embed):
+    """
+    Point embed's image at the mirror and return the extra send_message kwargs.
+
+    Uses the cached CDN URL while it is still valid, otherwise attaches the local file. Images
+    that haven't been mirrored yet keep their original URL and are mirrored in the background,
+    so posting never waits on the image host.
+    """
+    url = embed.image.url
+    if not url or not image_store_dir():
+        return {}
+
+    row = get_mirrored_image(url)
+    if row is None:
+        _mirror_in_background(url)
+        return {}
+
+    sha256, content_type, cdn_url, cdn_expires_at = row
+    if cdn_url and cdn_expires_at and time.time() < cdn_expires_at - CDN_URL_MARGIN_SECONDS:
+        embed.set_image(url=cdn_url)
+        return {}
+
+    path = image_path(sha256, content_type)
+    if not os.path.exists(path):
+        _mirror_in_background(url)
+        return {}
+
+    filename = os.path.basename(path)
+    embed.set_image(url=f"attachment://{filename}")
+    return {"file": discord.File(path, filename=filename)}
+
+
+def _cdn_expiry(cdn_url):
+    # Discord CDN URLs carry their expiry as a hex timestamp in the "ex" parameter
+    expires = parse_qs(urlsplit(cdn_url).query).get("ex")
+    try:
+        return int(expires[0], 16)
+    except (TypeError, ValueError):
+        return int(time.time()) + CDN_URL_TTL_SECONDS
+
+
+def remember_cdn_url(url, message):
+    """
+    Save the CDN URL Discord gave an uploaded mirror, so the next post can skip the upload.
+    """
+    attachments = getattr(message, "attachments", None)
+    if not attachments:
+        return
+
+    cdn_url = attachments[0].url
+    conn = get_database_connection()
+    with conn:
+        conn.execute(
+            "UPDATE image_mirror SET cdn_url = ?, cdn_expires_at = ? WHERE url = ?",
+            (cdn_url, _cdn_expiry(cdn_url), url)
+        )
+    conn.close()
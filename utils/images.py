@@ -0,0 +1,121 @@
+import asyncio
+import time
+from collections import namedtuple
+
+import aiohttp
+
+IMAGE_CHECK_TIMEOUT = 5  # Seconds for the whole request, including redirects
+IMAGE_CHECK_CONCURRENCY = 20  # Requests in flight during a bulk check
+MAX_CONNECTIONS = 20
+MAX_CONNECTIONS_PER_HOST = 10  # Imports often point many rows at one image host
+VALID_TTL_SECONDS = 6 * 60 * 60
+INVALID_TTL_SECONDS = 5 * 60  # Failures expire sooner, the host may just have been down
+MAX_CACHED_URLS = 10_000
+
+ImageCheck = namedtuple("ImageCheck", ["ok", "reason", "content_type"])
+
+
+class ImageValidator:
+    """
+    Checks that URLs point at images with HEAD requests over one pooled aiohttp session.
+    Results are cached per URL, and concurrent checks of the same URL share one request.
+    """
+
+    def __init__(self, timeout=IMAGE_CHECK_TIMEOUT, concurrency=IMAGE_CHECK_CONCURRENCY,
+                 valid_ttl=VALID_TTL_SECONDS, invalid_ttl=INVALID_TTL_SECONDS, clock=time.monotonic):
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.valid_ttl = valid_ttl
+        self.invalid_ttl = invalid_ttl
+        self.clock = clock
+        self._session = None
+        self._results = {}  # url -> (expires_at, ImageCheck)
+        self._pending = {}  # url -> Task for checks in flight
+
+    def get_session(self):
+        # Created lazily so it binds to the running event loop. Also used by the image store
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST, ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _fetch(self, url):
+        session = self.get_session()
+        try:
+            async with session.head(url, allow_redirects=True) as response:
+                status, content_type = response.status, response.content_type
+
+            # Some hosts don't allow HEAD, ask for the first byte instead
+            if status in (405, 501):
+                async with session.get(url, headers={"Range": "bytes=0-0"}, allow_redirects=True) as response:
+                    status, content_type = response.status, response.content_type
+        except asyncio.TimeoutError:
+            return ImageCheck(False, "the image host took too long to respond", None)
+        except (aiohttp.ClientError, ValueError) as e:
+            return ImageCheck(False, f"the image could not be reached ({type(e).__name__})", None)
+
+        if status >= 400:
+            return ImageCheck(False, f"the image host returned HTTP {status}", content_type)
+        if not content_type.startswith("image/"):
+            return ImageCheck(False, f"the link is not an image ({content_type})", content_type)
+        return ImageCheck(True, None, content_type)
+
+    async def _fetch_and_store(self, url):
+        result = await self._fetch(url)
+        self._store(url, result)
+        return result
+
+    def _store(self, url, result):
+        if len(self._results) >= MAX_CACHED_URLS:
+            # Dicts keep insertion order, so this drops the oldest entry
+            del self._results[next(iter(self._results))]
+        ttl = self.valid_ttl if result.ok else self.invalid_ttl
+        self._results[url] = (self.clock() + ttl, result)
+
+    async def check(self, url):
+        """
+        Return an ImageCheck for url, from the cache when a fresh result is available.
+        """
+        cached = self._results.get(url)
+        if cached is not None:
+            expires_at, result = cached
+            if self.clock() < expires_at:
+                return result
+            del self._results[url]
+
+        task = self._pending.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(url))
+            self._pending[url] = task
+            task.add_done_callback(lambda _: self._pending.pop(url, None))
+        # Shielded so one caller giving up doesn't cancel the check for the others
+        return await asyncio.shield(task)
+
+    async def check_many(self, urls):
+        """
+        Check many URLs concurrently, at most self.concurrency at a time.
+        Returns {url: ImageCheck}.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def check_one(url):
+            async with semaphore:
+                return url, await self.check(url)
+
+        return dict(await asyncio.gather(*(check_one(url) for url in set(urls))))
+
+    def clear_cache(self):
+        self._results.clear()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Shared by /addquestion and bulk imports
+image_validator = ImageValidator()
@@ -0,0 +1,131 @@
+"""
+Ordered shutdown of the bot process.
+
+On SIGINT or SIGTERM the bot stops taking new interactions and runs its shutdown hooks one
+phase at a time, in SHUTDOWN_PHASES order:
+
+    interactions  stop the background jobs and let the interactions already admitted finish
+    writes        apply the answer writes still queued in the writer
+    timers        record the countdowns still running, to be resumed after the restart
+    snapshot      save the caches for a warm restart, see utils/snapshot.py
+    database      checkpoint the WAL into the database file
+    connections   close pooled connections and sessions
+
+The hooks of a phase run concurrently. The whole shutdown is bounded by SHUTDOWN_TIMEOUT
+seconds: a phase that runs out of time is cancelled and logged, and each later phase still gets
+at least MIN_PHASE_SECONDS, so queued answers are always flushed before the process exits.
+"""
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_PHASES = ("interactions", "writes", "timers", "snapshot", "database", "connections")
+SHUTDOWN_TIMEOUT = 20.0  # Seconds; below the usual 30s a supervisor waits before killing
+MIN_PHASE_SECONDS = 1.0
+RESTARTING_MESSAGE = "The bot is restarting. Please try again in a minute."
+
+
+def shutdown_timeout():
+    return float(os.getenv("SHUTDOWN_TIMEOUT") or SHUTDOWN_TIMEOUT)
+
+
+class Lifecycle:
+    """
+    Tracks whether the process is stopping, the interactions in flight and the shutdown hooks.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = shutdown_timeout() if timeout is None else timeout
+        self.stopping = False
+        self._stop = None
+        self._hooks = {phase: [] for phase in SHUTDOWN_PHASES}
+        self._in_flight = set()
+
+    def on_shutdown(self, phase, hook, name=None):
+        """
+        Run hook(), a coroutine function, in the given phase of the shutdown.
+        """
+        if phase not in self._hooks:
+            raise ValueError(f"Unknown shutdown phase {phase!r}")
+        self._hooks[phase].append((name or getattr(hook, "__qualname__", repr(hook)), hook))
+
+    def request_stop(self):
+        """
+        Stop admitting interactions and wake up wait_for_stop. Safe to call from a signal handler
+        installed with loop.add_signal_handler, and more than once.
+        """
+        self.stopping = True
+        if self._stop is not None:
+            self._stop.set()
+
+    async def wait_for_stop(self, runner):
+        """
+        Wait until a stop is requested or the runner task ends on its own, whichever is first.
+        """
+        self._stop = asyncio.Event()
+        if self.stopping:
+            self._stop.set()
+        stop = asyncio.create_task(self._stop.wait())
+        try:
+            await asyncio.wait({runner, stop}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop.cancel()
+
+    async def admit(self, interaction):
+        """
+        An interaction check: refuse interactions once stopping, and otherwise keep track of the
+        task handling the interaction, so the shutdown can wait for it to finish.
+        """
+        if self.stopping:
+            if not interaction.response.is_done():
+                await interaction.response.send_message(RESTARTING_MESSAGE, ephemeral=True)
+            return False
+        task = asyncio.current_task()
+        if task is not None:
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+        return True
+
+    async def drain_interactions(self):
+        """
+        Wait for the interactions admitted before the stop to finish.
+        """
+        pending = {task for task in self._in_flight if task is not asyncio.current_task()}
+        if pending:
+            logger.info(f"Waiting for {len(pending)} interaction(s) to finish")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _run_phase(self, phase, timeout):
+        hooks = self._hooks[phase]
+        if not hooks:
+            return
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(hook(), name=f"shutdown-{phase}-{name}") for name, hook in hooks]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for (name, _), task in zip(hooks, tasks):
+            if task in pending:
+                logger.error(f"Shutdown hook {name} ({phase}) did not finish within {timeout:.1f}s")
+            elif task.exception() is not None:
+                logger.error(f"Shutdown hook {name} ({phase}) failed: {task.exception()}")
+        logger.info(f"Shutdown phase {phase} took {time.perf_counter() - started:.2f}s")
+
+    async def shutdown(self):
+        """
+        Run every shutdown hook, phase by phase, within the timeout.
+        """
+        self.request_stop()
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        for phase in SHUTDOWN_PHASES:
+            await self._run_phase(phase, max(deadline - time.monotonic(), MIN_PHASE_SECONDS))
+        logger.info(f"Shut down in {time.perf_counter() - started:.2f}s")
+
+
+lifecycle = Lifecycle()
@@ -0,0 +1,123 @@
+from collections.abc import Sequence
+
+import discord
+from discord import Embed
+
+# Discord embed limits
+TITLE_LIMIT = 256
+DESCRIPTION_LIMIT = 4096
+FIELD_COUNT_LIMIT = 25
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+EMBED_TOTAL_LIMIT = 6000
+
+
+def split_text(text, max_chars):
+    """
+    Yield (start, end) spans of text that are at most max_chars long, breaking at the last
+    newline before the limit when there is one. Whitespace at the start of each span is skipped.
+    Each character is looked at a bounded number of times, so this is linear in len(text).
+    """
+    position = 0
+    length = len(text)
+    while position < length:
+        if length - position <= max_chars:
+            yield position, length
+            return
+
+        split_point = text.rfind("\n", position, position + max_chars)
+        if split_point <= position:  # If no newline found, force split at max_chars
+            split_point = position + max_chars
+        yield position, split_point
+
+        position = split_point
+        while position < length and text[position].isspace():
+            position += 1
+
+
+def layout_pages(texts, max_chars=4000):
+    """
+    Lay out text fragments into pages in a single pass without building any strings.
+
+    Each page is a list of (fragment index, start, end) spans. Fragments that fit are kept
+    whole and packed onto the current page; a fragment longer than max_chars gets pages of
+    its own, split with split_text.
+    """
+    pages = []
+    current_page = []
+    character_count = 0
+
+    for index, text in enumerate(texts):
+        text_length = len(text)
+
+        if text_length > max_chars:
+            if current_page:
+                pages.append(current_page)
+            pages.extend([(index, start, end)] for start, end in split_text(text, max_chars))
+            current_page = []
+            character_count = 0
+            continue
+
+        if current_page and character_count + text_length > max_chars:
+            pages.append(current_page)
+            current_page = []
+            character_count = 0
+
+        current_page.append((index, 0, text_length))
+        character_count += text_length
+
+    if current_page:
+        pages.append(current_page)
+
+    return pages
+
+
+def join_spans(texts, spans):
+    """
+    Build the text of a page from its spans.
+    """
+    return "".join(texts[index][start:end] for index, start, end in spans)
+
+
+class EmbedPages(Sequence):
+    """
+    Read-only sequence of embeds where each page is only built when it is accessed.
+    """
+
+    def __init__(self, page_count, build_page):
+        self.page_count = page_count
+        self.build_page = build_page
+
+    def __len__(self):
+        return self.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.page_count))]
+        if index < 0:
+            index += self.page_count
+        if not 0 <= index < self.page_count:
+            raise IndexError("page index out of range")
+        return self.build_page(index)
+
+
+def paginate_texts(texts, title, max_chars=4000, color=None):
+    """
+    Lay out text fragments into pages and return them as lazily built embeds titled
+    "<title> (Page i/N)" with a "Page i of N" footer.
+    """
+    texts = list(texts)
+    pages = layout_pages(texts, max_chars)
+    total_pages = len(pages)
+    color = color if color is not None else discord.Color.blue()
+
+    def build_page(index):
+        embed = Embed(
+            title=f"{title} (Page {index + 1}/{total_pages})",
+            description=join_spans(texts, pages[index]),
+            color=color
+        )
+        embed.set_footer(text=f"Page {index + 1} of {total_pages}")
+        return embed
+
+    return EmbedPages(total_pages, build_page)
@@ -0,0 +1,145 @@
+import copy
+from collections import OrderedDict, namedtuple
+
+import discord
+from discord import Embed
+
+from utils.database import get_database_connection
+
+QUESTION_CACHE_SIZE = 256
+
+# Column order expected by render_question, matching the daily problem queries
+QUESTION_COLUMNS = """
+    id, question, correct_answer,
+    option_a, option_b, option_c, option_d,
+    explanation, difficulty, domain, skill, image_url, type
+"""
+
+_question_cache = OrderedDict()
+
+
+class QuestionPayload(namedtuple("QuestionPayload", [
+    "question_id", "question_type", "domain", "skill", "difficulty",
+    "correct_answer", "explanation", "main_embed_dict", "details_embed_dict"
+])):
+    """
+    Pre-rendered question shared by every post and button click. The embeds are kept as
+    dicts and copied whenever an Embed is needed, so the cached payload never changes.
+    """
+    __slots__ = ()
+
+    def main_embed(self):
+        return Embed.from_dict(copy.deepcopy(self.main_embed_dict))
+
+    def details_embed(self):
+        return Embed.from_dict(copy.deepcopy(self.details_embed_dict))
+
+
+def render_question(row):
+    """
+    Render a questions row (in QUESTION_COLUMNS order) into a QuestionPayload.
+    """
+    (question_id, question_text, correct_answer,
+     option_a, option_b, option_c, option_d,
+     explanation, difficulty, domain, skill, image_url, q_type) = row
+
+    options_dict = {
+        "A": option_a,
+        "B": option_b,
+        "C": option_c,
+        "D": option_d
+    }
+
+    # Create main embed
+    main_embed = Embed(
+        title="Daily Problem",
+        description=question_text,
+        color=0x3498db,
+    )
+
+    main_embed.add_field(
+        name="Answer Choices",
+        value="\n".join([f"{key}) {value}" for key, value in options_dict.items()]),
+        inline=False,
+    )
+
+    if image_url:
+        main_embed.set_image(url=image_url)
+
+    main_embed.set_footer(text=f"Time remaining: 24h 0m 0s | Question ID: {question_id}")
+
+    details_embed = Embed(
+        title="Question Details",
+        color=discord.Color.blue()
+    )
+    details_embed.add_field(name="Type", value=q_type.capitalize(), inline=True)
+    details_embed.add_field(name="Domain", value=domain, inline=True)
+    details_embed.add_field(name="Skill", value=skill, inline=True)
+    details_embed.add_field(name="Difficulty", value=difficulty.capitalize(), inline=True)
+
+    return QuestionPayload(
+        question_id, q_type, domain, skill, difficulty, correct_answer, explanation,
+        main_embed.to_dict(), details_embed.to_dict()
+    )
+
+
+def cache_question(row):
+    """
+    Render a questions row that was already fetched and keep it in the cache.
+    """
+    payload = render_question(row)
+    _question_cache[payload.question_id] = payload
+    _question_cache.move_to_end(payload.question_id)
+    while len(_question_cache) > QUESTION_CACHE_SIZE:
+        _question_cache.popitem(last=False)
+    return payload
+
+
+def get_question_payload(question_id):
+    """
+    Return the rendered question, loading it on a cache miss. Returns None if the question
+    is not in the questions table (for example because it was archived).
+    """
+    payload = _question_cache.get(question_id)
+    if payload is not None:
+        _question_cache.move_to_end(question_id)
+        return payload
+
+    conn = get_database_connection()
+    c = conn.cursor()
+    c.execute(f"SELECT {QUESTION_COLUMNS} FROM questions WHERE id = ?", (question_id,))
+    row = c.fetchone()
+    conn.close()
+
+    if not row:
+        return None
+    return cache_question(row)
+
+
+def invalidate_question(question_id):
+    """
+    Drop a question from the cache after it is archived, recovered or deleted.
+    """
+    _question_cache.pop(int(question_id), None)
+
+
+def clear_question_cache():
+    _question_cache.clear()
+
+
+def cached_questions():
+    """
+    Return the cached payloads, least recently used first.
+    """
+    return list(_question_cache.values())
+
+
+def restore_questions(payloads):
+    """
+    Put payloads saved by cached_questions back, keeping their order, behind whatever was
+    cached since. Payloads already cached are left as they are.
+    """
+    for payload in reversed(payloads):
+        if payload.question_id not in _question_cache and len(_question_cache) < QUESTION_CACHE_SIZE:
+            _question_cache[payload.question_id] = payload
+            _question_cache.move_to_end(payload.question_id, last=False)
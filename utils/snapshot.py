@@ -0,0 +1,229 @@
+"""
+Snapshots of the bot's rendered-question cache, for warm restarts.
+
+With SNAPSHOT_PATH set, the bot writes the cache to that file every SNAPSHOT_INTERVAL_MINUTES
+and when it shuts down, and reads it back when it starts, before the warm-up. Each process of
+a sharded deployment needs its own file.
+
+A snapshot records the database's change counter when it was taken: the database_id in
+stats_state and the last seq in question_changes, which triggers on the questions table append
+to whenever a question is added, edited or deleted. On restore the snapshot is only used if it
+was taken of the same database at a point the database still remembers, and only the
+questions changed since then are loaded again; the rest is used as saved. A snapshot that
+can't be checked (another database, a restored backup, a log pruned past it, or an older
+SNAPSHOT_VERSION) is ignored, and the cache fills up as usual.
+
+question_changes is pruned to the last QUESTION_CHANGES_KEEP changes whenever a snapshot is
+saved, and down to the last change whenever the bot starts without SNAPSHOT_PATH; the highest
+seq pruned is kept in stats_state, so a snapshot older than that is recognised as unusable.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+import utils.database as database
+from utils.question_cache import (
+    QUESTION_COLUMNS, QuestionPayload, cached_questions, render_question, restore_questions
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1  # Bump whenever QuestionPayload or the rendered embeds change
+SNAPSHOT_INTERVAL_MINUTES = 10
+QUESTION_CHANGES_KEEP = 10000
+PRUNED_CHANGES_KEY = "question_changes_pruned"
+
+
+def snapshot_path():
+    """
+    Return the snapshot file, or None when snapshots are turned off.
+    """
+    return os.getenv("SNAPSHOT_PATH") or None
+
+
+def change_counter(conn):
+    """
+    Return (database_id, seq) for the database's current state.
+    """
+    database_id = conn.execute("SELECT value FROM stats_state WHERE key = 'database_id'").fetchone()
+    # AUTOINCREMENT's counter, which pruning question_changes doesn't reset
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'question_changes'").fetchone()
+    return (database_id[0] if database_id else None), (seq[0] if seq else 0)
+
+
+def _changed_since(conn, snapshot):
+    """
+    Return the IDs of the questions changed since the snapshot, or None if the database can't
+    tell, with the reason.
+    """
+    database_id, seq = change_counter(conn)
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        return None, f"it has version {snapshot.get('version')}, not {SNAPSHOT_VERSION}"
+    if snapshot["database_id"] != database_id:
+        return None, "it was taken of another database"
+    if snapshot["seq"] > seq:
+        return None, "it is newer than the database, which may have been restored from a backup"
+    pruned = conn.execute("SELECT value FROM stats_state WHERE key = ?", (PRUNED_CHANGES_KEY,)).fetchone()
+    if pruned and snapshot["seq"] <= pruned[0]:
+        return None, "the changes since it was taken have been pruned"
+    # The last change it saw must still be the same change, or the database has diverged
+    if snapshot["seq"] and conn.execute(
+        "SELECT question_id FROM question_changes WHERE seq = ?", (snapshot["seq"],)
+    ).fetchone() != (snapshot["last_question_id"],):
+        return None, "the database's changes no longer match it"
+    return {row[0] for row in conn.execute(
+        "SELECT DISTINCT question_id FROM question_changes WHERE seq > ?", (snapshot["seq"],)
+    )}, None
+
+
+def snapshot_header():
+    """
+    Return a snapshot without its questions: the version and the database's change counter.
+    """
+    conn = database.get_database_connection()
+    try:
+        database_id, seq = change_counter(conn)
+        last = conn.execute("SELECT question_id FROM question_changes WHERE seq = ?", (seq,)).fetchone()
+    finally:
+        conn.close()
+    return {
+        "version": SNAPSHOT_VERSION,
+        "database_id": database_id,
+        "seq": seq,
+        "last_question_id": last[0] if last else None,
+        "saved_at": int(time.time()),
+    }
+
+
+def write_snapshot(path, snapshot):
+    """
+    Write the snapshot atomically, then prune question_changes.
+    """
+    partial = f"{path}.partial"
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    prune_question_changes()
+
+
+def prune_question_changes(keep=QUESTION_CHANGES_KEEP):
+    """
+    Delete all but the last keep changes from question_changes.
+    """
+    conn = database.get_database_connection()
+    try:
+        with conn:
+            _, seq = change_counter(conn)
+            # The last change always stays, as snapshots taken since are checked against it
+            pruned = seq - max(keep, 1)
+            if pruned > 0:
+                conn.execute("DELETE FROM question_changes WHERE seq <= ?", (pruned,))
+                conn.execute("""
+                    INSERT INTO stats_state (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+                """, (PRUNED_CHANGES_KEY, pruned))
+    finally:
+        conn.close()
+
+
+async def save_snapshot(path):
+    """
+    Save the cache to path. The cache is copied on the event loop, which owns it; the database
+    and the file are handled in threads.
+    """
+    started = time.perf_counter()
+    # The counter is read before the cache is copied, so a change that lands in between is
+    # replayed on restore rather than missed
+    snapshot = await asyncio.to_thread(snapshot_header)
+    snapshot["questions"] = [list(payload) for payload in cached_questions()]
+    await asyncio.to_thread(write_snapshot, path, snapshot)
+    logger.info(
+        f"Saved {len(snapshot['questions'])} cached question(s) to {path} "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+
+def restore_snapshot(path):
+    """
+    Load the snapshot at path into the question cache, loading the questions changed since it
+    was taken from the database again. Returns (questions restored, questions reloaded), or
+    None if there was no usable snapshot.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        payloads = [QuestionPayload(*fields) for fields in snapshot["questions"]]
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        logger.warning(f"Ignoring the snapshot at {path}: it could not be read ({e})")
+        return None
+
+    conn = database.get_database_connection()
+    try:
+        changed, reason = _changed_since(conn, snapshot)
+        if changed is None:
+            logger.warning(f"Ignoring the snapshot at {path}: {reason}")
+            return None
+        # Replay only the delta: changed questions are rendered again, or dropped if deleted
+        stale = [payload.question_id for payload in payloads if payload.question_id in changed]
+        rows = {row[0]: row for row in conn.execute(f"""
+            SELECT {QUESTION_COLUMNS}
+            FROM questions
+            WHERE id IN ({", ".join("?" for _ in stale)})
+        """, stale)} if stale else {}
+    except sqlite3.Error as e:
+        logger.warning(f"Ignoring the snapshot at {path}: the database could not be checked ({e})")
+        return None
+    finally:
+        conn.close()
+
+    restored = []
+    for payload in payloads:
+        if payload.question_id not in changed:
+            restored.append(payload)
+        elif payload.question_id in rows:
+            restored.append(render_question(rows[payload.question_id]))
+    restore_questions(restored)
+    return len(restored), len(stale)
+
+
+class SnapshotJob:
+    """
+    Saves a snapshot every interval, starting one interval after it is started.
+    """
+
+    def __init__(self, path, interval=SNAPSHOT_INTERVAL_MINUTES * 60):
+        self.path = path
+        self.interval = interval
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def save(self):
+        try:
+            await save_snapshot(self.path)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Saving the snapshot to {self.path} failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
@@ -0,0 +1,140 @@
+"""
+The SAT question taxonomy and its skills table.
+
+MATH_DOMAINS and EBRW_DOMAINS map each domain to its skills. Every (question type, domain,
+skill) also has a small integer ID in the skills table, which is what user_skill_stats,
+stat_adjustments and attempt_rollups store. The question tables keep the text domain and skill;
+code that needs their skill IDs maps them through the skills table (see _load_question_skills
+in commands/recompute_stats.py). skill_registry maps between the two in memory.
+"""
+
+MATH_DOMAINS = {
+    "Algebra": [
+        "Linear equations in one variable",
+        "Linear functions",
+        "Linear equations in two variables",
+        "Systems of two linear equations in two variables",
+        "Linear inequalities in one or two variables"
+    ],
+    "Advanced Math": [
+        "Nonlinear functions",
+        "Nonlinear equations in one variable and systems of equations in two variables",
+        "Equivalent expressions"
+    ],
+    "Problem-Solving and Data Analysis": [
+        "Ratios, rates, proportional relationships, and units",
+        "Percentages",
+        "One-variable data: Distributions and measures of center and spread",
+        "Two-variable data: Models and scatterplots",
+        "Probability and conditional probability",
+        "Inference from sample statistics and margin of error",
+        "Evaluating statistical claims: Observational studies and experiments"
+    ],
+    "Geometry and Trigonometry": [
+        "Area and volume",
+        "Lines, angles, and triangles",
+        "Right triangles and trigonometry",
+        "Circles"
+    ]
+}
+
+EBRW_DOMAINS = {
+    "Information and Ideas": [
+        "Central Ideas and Details",
+        "Inferences",
+        "Command of Evidence"
+    ],
+    "Craft and Structure": [
+        "Words in Context",
+        "Text Structure and Purpose",
+        "Cross-Text Connections"
+    ],
+    "Expression of Ideas": [
+        "Rhetorical Synthesis",
+        "Transitions"
+    ],
+    "Standard English Conventions": [
+        "Boundaries",
+        "Form, Structure, and Sense"
+    ]
+}
+
+DOMAINS_BY_TYPE = {"math": MATH_DOMAINS, "ebrw": EBRW_DOMAINS}
+
+# Seed order of the skills table, so fresh databases number the skills the same way
+TAXONOMY = [
+    (question_type, domain, skill)
+    for question_type, domains in DOMAINS_BY_TYPE.items()
+    for domain, skills in domains.items()
+    for skill in skills
+]
+
+
+def create_skills_table(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS skills (
+            id INTEGER PRIMARY KEY,
+            question_type TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            skill TEXT NOT NULL,
+            UNIQUE (question_type, domain, skill)
+        )
+    ''')
+    c.executemany(
+        "INSERT OR IGNORE INTO skills (question_type, domain, skill) VALUES (?, ?, ?)",
+        TAXONOMY
+    )
+
+
+class SkillRegistry:
+    """
+    Bidirectional map between skill IDs and (question type, domain, skill), loaded from the
+    skills table on first use. Skills outside TAXONOMY (from older data) are added to the
+    table the first time they are asked for.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._skills = {}
+
+    def clear(self):
+        self._ids.clear()
+        self._skills.clear()
+
+    def _load(self, conn):
+        for skill_id, question_type, domain, skill in conn.execute(
+            "SELECT id, question_type, domain, skill FROM skills"
+        ):
+            self._ids[(question_type, domain, skill)] = skill_id
+            self._skills[skill_id] = (question_type, domain, skill)
+
+    def id_for(self, conn, question_type, domain, skill):
+        """
+        Return the ID of a skill, adding it to the skills table if it is new.
+        Runs in the caller's transaction when it has to insert.
+        """
+        key = (question_type.lower(), domain, skill)
+        skill_id = self._ids.get(key)
+        if skill_id is None:
+            self._load(conn)
+            skill_id = self._ids.get(key)
+        if skill_id is None:
+            skill_id = conn.execute(
+                "INSERT INTO skills (question_type, domain, skill) VALUES (?, ?, ?)", key
+            ).lastrowid
+            self._ids[key] = skill_id
+            self._skills[skill_id] = key
+        return skill_id
+
+    def skill_for(self, conn, skill_id):
+        """
+        Return (question type, domain, skill) for an ID.
+        """
+        skill = self._skills.get(skill_id)
+        if skill is None:
+            self._load(conn)
+            skill = self._skills[skill_id]
+        return skill
+
+
+skill_registry = SkillRegistry()
@@ -0,0 +1,381 @@
+"""
+Single-writer path for the bot's hot writes: recorded answers, stat edits and archives.
+
+SQLite allows one writer at a time, so writes are queued and applied by one WriteBatcher,
+which commits whatever has queued up while the previous batch ran in a single transaction
+(each write in its own savepoint, so one failing write does not undo the others). Reads go
+straight to the database, which runs in WAL mode so they never wait for the writer.
+
+In a single bot process the batcher runs in-process. In a sharded deployment, WRITER_SOCKET
+names a Unix socket served by one dedicated writer process, and every shard process forwards
+its writes there as newline-delimited JSON:
+
+    python -m utils.writer --socket /tmp/crackd-writer.sock
+    WRITER_SOCKET=/tmp/crackd-writer.sock SHARD_COUNT=2 SHARD_IDS=0 python bot.py
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sqlite3
+
+import utils.database as database
+from utils.taxonomy import skill_registry
+
+logger = logging.getLogger(__name__)
+
+WRITER_MAX_BATCH = 500
+WRITER_STREAM_LIMIT = 16 * 1024 * 1024  # Bulk stat edits arrive as one line
+
+
+class WriteError(Exception):
+    """
+    A write failed, or the writer process could not be reached.
+    """
+
+
+def record_answer(conn, guild_id, posting_id, question_id, user_id, selected_answer, is_correct, response_time,
+                  question_type, domain, skill):
+    """
+    Record an attempt and add it to the user's stats. Returns False, changing nothing, if the
+    user already answered this posting in this guild.
+    """
+    try:
+        conn.execute("""
+            INSERT INTO daily_problem (posting_id, user_id, guild_id, question_id, selected_answer, is_correct,
+                                       response_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (posting_id, user_id, guild_id, question_id, selected_answer, is_correct, response_time))
+    except sqlite3.IntegrityError:
+        # The (posting_id, user_id, guild_id) primary key rejects a second answer
+        return False
+
+    correct = 1 if is_correct else 0
+    conn.execute("""
+        INSERT INTO user_stats (guild_id, user_id, total_correct, total_attempts)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT(guild_id, user_id) DO UPDATE SET
+        total_correct = total_correct + ?,
+        total_attempts = total_attempts + 1
+    """, (guild_id, user_id, correct, correct))
+
+    skill_id = skill_registry.id_for(conn, question_type, domain, skill)
+    conn.execute("""
+        INSERT INTO user_skill_stats (guild_id, user_id, skill_id, total_correct, total_attempts)
+        VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT(guild_id, user_id, skill_id) DO UPDATE SET
+        total_correct = total_correct + ?,
+        total_attempts = total_attempts + 1
+    """, (guild_id, user_id, skill_id, correct, correct))
+    return True
+
+
+def edit_stats(conn, guild_id, edits):
+    # Imported here to avoid a circular import, the command module submits through this one
+    from commands.edit_stats import apply_stat_edits
+    return apply_stat_edits(conn, guild_id, edits)
+
+
+# Operations a write can name; each runs in the batch's transaction and returns JSON-safe data
+WRITE_OPS = {
+    "record_answer": record_answer,
+    "edit_stats": edit_stats,
+    "archive_question": database.archive_question,
+}
+
+
+class WriteBatcher:
+    """
+    Applies submitted writes in batches on one connection, off the event loop.
+    """
+
+    def __init__(self, max_batch=WRITER_MAX_BATCH):
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue = asyncio.Queue()
+        self._conn = None
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, op, *args):
+        """
+        Queue a write and wait for its result once its batch is committed.
+        """
+        if op not in WRITE_OPS:
+            raise WriteError(f"Unknown write {op!r}")
+        if self._task is None or self._task.done():
+            raise WriteError("The writer is shutting down")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, args, future))
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            # Everything that queued up while the last batch ran goes into this one
+            while True:
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.max_batch or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+            if not batch:
+                continue
+
+            try:
+                results = await asyncio.to_thread(self._apply, [(op, args) for op, args, _ in batch])
+            except Exception as e:
+                logger.error(f"Write batch of {len(batch)} failed: {e}")
+                results = [WriteError(str(e))] * len(batch)
+
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _apply(self, writes):
+        if self._conn is None:
+            # Only one batch runs at a time, so the connection is never shared between threads
+            self._conn = sqlite3.connect(database.DATABASE_NAME, isolation_level=None, check_same_thread=False)
+
+        conn = self._conn
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op, args in writes:
+                conn.execute("SAVEPOINT write")
+                try:
+                    results.append(WRITE_OPS[op](conn, *args))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    logger.error(f"Write {op} failed: {e}")
+                    results.append(WriteError(str(e)))
+                conn.execute("RELEASE write")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+        self.batches += 1
+        self.writes += len(writes)
+        return results
+
+    async def close(self):
+        """
+        Apply the writes already queued, then stop and close the connection.
+        """
+        if self._task:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class WriterClient:
+    """
+    Connection from a shard process to the writer process. Requests are pipelined over one
+    socket and matched to responses by ID.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._reader = None
+        self._writer = None
+        self._pending = {}
+        self._next_id = 0
+        self._lock = asyncio.Lock()
+        self._reader_task = None
+
+    async def _connect(self):
+        async with self._lock:
+            if self._writer is None:
+                try:
+                    self._reader, self._writer = await asyncio.open_unix_connection(
+                        self.path, limit=WRITER_STREAM_LIMIT
+                    )
+                except OSError as e:
+                    raise WriteError(f"Could not reach the writer at {self.path}: {e}")
+                self._reader_task = asyncio.create_task(self._read_responses(self._reader))
+
+    async def _read_responses(self, reader):
+        try:
+            while line := await reader.readline():
+                response = json.loads(line)
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(WriteError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+        except (OSError, ValueError) as e:
+            logger.error(f"Lost the writer connection: {e}")
+        finally:
+            # Fail whatever was in flight; the next write reconnects
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(WriteError("Lost the connection to the writer"))
+
+    async def submit(self, op, *args):
+        await self._connect()
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(json.dumps({"id": request_id, "op": op, "args": args}).encode() + b"\n")
+            await self._writer.drain()
+        except (OSError, AttributeError) as e:
+            self._pending.pop(request_id, None)
+            raise WriteError(f"Could not send the write: {e}")
+        return await future
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+
+_writers = {}
+
+
+def writer_socket():
+    return os.getenv("WRITER_SOCKET") or None
+
+
+def _writer_for_loop():
+    """
+    The batcher or writer client of the running event loop, created on first use.
+    """
+    loop = asyncio.get_running_loop()
+    writer = _writers.get(loop)
+    if writer is None:
+        path = writer_socket()
+        if path:
+            writer = WriterClient(path)
+        else:
+            writer = WriteBatcher()
+            writer.start()
+        # Loops that have finished (e.g. earlier asyncio.run calls) can't be written through again
+        for old_loop in [old_loop for old_loop in _writers if old_loop.is_closed()]:
+            del _writers[old_loop]
+        _writers[loop] = writer
+    return writer
+
+
+async def submit_write(op, *args):
+    """
+    Apply a write through the single writer and return its result. Raises WriteError if the
+    write failed or the writer could not be reached.
+    """
+    return await _writer_for_loop().submit(op, *args)
+
+
+async def close_writer():
+    """
+    Close the running loop's batcher or writer connection, if it has one.
+    """
+    writer = _writers.pop(asyncio.get_running_loop(), None)
+    if writer is not None:
+        await writer.close()
+
+
+async def _handle_shard(batcher, reader, writer):
+    """
+    Serve one shard process: apply each request through the batcher and answer it, in
+    whatever order the batches finish.
+    """
+    send_lock = asyncio.Lock()
+    tasks = set()
+
+    async def serve(request):
+        try:
+            response = {"id": request["id"], "result": await batcher.submit(request["op"], *request["args"])}
+        except WriteError as e:
+            response = {"id": request["id"], "error": str(e)}
+        async with send_lock:
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    try:
+        while line := await reader.readline():
+            task = asyncio.create_task(serve(json.loads(line)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks, return_exceptions=True)
+    except (OSError, ValueError) as e:
+        logger.error(f"Dropped a shard connection: {e}")
+    finally:
+        writer.close()
+
+
+async def serve_writer(path, ready=None):
+    """
+    Run the writer process: accept shard connections on the Unix socket at path until
+    SIGINT or SIGTERM. Sets the ready event once the socket is listening.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+    batcher = WriteBatcher()
+    batcher.start()
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: _handle_shard(batcher, reader, writer), path, limit=WRITER_STREAM_LIMIT
+    )
+    logger.info(f"Writer listening on {path}")
+    if ready is not None:
+        ready.set()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    async with server:
+        await stop.wait()
+
+    await batcher.close()
+    os.remove(path)
+    # Leave the database file complete on its own, with an empty WAL
+    await asyncio.to_thread(database.checkpoint_wal)
+    logger.info(f"Writer stopped after {batcher.writes} write(s) in {batcher.batches} batch(es)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=writer_socket() or "crackd-writer.sock", help="Unix socket to listen on")
+    parser.add_argument("--db", default=database.DATABASE_NAME, help="Database file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    database.DATABASE_NAME = args.db
+    # The writer owns the schema; shard processes only read it
+    try:
+        database.init_db()
+    except database.MigrationError as e:
+        raise SystemExit(f"Error initializing database: {e}")
+    asyncio.run(serve_writer(args.socket))
+
+
+if __name__ == "__main__":
+    main()